@@ -17,11 +17,16 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 # Import the application's Base metadata for autogenerate support
 from models import Base
+from database import SQLALCHEMY_DATABASE_URL
 target_metadata = Base.metadata
 
 # Alembic Config object
 config = context.config
 
+# Migrate the same database the app uses (DATABASE_URL), not the alembic.ini default.
+# '%' is escaped for configparser interpolation (e.g. URL-encoded passwords).
+config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL.replace("%", "%%"))
+
 # Interpret the config file for Python logging
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
@@ -38,7 +43,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
-        render_as_batch=True,  # Required for SQLite ALTER TABLE support
+        render_as_batch=url.startswith("sqlite"),  # Required for SQLite ALTER TABLE support
     )
 
     with context.begin_transaction():
@@ -60,7 +65,7 @@ def run_migrations_online() -> None:
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
-            render_as_batch=True,  # Required for SQLite ALTER TABLE support
+            render_as_batch=connection.dialect.name == "sqlite",  # Required for SQLite ALTER TABLE support
         )
 
         with context.begin_transaction():
@@ -0,0 +1,73 @@
+"""composite indexes for hot queries
+
+Revision ID: 5eca37a247d8
+Revises: 3aaf73508a03
+Create Date: 2026-10-17 09:12:40.118532
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5eca37a247d8'
+down_revision: Union[str, Sequence[str], None] = '3aaf73508a03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (name, table, columns, unique)
+NEW_INDEXES = [
+    ('ix_nonces_expires_at', 'nonces', ['expires_at'], False),
+    ('ix_secrets_owner_address', 'secrets', ['owner_address'], False),
+    ('ix_access_grants_secret_id_grantee_address', 'access_grants', ['secret_id', 'grantee_address'], False),
+    ('ix_access_grants_grantee_address', 'access_grants', ['grantee_address'], False),
+    ('ix_documents_owner_address', 'documents', ['owner_address'], False),
+    ('ix_multisig_workflows_owner_address', 'multisig_workflows', ['owner_address'], False),
+    ('ix_multisig_workflow_signers_workflow_id_user_address', 'multisig_workflow_signers', ['workflow_id', 'user_address'], False),
+    ('ix_multisig_workflow_signers_user_address', 'multisig_workflow_signers', ['user_address'], False),
+    ('ix_multisig_workflow_recipients_workflow_id_user_address', 'multisig_workflow_recipients', ['workflow_id', 'user_address'], False),
+    ('ix_multisig_workflow_recipients_user_address', 'multisig_workflow_recipients', ['user_address'], False),
+    ('ix_messages_sender_recipient_created_at', 'messages', ['sender_address', 'recipient_address', 'created_at'], False),
+    ('ix_file_chunks_secret_id_chunk_index', 'file_chunks', ['secret_id', 'chunk_index'], False),
+    ('uq_group_members_channel_id_user_address', 'group_members', ['channel_id', 'user_address'], True),
+    ('ix_group_members_user_address', 'group_members', ['user_address'], False),
+    ('uq_push_subscriptions_endpoint', 'push_subscriptions', ['endpoint'], True),
+]
+
+# Single-column indexes that are now the leading column of a composite one
+REDUNDANT_INDEXES = [
+    ('ix_messages_sender_address', 'messages', ['sender_address']),
+    ('ix_file_chunks_secret_id', 'file_chunks', ['secret_id']),
+    ('ix_group_members_channel_id', 'group_members', ['channel_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Drop duplicates the new unique indexes would reject (keep the first membership,
+    # the latest subscription per endpoint)
+    op.execute(
+        "DELETE FROM group_members WHERE id NOT IN "
+        "(SELECT min_id FROM (SELECT MIN(id) AS min_id FROM group_members GROUP BY channel_id, user_address) AS keep)"
+    )
+    op.execute(
+        "DELETE FROM push_subscriptions WHERE id NOT IN "
+        "(SELECT max_id FROM (SELECT MAX(id) AS max_id FROM push_subscriptions GROUP BY endpoint) AS keep)"
+    )
+
+    # IF [NOT] EXISTS: databases bootstrapped with create_all may already match the models
+    for name, table, columns, unique in NEW_INDEXES:
+        op.create_index(name, table, columns, unique=unique, if_not_exists=True)
+    for name, table, _ in REDUNDANT_INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, columns in REDUNDANT_INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+    for name, table, _, _ in reversed(NEW_INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
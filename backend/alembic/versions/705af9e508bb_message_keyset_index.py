@@ -0,0 +1,31 @@
+"""message keyset index
+
+Revision ID: 705af9e508bb
+Revises: b41d7c9e2a6f
+Create Date: 2026-10-17 16:21:07.334815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '705af9e508bb'
+down_revision: Union[str, Sequence[str], None] = 'b41d7c9e2a6f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # History pages by id (keyset) instead of created_at + OFFSET
+    op.create_index('ix_messages_sender_recipient_id', 'messages', ['sender_id', 'recipient_id', 'id'], unique=False, if_not_exists=True)
+    op.drop_index('ix_messages_sender_recipient_created_at', table_name='messages', if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_messages_sender_recipient_created_at', 'messages', ['sender_id', 'recipient_id', 'created_at'], unique=False, if_not_exists=True)
+    op.drop_index('ix_messages_sender_recipient_id', table_name='messages', if_exists=True)
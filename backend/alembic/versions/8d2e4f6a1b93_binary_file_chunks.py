@@ -0,0 +1,74 @@
+"""binary file chunks
+
+Revision ID: 8d2e4f6a1b93
+Revises: f3b7a91c2d48
+Create Date: 2026-10-17 22:03:41.276904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2e4f6a1b93'
+down_revision: Union[str, Sequence[str], None] = 'f3b7a91c2d48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Rows converted per round trip, so large vaults aren't loaded into memory at once
+BATCH_SIZE = 200
+
+
+def _convert(source: str, target: str, convert) -> None:
+    """Fill file_chunks.<target> from <source>, walking the table by id."""
+    chunks = sa.table('file_chunks', sa.column('id', sa.Integer), sa.column(source), sa.column(target))
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(chunks.c.id, chunks.c[source]).where(chunks.c.id > last_id).order_by(chunks.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            chunks.update().where(chunks.c.id == sa.bindparam('chunk_id')).values({target: sa.bindparam('value')}),
+            [{'chunk_id': row[0], 'value': convert(row[1])} for row in rows],
+        )
+        last_id = rows[-1][0]
+
+
+def _from_hex(data):
+    if data is None:
+        return None
+    try:
+        return bytes.fromhex(data)
+    except ValueError:
+        # Not written by a hex client; keep the text as-is rather than lose it
+        return data.encode()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('file_chunks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('encrypted_data_bin', sa.LargeBinary(), nullable=True))
+
+    # Hex text -> raw bytes: half the storage, no decoding per download
+    _convert('encrypted_data', 'encrypted_data_bin', _from_hex)
+
+    with op.batch_alter_table('file_chunks', schema=None) as batch_op:
+        batch_op.drop_column('encrypted_data')
+        batch_op.alter_column('encrypted_data_bin', new_column_name='encrypted_data')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('file_chunks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('encrypted_data_hex', sa.Text(), nullable=True))
+
+    _convert('encrypted_data', 'encrypted_data_hex', lambda data: None if data is None else bytes(data).hex())
+
+    with op.batch_alter_table('file_chunks', schema=None) as batch_op:
+        batch_op.drop_column('encrypted_data')
+        batch_op.alter_column('encrypted_data_hex', new_column_name='encrypted_data')
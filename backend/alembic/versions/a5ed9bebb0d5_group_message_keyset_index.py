@@ -0,0 +1,31 @@
+"""group message keyset index
+
+Revision ID: a5ed9bebb0d5
+Revises: 705af9e508bb
+Create Date: 2026-10-17 17:02:44.915270
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5ed9bebb0d5'
+down_revision: Union[str, Sequence[str], None] = '705af9e508bb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Group history pages by id (keyset); supersedes the channel_id index
+    op.create_index('ix_group_messages_channel_id_id', 'group_messages', ['channel_id', 'id'], unique=False, if_not_exists=True)
+    op.drop_index('ix_group_messages_channel_id', table_name='group_messages', if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_group_messages_channel_id', 'group_messages', ['channel_id'], unique=False, if_not_exists=True)
+    op.drop_index('ix_group_messages_channel_id_id', table_name='group_messages', if_exists=True)
@@ -0,0 +1,183 @@
+"""surrogate user ids
+
+Revision ID: b41d7c9e2a6f
+Revises: 5eca37a247d8
+Create Date: 2026-10-17 14:05:12.480913
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41d7c9e2a6f'
+down_revision: Union[str, Sequence[str], None] = '5eca37a247d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (table, address column, id column)
+USER_FKS = [
+    ('secrets', 'owner_address', 'owner_id'),
+    ('access_grants', 'grantee_address', 'grantee_id'),
+    ('documents', 'owner_address', 'owner_id'),
+    ('multisig_workflows', 'owner_address', 'owner_id'),
+    ('multisig_workflow_signers', 'user_address', 'user_id'),
+    ('multisig_workflow_recipients', 'user_address', 'user_id'),
+    ('messages', 'sender_address', 'sender_id'),
+    ('messages', 'recipient_address', 'recipient_id'),
+    ('group_channels', 'owner_address', 'owner_id'),
+    ('group_members', 'user_address', 'user_id'),
+    ('group_messages', 'sender_address', 'sender_id'),
+    ('push_subscriptions', 'user_address', 'user_id'),
+]
+TABLES = list(dict.fromkeys(table for table, _, _ in USER_FKS))
+
+# (name, table, columns, unique)
+ID_INDEXES = [
+    ('ix_secrets_owner_id', 'secrets', ['owner_id'], False),
+    ('ix_access_grants_secret_id_grantee_id', 'access_grants', ['secret_id', 'grantee_id'], False),
+    ('ix_access_grants_grantee_id', 'access_grants', ['grantee_id'], False),
+    ('ix_documents_owner_id', 'documents', ['owner_id'], False),
+    ('ix_multisig_workflows_owner_id', 'multisig_workflows', ['owner_id'], False),
+    ('ix_multisig_workflow_signers_workflow_id_user_id', 'multisig_workflow_signers', ['workflow_id', 'user_id'], False),
+    ('ix_multisig_workflow_signers_user_id', 'multisig_workflow_signers', ['user_id'], False),
+    ('ix_multisig_workflow_recipients_workflow_id_user_id', 'multisig_workflow_recipients', ['workflow_id', 'user_id'], False),
+    ('ix_multisig_workflow_recipients_user_id', 'multisig_workflow_recipients', ['user_id'], False),
+    ('ix_messages_sender_recipient_created_at', 'messages', ['sender_id', 'recipient_id', 'created_at'], False),
+    ('ix_messages_recipient_id', 'messages', ['recipient_id'], False),
+    ('uq_group_members_channel_id_user_id', 'group_members', ['channel_id', 'user_id'], True),
+    ('ix_group_members_user_id', 'group_members', ['user_id'], False),
+    ('ix_group_messages_sender_id', 'group_messages', ['sender_id'], False),
+    ('ix_push_subscriptions_user_id', 'push_subscriptions', ['user_id'], False),
+]
+
+ADDRESS_INDEXES = [
+    ('ix_secrets_owner_address', 'secrets', ['owner_address'], False),
+    ('ix_access_grants_secret_id_grantee_address', 'access_grants', ['secret_id', 'grantee_address'], False),
+    ('ix_access_grants_grantee_address', 'access_grants', ['grantee_address'], False),
+    ('ix_documents_owner_address', 'documents', ['owner_address'], False),
+    ('ix_multisig_workflows_owner_address', 'multisig_workflows', ['owner_address'], False),
+    ('ix_multisig_workflow_signers_workflow_id_user_address', 'multisig_workflow_signers', ['workflow_id', 'user_address'], False),
+    ('ix_multisig_workflow_signers_user_address', 'multisig_workflow_signers', ['user_address'], False),
+    ('ix_multisig_workflow_recipients_workflow_id_user_address', 'multisig_workflow_recipients', ['workflow_id', 'user_address'], False),
+    ('ix_multisig_workflow_recipients_user_address', 'multisig_workflow_recipients', ['user_address'], False),
+    ('ix_messages_sender_recipient_created_at', 'messages', ['sender_address', 'recipient_address', 'created_at'], False),
+    ('ix_messages_recipient_address', 'messages', ['recipient_address'], False),
+    ('uq_group_members_channel_id_user_address', 'group_members', ['channel_id', 'user_address'], True),
+    ('ix_group_members_user_address', 'group_members', ['user_address'], False),
+    ('ix_group_messages_sender_address', 'group_messages', ['sender_address'], False),
+    ('ix_push_subscriptions_user_address', 'push_subscriptions', ['user_address'], False),
+]
+
+
+def _users_table(primary_key):
+    """users as SQLite batch mode should rebuild it (primary key on `id` or `address`)."""
+    return sa.Table(
+        'users', sa.MetaData(),
+        sa.Column('id', sa.Integer(), primary_key=primary_key == 'id', nullable=primary_key != 'id'),
+        sa.Column('address', sa.String(), primary_key=primary_key == 'address', nullable=False),
+        sa.Column('address_hash', sa.LargeBinary(length=32), nullable=primary_key != 'id'),
+        sa.Column('username', sa.String(), nullable=True),
+        sa.Column('encryption_public_key', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+
+
+def _drop_indexes_on(table, columns):
+    """Drop every index of `table` touching one of `columns` (names differ between migrated and create_all databases)."""
+    for index in sa.inspect(op.get_bind()).get_indexes(table):
+        if set(index['column_names']) & set(columns):
+            op.drop_index(index['name'], table_name=table)
+
+
+def _drop_user_fks():
+    """PostgreSQL: FKs into users must go before its primary key changes (SQLite drops them with the column)."""
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        for fk in inspector.get_foreign_keys(table):
+            if fk['referred_table'] == 'users':
+                op.drop_constraint(fk['name'], table, type_='foreignkey')
+
+
+def _set_users_primary_key(column):
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        with op.batch_alter_table('users', recreate='always', copy_from=_users_table(column)):
+            pass
+        return
+    pk_name = sa.inspect(bind).get_pk_constraint('users')['name']
+    op.drop_constraint(pk_name, 'users', type_='primary')
+    op.create_primary_key('users_pkey', 'users', [column])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    sqlite = bind.dialect.name == 'sqlite'
+
+    # 1. users.id (IDENTITY fills existing rows on PostgreSQL; SQLite takes the rowid)
+    op.add_column('users', sa.Column('id', sa.Integer(), sa.Identity(), nullable=sqlite))
+    op.add_column('users', sa.Column('address_hash', sa.LargeBinary(length=32), nullable=True))
+    if sqlite:
+        op.execute('UPDATE users SET id = rowid')
+    users = sa.table('users', sa.column('address', sa.String()), sa.column('address_hash', sa.LargeBinary()))
+    for (address,) in bind.execute(sa.select(users.c.address)).all():
+        bind.execute(users.update().where(users.c.address == address)
+                     .values(address_hash=hashlib.sha256(address.encode()).digest()))
+
+    # 2. Integer FK columns, backfilled by address (dangling addresses become NULL)
+    for table, address_col, id_col in USER_FKS:
+        op.add_column(table, sa.Column(id_col, sa.Integer(), nullable=True))
+        op.execute(f'UPDATE {table} SET {id_col} = (SELECT users.id FROM users WHERE users.address = {table}.{address_col})')
+
+    # 3. Move the primary key
+    if not sqlite:
+        _drop_user_fks()
+        op.alter_column('users', 'address_hash', nullable=False)
+    _drop_indexes_on('users', ['address'])
+    _set_users_primary_key('id')
+    op.create_index('ix_users_address_hash', 'users', ['address_hash'], unique=True)
+
+    # 4. Drop the address columns and point the FKs at users.id
+    for table in TABLES:
+        fks = [(a, i) for t, a, i in USER_FKS if t == table]
+        _drop_indexes_on(table, [a for a, _ in fks])
+        with op.batch_alter_table(table) as batch_op:
+            for address_col, id_col in fks:
+                batch_op.drop_column(address_col)
+                batch_op.create_foreign_key(f'{table}_{id_col}_fkey', 'users', [id_col], ['id'])
+    for name, table, columns, unique in ID_INDEXES:
+        op.create_index(name, table, columns, unique=unique)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+
+    for table, address_col, id_col in USER_FKS:
+        op.add_column(table, sa.Column(address_col, sa.String(), nullable=True))
+        op.execute(f'UPDATE {table} SET {address_col} = (SELECT users.address FROM users WHERE users.id = {table}.{id_col})')
+    if not sqlite:
+        _drop_user_fks()
+    for name, table, _, _ in ID_INDEXES:
+        op.drop_index(name, table_name=table)
+
+    op.drop_index('ix_users_address_hash', table_name='users')
+    _set_users_primary_key('address')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('address_hash')
+        batch_op.drop_column('id')
+    op.create_index('ix_users_address', 'users', ['address'], unique=False)
+
+    for table in TABLES:
+        fks = [(a, i) for t, a, i in USER_FKS if t == table]
+        with op.batch_alter_table(table) as batch_op:
+            for address_col, id_col in fks:
+                batch_op.drop_column(id_col)
+                batch_op.create_foreign_key(f'{table}_{address_col}_fkey', 'users', [address_col], ['address'])
+    for name, table, columns, unique in ADDRESS_INDEXES:
+        op.create_index(name, table, columns, unique=unique)
@@ -0,0 +1,36 @@
+"""group member read position
+
+Revision ID: c5d614f85f17
+Revises: e934573dc3b8
+Create Date: 2026-10-17 19:04:51.226318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d614f85f17'
+down_revision: Union[str, Sequence[str], None] = 'e934573dc3b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('group_members', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_read_message_id', sa.Integer(), nullable=True))
+
+    # Existing members start caught up rather than with their whole history unread
+    op.execute(
+        'UPDATE group_members SET last_read_message_id = '
+        '(SELECT MAX(group_messages.id) FROM group_messages WHERE group_messages.channel_id = group_members.channel_id)'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('group_members', schema=None) as batch_op:
+        batch_op.drop_column('last_read_message_id')
@@ -0,0 +1,39 @@
+"""multisig signature counters
+
+Revision ID: e6dc522a6af1
+Revises: c5d614f85f17
+Create Date: 2026-10-17 19:48:26.730158
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6dc522a6af1'
+down_revision: Union[str, Sequence[str], None] = 'c5d614f85f17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('multisig_workflows', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('required_signatures', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('signed_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Counts of the existing signer rows
+    op.execute(
+        'UPDATE multisig_workflows SET '
+        'required_signatures = (SELECT COUNT(*) FROM multisig_workflow_signers s WHERE s.workflow_id = multisig_workflows.id), '
+        'signed_count = (SELECT COUNT(*) FROM multisig_workflow_signers s WHERE s.workflow_id = multisig_workflows.id AND s.has_signed = true)'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('multisig_workflows', schema=None) as batch_op:
+        batch_op.drop_column('signed_count')
+        batch_op.drop_column('required_signatures')
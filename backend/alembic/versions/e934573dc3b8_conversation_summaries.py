@@ -0,0 +1,63 @@
+"""conversation summaries
+
+Revision ID: e934573dc3b8
+Revises: a5ed9bebb0d5
+Create Date: 2026-10-17 18:12:30.517402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e934573dc3b8'
+down_revision: Union[str, Sequence[str], None] = 'a5ed9bebb0d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Same rows as utils.conversations.expected_summaries(), without importing the app
+BACKFILL = """
+INSERT INTO conversation_summaries (user_id, partner_id, last_message_id, last_activity, unread_count)
+SELECT g.user_id, g.partner_id, g.last_message_id, m.created_at, g.unread_count
+FROM (
+    SELECT user_id, partner_id, MAX(message_id) AS last_message_id, SUM(unread) AS unread_count
+    FROM (
+        SELECT sender_id AS user_id, recipient_id AS partner_id, id AS message_id, 0 AS unread
+        FROM messages WHERE sender_id IS NOT NULL AND recipient_id IS NOT NULL
+        UNION ALL
+        SELECT recipient_id, sender_id, id, CASE WHEN is_read = false THEN 1 ELSE 0 END
+        FROM messages WHERE sender_id IS NOT NULL AND recipient_id IS NOT NULL
+    ) AS both_directions
+    GROUP BY user_id, partner_id
+) AS g
+JOIN messages m ON m.id = g.last_message_id
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('conversation_summaries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('partner_id', sa.Integer(), nullable=False),
+    sa.Column('last_message_id', sa.Integer(), nullable=False),
+    sa.Column('last_activity', sa.DateTime(), nullable=True),
+    sa.Column('unread_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['last_message_id'], ['messages.id'], ),
+    sa.ForeignKeyConstraint(['partner_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_conversation_summaries_user_id_partner_id', 'conversation_summaries', ['user_id', 'partner_id'], unique=True)
+
+    # Backfill the inbox of existing conversations
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_conversation_summaries_user_id_partner_id', table_name='conversation_summaries')
+    op.drop_table('conversation_summaries')
@@ -0,0 +1,29 @@
+"""access grant expiry index
+
+Revision ID: f3b7a91c2d48
+Revises: e6dc522a6af1
+Create Date: 2026-10-17 21:12:05.418337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b7a91c2d48'
+down_revision: Union[str, Sequence[str], None] = 'e6dc522a6af1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The expiry sweeper walks expired grants in expires_at order
+    op.create_index('ix_access_grants_expires_at', 'access_grants', ['expires_at'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_access_grants_expires_at', table_name='access_grants', if_exists=True)
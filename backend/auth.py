@@ -1,31 +1,24 @@
-from eth_account.messages import encode_defunct
-from eth_account import Account
 from web3 import Web3
 import secrets
 import base64
 import json
 import httpx
 import os
+import hashlib
+import hmac
+import time
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
+import config
+from pqc_client import pqc, verify_batcher
+from server_keys import key_ring
+from crypto_pool import crypto_pool, recover_eth_address, dilithium_verify
 
 # --- PQC Service Config ---
-PQC_SERVICE_URL = os.getenv("PQC_SERVICE_URL", "http://127.0.0.1:3002")
-_SERVER_PUBLIC_KEY = None
-
-def get_server_public_key():
-    global _SERVER_PUBLIC_KEY
-    if _SERVER_PUBLIC_KEY:
-        return _SERVER_PUBLIC_KEY
-    try:
-        secret = os.getenv("PQC_SHARED_SECRET")
-        headers = {"x-api-key": secret} if secret else {}
-        res = httpx.get(f"{PQC_SERVICE_URL}/server-public-key", headers=headers, timeout=2)
-        if res.status_code == 200:
-            _SERVER_PUBLIC_KEY = res.json().get("publicKey")
-            return _SERVER_PUBLIC_KEY
-    except Exception as e:
-        print(f"Error fetching server public key: {e}")
-    return None
+# All sidecar traffic goes through the shared pooled client in pqc_client.py.
+# Server public keys (for verifying our own JWTs) live in the key ring, by `kid`.
 
 def b64url_encode(data: bytes) -> str:
     return base64.urlsafe_b64encode(data).rstrip(b'=').decode('utf-8')
@@ -39,35 +32,117 @@ def b64url_decode(data: str) -> bytes:
 def generate_nonce():
     return secrets.token_hex(16)
 
-def verify_pqc_signature(public_key: str, nonce: str, signature: str) -> bool:
+def _login_message(nonce: str) -> str:
+    # Message format must match frontend
+    return f"Sign in to Secure Log App with nonce: {nonce}"
+
+def _parse_verify_response(response) -> bool:
+    if response.status_code != 200:
+        print(f"ERROR: PQC Service HTTP Error: {response.text}")
+        return False
+    return response.json().get("valid", False)
+
+def _sidecar_verify(message: str, signature_hex: str, public_key: str) -> bool:
+    try:
+        response = pqc.request("POST", "/verify", json={
+            "message": message,
+            "signature": signature_hex,
+            "publicKey": public_key
+        })
+        return _parse_verify_response(response)
+    except httpx.ConnectError:
+        print("CRITICAL ERROR: PQC Service Unavailable. Is 'node backend/pqc_service.js' running?")
+        return False
+
+async def _sidecar_verify_async(message: str, signature_hex: str, public_key: str) -> bool:
     try:
-        # Message format must match frontend
-        message_text = f"Sign in to Secure Log App with nonce: {nonce}"
-        
-        # Call Node.js sidecar service
+        if config.PQC_BATCH_ENABLED:
+            return await verify_batcher.verify(message, signature_hex, public_key)
+        response = await pqc.arequest("POST", "/verify", json={
+            "message": message,
+            "signature": signature_hex,
+            "publicKey": public_key
+        })
+        return _parse_verify_response(response)
+    except httpx.ConnectError:
+        print("CRITICAL ERROR: PQC Service Unavailable. Is 'node backend/pqc_service.js' running?")
+        return False
+
+# --- Signature verifiers ---
+# Both backends take the signed text, the hex signature and the hex public key
+# exactly as the sidecar's /verify endpoint does.
+
+class SignatureVerifier(ABC):
+    name = "base"
+
+    @abstractmethod
+    def verify(self, message: str, signature_hex: str, public_key: str) -> bool:
+        """True when `signature_hex` is a valid signature of `message` by `public_key`."""
+
+    @abstractmethod
+    async def verify_async(self, message: str, signature_hex: str, public_key: str) -> bool:
+        """Non-blocking twin of verify, for async routes."""
+
+class SidecarVerifier(SignatureVerifier):
+    """Verifies through pqc_service.js (batched on the async path)."""
+    name = "sidecar"
+
+    def verify(self, message: str, signature_hex: str, public_key: str) -> bool:
+        return _sidecar_verify(message, signature_hex, public_key)
+
+    async def verify_async(self, message: str, signature_hex: str, public_key: str) -> bool:
+        return await _sidecar_verify_async(message, signature_hex, public_key)
+
+class LocalDilithiumVerifier(SignatureVerifier):
+    """
+    Verifies in-process with the dilithium-crystals-js wasm (see dilithium_wasm.py),
+    so keys and signatures are interchangeable with the sidecar's.
+    """
+    name = "local"
+
+    def __init__(self, wasm_path: str | None = None):
         try:
-            response = httpx.post(
-                f"{PQC_SERVICE_URL}/verify",
-                json={
-                    "message": message_text,
-                    "signature": signature,
-                    "publicKey": public_key
-                },
-                headers={"x-api-key": os.getenv("PQC_SHARED_SECRET")},
-                timeout=5
+            from dilithium_wasm import DilithiumWasm
+            self._dilithium = DilithiumWasm(wasm_path)
+        except ImportError as e:
+            raise RuntimeError("PQC_VERIFIER=local requires the 'wasmtime' package") from e
+        except FileNotFoundError as e:
+            raise RuntimeError(str(e)) from e
+
+    def verify(self, message: str, signature_hex: str, public_key: str) -> bool:
+        try:
+            return self._dilithium.verify(
+                bytes.fromhex(signature_hex), message.encode('utf-8'), bytes.fromhex(public_key)
             )
-            
-            if response.status_code != 200:
-                print(f"ERROR: PQC Service HTTP Error: {response.text}")
-                return False
-                
-            result = response.json()
-            return result.get("valid", False)
-            
-        except httpx.ConnectError:
-            print("CRITICAL ERROR: PQC Service Unavailable. Is 'node backend/pqc_service.js' running?")
+        except ValueError:
+            # Malformed hex is simply an invalid signature
             return False
-            
+
+    async def verify_async(self, message: str, signature_hex: str, public_key: str) -> bool:
+        # Verification is CPU-bound; keep it off the event loop
+        return await crypto_pool.run(
+            dilithium_verify, self._dilithium.wasm_path, message, signature_hex, public_key
+        )
+
+def make_verifier(name: str) -> SignatureVerifier:
+    if name == "sidecar":
+        return SidecarVerifier()
+    if name == "local":
+        return LocalDilithiumVerifier(config.PQC_DILITHIUM_WASM)
+    raise ValueError(f"Unknown PQC_VERIFIER: {name}")
+
+verifier = make_verifier(config.PQC_VERIFIER)
+
+def verify_pqc_signature(public_key: str, nonce: str, signature: str) -> bool:
+    try:
+        return verifier.verify(_login_message(nonce), signature, public_key)
+    except Exception as e:
+        print(f"PQC verification error: {e}")
+        return False
+
+async def verify_pqc_signature_async(public_key: str, nonce: str, signature: str) -> bool:
+    try:
+        return await verifier.verify_async(_login_message(nonce), signature, public_key)
     except Exception as e:
         print(f"PQC verification error: {e}")
         return False
@@ -77,9 +152,19 @@ def verify_signature(address: str, nonce: str, signature: str) -> bool:
         return verify_pqc_signature(address, nonce, signature)
 
     try:
-        message_text = f"Sign in to Secure Log App with nonce: {nonce}"
-        encoded_message = encode_defunct(text=message_text)
-        recovered_address = Account.recover_message(encoded_message, signature=signature)
+        recovered_address = recover_eth_address(_login_message(nonce), signature)
+        return recovered_address.lower() == address.lower()
+    except Exception as e:
+        print(f"Signature verification failed: {e}")
+        return False
+
+async def verify_signature_async(address: str, nonce: str, signature: str) -> bool:
+    """Async twin of verify_signature; ECDSA recovery runs on the crypto worker pool."""
+    if len(address) > 42:
+        return await verify_pqc_signature_async(address, nonce, signature)
+
+    try:
+        recovered_address = await crypto_pool.run(recover_eth_address, _login_message(nonce), signature)
         return recovered_address.lower() == address.lower()
     except Exception as e:
         print(f"Signature verification failed: {e}")
@@ -87,7 +172,7 @@ def verify_signature(address: str, nonce: str, signature: str) -> bool:
 
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-def create_access_token(data: dict, expires_delta: timedelta | None = None):
+def _token_payload_b64(data: dict, expires_delta: timedelta | None) -> str:
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
@@ -96,81 +181,318 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     
     # Store expiry as timestamp
     to_encode.update({"exp": expire.timestamp()})
-    
-    # 1. Prepare Header and Payload
+    return b64url_encode(json.dumps(to_encode).encode('utf-8'))
+
+def _token_message(kid: str | None, payload_b64: str) -> str:
+    # The header names the signing key so verifiers can pick it from the key ring
     header = {"alg": "DILITHIUM2", "typ": "JWT"}
+    if kid:
+        header["kid"] = kid
     header_b64 = b64url_encode(json.dumps(header).encode('utf-8'))
-    payload_b64 = b64url_encode(json.dumps(to_encode).encode('utf-8'))
-    
-    message = f"{header_b64}.{payload_b64}"
-    
-    # 2. Sign via PQC Service
+    return f"{header_b64}.{payload_b64}"
+
+def _signed_key_id(res, kid: str | None) -> str | None:
+    """Key id the sidecar signed with, if it differs from the one in our header."""
+    if res.status_code != 200:
+        raise Exception(f"Signing failed: {res.text}")
+    signed_kid = res.json().get("keyId")
+    return signed_kid if signed_kid and signed_kid != kid else None
+
+def _finish_token(message: str, res) -> str:
+    # Convert hex signature to base64url for compact JWT format
+    signature_bytes = bytes.fromhex(res.json()["signature"])
+    return f"{message}.{b64url_encode(signature_bytes)}"
+
+def create_access_token(data: dict, expires_delta: timedelta | None = None):
+    payload_b64 = _token_payload_b64(data, expires_delta)
+
+    # Sign via PQC Service
+    try:
+        kid = key_ring.current_kid or key_ring.refresh()
+        message = _token_message(kid, payload_b64)
+        res = pqc.request("POST", "/sign", json={"message": message})
+        signed_kid = _signed_key_id(res, kid)
+        if signed_kid:
+            # The sidecar rotated keys since our last refresh: pick up the new key and re-sign
+            kid = key_ring.refresh() or signed_kid
+            message = _token_message(kid, payload_b64)
+            res = pqc.request("POST", "/sign", json={"message": message})
+            _signed_key_id(res, kid)
+        return _finish_token(message, res)
+    except Exception as e:
+        print(f"Token creation failed: {e}")
+        return None
+
+async def create_access_token_async(data: dict, expires_delta: timedelta | None = None):
+    """Async twin of create_access_token for async routes."""
+    payload_b64 = _token_payload_b64(data, expires_delta)
+
     try:
-        secret = os.getenv("PQC_SHARED_SECRET")
-        headers = {"x-api-key": secret}
-        res = httpx.post(f"{PQC_SERVICE_URL}/sign", json={"message": message}, headers=headers, timeout=5)
-        if res.status_code != 200:
-            raise Exception(f"Signing failed: {res.text}")
-        
-        signature_hex = res.json()["signature"]
-        # Convert hex signature to base64url for compact JWT format
-        signature_bytes = bytes.fromhex(signature_hex)
-        signature_b64 = b64url_encode(signature_bytes)
-        
-        return f"{message}.{signature_b64}"
+        kid = key_ring.current_kid or await key_ring.arefresh()
+        message = _token_message(kid, payload_b64)
+        res = await pqc.arequest("POST", "/sign", json={"message": message})
+        signed_kid = _signed_key_id(res, kid)
+        if signed_kid:
+            kid = await key_ring.arefresh() or signed_kid
+            message = _token_message(kid, payload_b64)
+            res = await pqc.arequest("POST", "/sign", json={"message": message})
+            _signed_key_id(res, kid)
+        return _finish_token(message, res)
     except Exception as e:
         print(f"Token creation failed: {e}")
         return None
 
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache of JWTs whose Dilithium signature was already verified.
+    Keyed by SHA-256 of the raw token; each entry lives until the token's `exp`.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token: str):
+        key = self._digest(token)
+        now = datetime.now(timezone.utc).timestamp()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            exp, payload = entry
+            if now > exp:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(payload)
+
+    def put(self, token: str, payload: dict):
+        exp = payload.get("exp")
+        # Tokens without an expiry are never cached: there is nothing to bound their lifetime
+        if not exp or self.max_size <= 0:
+            return
+        key = self._digest(token)
+        with self._lock:
+            self._entries[key] = (exp, dict(payload))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, token: str) -> bool:
+        """Drop a single token so its next use is re-verified by the PQC service."""
+        with self._lock:
+            return self._entries.pop(self._digest(token), None) is not None
+
+    def clear(self):
+        """Empty the cache and reset its counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+token_cache = VerifiedTokenCache(config.TOKEN_CACHE_MAX_SIZE)
+
+def _split_token(token: str):
+    """Return (signed message, signature hex, payload b64, kid) or None if malformed."""
+    parts = token.split('.')
+    if len(parts) != 3:
+        return None
+
+    header_b64, payload_b64, signature_b64 = parts
+    message = f"{header_b64}.{payload_b64}"
+    signature_hex = b64url_decode(signature_b64).hex()
+    # Tokens issued before key ids were introduced carry no kid: use the current key
+    kid = json.loads(b64url_decode(header_b64)).get("kid")
+    return message, signature_hex, payload_b64, kid
+
+def _load_payload(token: str, payload_b64: str):
+    """Decode a verified payload, reject it if expired and cache it otherwise."""
+    payload_json = b64url_decode(payload_b64).decode('utf-8')
+    payload = json.loads(payload_json)
+
+    exp = payload.get("exp")
+    if exp:
+        if datetime.now(timezone.utc).timestamp() > exp:
+            return None
+
+    token_cache.put(token, payload)
+    return payload
+
 def decode_access_token(token: str):
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
     try:
-        parts = token.split('.')
-        if len(parts) != 3:
+        parsed = _split_token(token)
+        if not parsed:
             return None
-            
-        header_b64, payload_b64, signature_b64 = parts
-        message = f"{header_b64}.{payload_b64}"
-        
-        # 1. Decode Signature
-        signature_bytes = b64url_decode(signature_b64)
-        signature_hex = signature_bytes.hex()
-        
-        # 2. Get Server Key
-        server_key = get_server_public_key()
+        message, signature_hex, payload_b64, kid = parsed
+
+        server_key = key_ring.resolve(kid)
         if not server_key:
             return None
-            
-        # 3. Verify via PQC Service (Using the message as the data signed)
-        res = httpx.post(
-            f"{PQC_SERVICE_URL}/verify",
-            json={
-                "message": message,
-                "signature": signature_hex,
-                "publicKey": server_key
-            },
-            headers={"x-api-key": os.getenv("PQC_SHARED_SECRET")},
-            timeout=2
-        )
-        
-        valid = False
-        if res.status_code == 200:
-            valid = res.json().get("valid", False)
-            
-        if not valid:
+
+        if not verifier.verify(message, signature_hex, server_key):
             return None
-            
-        # 4. Decode Payload if valid
-        payload_json = b64url_decode(payload_b64).decode('utf-8')
-        payload = json.loads(payload_json)
-        
-        # 5. Check Expiry
-        exp = payload.get("exp")
-        if exp:
-            if datetime.now(timezone.utc).timestamp() > exp:
-                return None
-                
-        return payload
-        
+
+        return _load_payload(token, payload_b64)
+
+    except Exception as e:
+        print(f"Token decode error: {e}")
+        return None
+
+async def decode_access_token_async(token: str):
+    """Async twin of decode_access_token for async routes and the /ws handler."""
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
+    try:
+        parsed = _split_token(token)
+        if not parsed:
+            return None
+        message, signature_hex, payload_b64, kid = parsed
+
+        server_key = await key_ring.aresolve(kid)
+        if not server_key:
+            return None
+
+        if not await verifier.verify_async(message, signature_hex, server_key):
+            return None
+
+        return _load_payload(token, payload_b64)
+
     except Exception as e:
         print(f"Token decode error: {e}")
         return None
+
+# --- Session tickets ---
+# A short-lived HMAC-SHA256 ticket bound to one JWT (by its SHA-256 digest).
+# Presented alongside that JWT, it replaces the Dilithium check with a local
+# constant-time MAC comparison. Tickets never outlive the JWT's `exp` and are
+# revoked together with it by invalidate_token().
+
+SESSION_TICKET_HEADER = "X-Session-Ticket"
+_TICKET_KEY = None
+
+def _ticket_key() -> bytes:
+    global _TICKET_KEY
+    if _TICKET_KEY is None:
+        secret = os.getenv("SAFELOG_SECRET_KEY")
+        if not secret:
+            # Tickets then only validate in this process; clients fall back to the JWT
+            print("WARNING: SAFELOG_SECRET_KEY not set. Session tickets use a per-process key.")
+            secret = secrets.token_hex(32)
+        # Derived key, so the ticket MAC never reuses the PQC key seed directly
+        _TICKET_KEY = hmac.new(secret.encode('utf-8'), b"safelog-session-ticket-v1", hashlib.sha256).digest()
+    return _TICKET_KEY
+
+def _ticket_mac(body: str) -> str:
+    return b64url_encode(hmac.new(_ticket_key(), body.encode('utf-8'), hashlib.sha256).digest())
+
+class TicketRevocations:
+    """
+    Denylist of JWT digests whose tickets were revoked. Tickets issued at or before
+    the revocation time are rejected; entries are pruned once every such ticket has expired.
+    """
+
+    def __init__(self):
+        self._revoked: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, digest: str, until: float):
+        now = time.time()
+        with self._lock:
+            self._revoked = {d: v for d, v in self._revoked.items() if v[1] > now}
+            self._revoked[digest] = (now, until)
+
+    def is_revoked(self, digest: str, issued_at: float) -> bool:
+        with self._lock:
+            entry = self._revoked.get(digest)
+        return entry is not None and issued_at <= entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._revoked.clear()
+
+ticket_revocations = TicketRevocations()
+
+def _unverified_payload(token: str) -> dict:
+    parsed = _split_token(token)
+    if not parsed:
+        raise ValueError("Malformed token")
+    return json.loads(b64url_decode(parsed[2]).decode('utf-8'))
+
+def issue_session_ticket(token: str, payload: dict | None = None) -> str | None:
+    """
+    Issue a ticket for a JWT whose signature has already been verified, or that this
+    server just minted (then `payload` may be omitted and is read from the token).
+    """
+    if not config.SESSION_TICKETS_ENABLED or not token:
+        return None
+    if payload is None:
+        payload = _unverified_payload(token)
+    now = time.time()
+    exp = now + config.SESSION_TICKET_TTL_SECONDS
+    if payload.get("exp"):
+        exp = min(exp, payload["exp"])
+    body = b64url_encode(json.dumps({
+        "tok": VerifiedTokenCache._digest(token),
+        "iat": now,
+        "exp": exp,
+    }).encode('utf-8'))
+    return f"{body}.{_ticket_mac(body)}"
+
+def verify_session_ticket(ticket: str, token: str):
+    """Return the JWT payload if `ticket` is a valid, unexpired ticket for `token`, else None."""
+    if not config.SESSION_TICKETS_ENABLED or not ticket or not token:
+        return None
+    try:
+        body, mac = ticket.split('.')
+        if not hmac.compare_digest(mac, _ticket_mac(body)):
+            return None
+        claims = json.loads(b64url_decode(body))
+
+        digest = VerifiedTokenCache._digest(token)
+        if not hmac.compare_digest(claims["tok"], digest):
+            return None
+        if time.time() > claims["exp"] or ticket_revocations.is_revoked(digest, claims["iat"]):
+            return None
+
+        # The ticket authenticates these exact JWT bytes, so its payload is trusted as-is
+        payload = _unverified_payload(token)
+        exp = payload.get("exp")
+        if exp and time.time() > exp:
+            return None
+        return payload
+    except Exception:
+        return None
+
+def invalidate_token(token: str) -> bool:
+    """Drop a token from the verified cache and revoke its session tickets, forcing re-verification."""
+    ticket_revocations.revoke(
+        VerifiedTokenCache._digest(token), time.time() + config.SESSION_TICKET_TTL_SECONDS
+    )
+    return token_cache.invalidate(token)
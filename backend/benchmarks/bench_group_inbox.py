@@ -0,0 +1,127 @@
+"""
+Benchmark: GET /groups inbox for a user in many groups, per-channel loop vs one query.
+
+Seeds a user who belongs to --groups channels (each with a few other members
+and --messages messages) into a fresh SQLite file, then times building the
+inbox the old way (load channels, then one "latest message" query per channel,
+sorted in Python, no unread counts) and with _group_inbox, which
+/groups now runs (latest message and unread count for every channel in one
+query). Counts the SQL statements each issues. From backend/:
+
+    python benchmarks/bench_group_inbox.py --groups 500 --messages 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.orm import joinedload, sessionmaker
+
+import models
+from database import configure_engine, engine_kwargs
+from routers.groups import _group_inbox
+
+MEMBERS_PER_GROUP = 5
+
+
+def _seed(engine, groups: int, messages: int):
+    models.Base.metadata.create_all(bind=engine)
+    users = MEMBERS_PER_GROUP * 20
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__), [
+            {"id": i, "address": f"bench_user_{i}", "address_hash": models.address_hash(f"bench_user_{i}")}
+            for i in range(1, users + 1)
+        ])
+        conn.execute(insert(models.GroupChannel.__table__), [
+            {"id": f"g{g}", "name": f"Group {g}", "owner_id": 1, "created_at": start} for g in range(groups)
+        ])
+        # User 1 is in every group, with a rotating set of others
+        members = [(g, [1] + [2 + (g + k) % (users - 1) for k in range(MEMBERS_PER_GROUP - 1)]) for g in range(groups)]
+        conn.execute(insert(models.GroupMember.__table__), [
+            {"channel_id": f"g{g}", "user_id": uid, "role": "member", "last_read_message_id": None}
+            for g, uids in members for uid in uids
+        ])
+        rows = [
+            {"channel_id": f"g{g}", "sender_id": uids[i % len(uids)], "content": "x" * 64,
+             "created_at": start + timedelta(seconds=i * groups + g)}
+            for i in range(messages) for g, uids in members
+        ]
+        for offset in range(0, len(rows), 50_000):
+            conn.execute(insert(models.GroupMessage.__table__), rows[offset:offset + 50_000])
+        # Half the groups are read up to a recent message
+        conn.exec_driver_sql(
+            "UPDATE group_members SET last_read_message_id = "
+            "(SELECT MAX(id) - 10 FROM group_messages WHERE group_messages.channel_id = group_members.channel_id) "
+            "WHERE user_id = 1 AND CAST(SUBSTR(channel_id, 2) AS INTEGER) % 2 = 0"
+        )
+
+
+def _loop_inbox(db, user_id):
+    """The per-channel inbox list_groups built before."""
+    memberships = select(models.GroupMember.channel_id).where(models.GroupMember.user_id == user_id)
+    channels = (
+        db.query(models.GroupChannel)
+        .options(joinedload(models.GroupChannel.members).joinedload(models.GroupMember.user))
+        .filter(models.GroupChannel.id.in_(memberships))
+        .all()
+    )
+    result = []
+    for ch in channels:
+        last_msg = (
+            db.query(models.GroupMessage)
+            .options(joinedload(models.GroupMessage.sender))
+            .filter(models.GroupMessage.channel_id == ch.id)
+            .order_by(models.GroupMessage.created_at.desc())
+            .first()
+        )
+        result.append((ch, last_msg, 0))
+    result.sort(key=lambda r: r[1].created_at if r[1] else r[0].created_at, reverse=True)
+    return result
+
+
+def _time(db, fn, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        db.expunge_all()
+        t0 = time.perf_counter()
+        rows = fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--groups", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=200, help="messages per group")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'inbox.db')}"
+        engine = configure_engine(create_engine(url, **engine_kwargs(url)))
+        _seed(engine, args.groups, args.messages)
+        Session = sessionmaker(bind=engine)
+
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *a: statements.append(1))
+        print(f"{'inbox':>10} {'ms':>10} {'queries':>8} {'unread':>8}")
+        with Session() as db:
+            for label, fn in (("loop", lambda: _loop_inbox(db, 1)), ("one query", lambda: _group_inbox(db, 1))):
+                ms, rows = _time(db, fn, args.repeats)
+                statements.clear()
+                db.expunge_all()
+                fn()
+                unread = sum(r[2] for r in rows)
+                print(f"{label:>10} {ms:>10.2f} {len(statements):>8} {unread:>8}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
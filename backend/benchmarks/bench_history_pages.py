@@ -0,0 +1,99 @@
+"""
+Benchmark: direct-message history page latency by depth, OFFSET vs keyset.
+
+Seeds one conversation (both directions) into a fresh SQLite file, then times
+fetching a page at increasing depths with the old query (OR of both
+directions, ORDER BY created_at DESC LIMIT/OFFSET) and with the keyset query
+/messages/history now runs (before_id on (sender_id, recipient_id, id)).
+From backend/:
+
+    python benchmarks/bench_history_pages.py --messages 1000000 --limit 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import Index, create_engine, insert, or_
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import configure_engine, engine_kwargs
+from routers.messenger import _history_ids
+
+
+def _seed(engine, count: int):
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__), [
+            {"id": i, "address": f"bench_user_{i}", "address_hash": models.address_hash(f"bench_user_{i}")}
+            for i in (1, 2)
+        ])
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        batch = 50_000
+        for offset in range(0, count, batch):
+            conn.execute(insert(models.Message.__table__), [
+                {"sender_id": 1 + i % 2, "recipient_id": 2 - i % 2, "content": "x" * 64,
+                 "is_read": True, "created_at": start + timedelta(seconds=i)}
+                for i in range(offset, min(offset + batch, count))
+            ])
+        # The index the OFFSET query used before keyset pagination replaced it
+        m = models.Message
+        Index("ix_messages_sender_recipient_created_at", m.sender_id, m.recipient_id, m.created_at).create(conn)
+
+
+def _offset_page(db, depth, limit):
+    m = models.Message
+    return db.query(m).filter(or_(
+        (m.sender_id == 1) & (m.recipient_id == 2),
+        (m.sender_id == 2) & (m.recipient_id == 1),
+    )).order_by(m.created_at.desc()).limit(limit).offset(depth).all()
+
+
+def _keyset_page(db, before_id, limit):
+    m = models.Message
+    return db.query(m).filter(m.id.in_(_history_ids(1, 2, before_id, None, limit + 1))) \
+        .order_by(m.id.desc()).limit(limit + 1).all()
+
+
+def _time(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'history.db')}"
+        engine = configure_engine(create_engine(url, **engine_kwargs(url)))
+        _seed(engine, args.messages)
+        Session = sessionmaker(bind=engine)
+
+        print(f"{'depth':>10} {'offset ms':>10} {'keyset ms':>10}")
+        depths = [d for d in (0, 1_000, 10_000, 100_000, 500_000, 990_000) if d < args.messages]
+        with Session() as db:
+            for depth in depths:
+                before_id = args.messages - depth + 1  # ids are 1..N, newest last
+                offset_ms = _time(lambda: _offset_page(db, depth, args.limit), args.repeats)
+                keyset_ms = _time(lambda: _keyset_page(db, before_id, args.limit), args.repeats)
+                db.expunge_all()
+                print(f"{depth:>10} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: Ethereum login signature checks per second vs crypto worker pool size.
+
+Runs the CPU-bound part of /auth/login (auth.verify_signature_async, i.e.
+secp256k1 recovery + keccak) for a burst of concurrent logins, once per pool
+size, so the scaling with cores is visible. From backend/:
+
+    python benchmarks/bench_login.py -n 2000 --kind process
+    python benchmarks/bench_login.py -n 2000 --kind thread --workers 1,2,4
+
+"off" (inline on the event loop) is always included as the baseline.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+import auth
+from crypto_pool import CryptoPool
+
+
+def _make_logins(n: int):
+    account = Account.create()
+    logins = []
+    for i in range(n):
+        nonce = f"{i:032x}"
+        message = encode_defunct(text=auth._login_message(nonce))
+        logins.append((account.address, nonce, account.sign_message(message).signature.hex()))
+    return logins
+
+
+async def _burst(logins) -> float:
+    start = time.perf_counter()
+    results = await asyncio.gather(*(auth.verify_signature_async(*login) for login in logins))
+    elapsed = time.perf_counter() - start
+    if not all(results):
+        raise RuntimeError("a login signature failed to verify")
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=2000, help="logins per run")
+    parser.add_argument("--kind", default="process", choices=["process", "thread"])
+    cores = os.cpu_count() or 1
+    default_sizes = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+    parser.add_argument("--workers", default=",".join(map(str, default_sizes)), help="comma-separated pool sizes")
+    args = parser.parse_args()
+
+    logins = _make_logins(args.n)
+    runs = [("off", 1)] + [(args.kind, int(w)) for w in args.workers.split(",")]
+    for kind, workers in runs:
+        auth.crypto_pool = CryptoPool(kind, workers)
+        # Warm up: spawn workers and import eth_account in each before timing
+        await _burst(logins[: workers * 4])
+        elapsed = await _burst(logins)
+        auth.crypto_pool.shutdown()
+        label = "inline" if kind == "off" else f"{kind} x{workers}"
+        print(f"{label:<12} {args.n / elapsed:8.0f} logins/s  ({elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
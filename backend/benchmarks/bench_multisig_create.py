@@ -0,0 +1,124 @@
+"""
+Benchmark: creating multisig workflows with many signers, old flow vs one unit of work.
+
+Seeds an owner and --signers signer users into a fresh SQLite file, then
+creates --workflows workflows the old way (three commits, the signer-key map
+rebuilt for every signer, one ORM add and one push-subscription lookup per
+signer) and through create_multisig_workflow as /multisig/workflow now runs it
+(one commit, bulk INSERTs, one subscription lookup). Reports the time per
+workflow and the SQL statements and commits each issues. From backend/:
+
+    python benchmarks/bench_multisig_create.py --signers 200 --workflows 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+import models
+import schemas
+from database import configure_engine, engine_kwargs
+from routers.multisig import create_multisig_workflow
+from utils.push import notify_user_push
+
+
+def _seed(engine, signers: int):
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__), [
+            {"id": i, "address": f"bench_user_{i}", "address_hash": models.address_hash(f"bench_user_{i}")}
+            for i in range(signers + 1)
+        ])
+
+
+def _payload(signers: int):
+    addresses = [f"bench_user_{i}" for i in range(1, signers + 1)]
+    return schemas.MultisigWorkflowCreate(
+        name="Bench",
+        secret_data={"name": "S", "type": "standard", "encrypted_data": "x" * 256, "encrypted_key": "k" * 64},
+        signers=addresses,
+        recipients=addresses[:5],
+        signer_keys={a: "k" * 64 for a in addresses},
+        recipient_keys={},
+    )
+
+
+def _legacy_create(db, workflow, owner):
+    """create_multisig_workflow as it was before the single unit of work."""
+    addresses = {a.lower() for a in workflow.signers + workflow.recipients}
+    users = {u.address: u for u in db.query(models.User).filter(models.User.has_any_address(addresses))}
+    secret = models.Secret(owner_id=owner.id, name=workflow.secret_data.name, type=workflow.secret_data.type,
+                           encrypted_data=workflow.secret_data.encrypted_data)
+    db.add(secret)
+    db.flush()
+    db.add(models.AccessGrant(secret_id=secret.id, grantee_id=owner.id, encrypted_key=workflow.secret_data.encrypted_key))
+    db.commit()
+    db.refresh(secret)
+    wf = models.MultisigWorkflow(name=workflow.name, owner_id=owner.id, secret_id=secret.id, status="pending")
+    db.add(wf)
+    db.commit()
+    db.refresh(wf)
+    for signer_addr in workflow.signers:
+        s_addr = signer_addr.lower()
+        normalized_keys = {k.lower(): v for k, v in workflow.signer_keys.items()}
+        db.add(models.MultisigWorkflowSigner(workflow_id=wf.id, user_id=users[s_addr].id, has_signed=False,
+                                             encrypted_key=normalized_keys.get(s_addr)))
+    for recipient_addr in workflow.recipients:
+        r_addr = recipient_addr.lower()
+        db.add(models.MultisigWorkflowRecipient(workflow_id=wf.id, user_id=users[r_addr].id,
+                                                encrypted_key=workflow.recipient_keys.get(r_addr)))
+    db.commit()
+    db.refresh(wf)
+    for signer_addr in workflow.signers:
+        notify_user_push(db, signer_addr.lower(), title="Signature Required", body="", data={})
+    return wf
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--signers", type=int, default=200)
+    parser.add_argument("--workflows", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'multisig.db')}"
+        engine = configure_engine(create_engine(url, **engine_kwargs(url)))
+        _seed(engine, args.signers)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        payload = _payload(args.signers)
+        # The route without its rate limiter, which needs a real Request
+        create = create_multisig_workflow.__wrapped__
+
+        statements, commits = [], []
+        event.listen(engine, "before_cursor_execute", lambda *a: statements.append(1))
+        event.listen(engine, "commit", lambda *a: commits.append(1))
+
+        print(f"{'flow':>14} {'ms/workflow':>12} {'statements':>11} {'commits':>8}")
+        for label, run in (
+            ("three commits", lambda db, owner: _legacy_create(db, payload, owner)),
+            ("one commit", lambda db, owner: create(None, payload, current_user=owner, db=db)),
+        ):
+            samples = []
+            for _ in range(args.workflows):
+                with Session() as db:
+                    owner = db.get(models.User, 0)
+                    statements.clear()
+                    commits.clear()
+                    t0 = time.perf_counter()
+                    wf = run(db, owner)
+                    samples.append(time.perf_counter() - t0)
+                    counts = len(statements), len(commits)
+                    assert len(wf.signers) == args.signers
+            print(f"{label:>14} {statistics.median(samples) * 1000:>12.2f} {counts[0]:>11} {counts[1]:>8}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
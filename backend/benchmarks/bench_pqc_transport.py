@@ -0,0 +1,86 @@
+"""
+Benchmark: PQC sidecar latency over loopback TCP vs Unix domain socket.
+
+Start two sidecars with the same SAFELOG_SECRET_KEY / PQC_SHARED_SECRET, one on
+TCP and one on a socket, then run this script from backend/:
+
+    node pqc_service.js                                   # TCP on 127.0.0.1:3002
+    PQC_SOCKET_PATH=/tmp/pqc.sock node pqc_service.js     # UDS
+    PQC_SHARED_SECRET=... python benchmarks/bench_pqc_transport.py \
+        --tcp http://127.0.0.1:3002 --uds /tmp/pqc.sock -n 2000 -c 16
+
+Reports mean/p50/p95/p99 latency (ms) and throughput for /sign and /verify.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pqc_client import PQCClient
+
+
+async def _run(client: PQCClient, path: str, body: dict, n: int, concurrency: int):
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            start = time.perf_counter()
+            res = await client.arequest("POST", path, json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if res.status_code != 200:
+                raise RuntimeError(f"{path} -> HTTP {res.status_code}: {res.text}")
+
+    # Warm up the keep-alive pool before measuring
+    await asyncio.gather(*(one() for _ in range(min(concurrency, n))))
+    latencies.clear()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+def _report(label: str, latencies: list[float], elapsed: float):
+    q = statistics.quantiles(latencies, n=100)
+    print(
+        f"{label:<14} mean={statistics.mean(latencies):7.3f}  p50={q[49]:7.3f}  "
+        f"p95={q[94]:7.3f}  p99={q[98]:7.3f} ms   {len(latencies) / elapsed:8.0f} req/s"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tcp", default="http://127.0.0.1:3002", help="TCP sidecar URL")
+    parser.add_argument("--uds", default="/tmp/pqc.sock", help="Unix socket path of the second sidecar")
+    parser.add_argument("-n", type=int, default=2000, help="requests per operation and transport")
+    parser.add_argument("-c", type=int, default=16, help="concurrent requests in flight")
+    args = parser.parse_args()
+
+    transports = {"tcp": PQCClient(args.tcp), "uds": PQCClient(f"unix://{args.uds}")}
+
+    # Sign once to obtain a real signature/public key pair for the /verify runs
+    tcp = transports["tcp"]
+    message = "benchmark.message"
+    signature = (await tcp.arequest("POST", "/sign", json={"message": message})).json()["signature"]
+    public_key = (await tcp.arequest("GET", "/server-public-key")).json()["publicKey"]
+
+    operations = {
+        "/sign": {"message": message},
+        "/verify": {"message": message, "signature": signature, "publicKey": public_key},
+    }
+    for path, body in operations.items():
+        for name, client in transports.items():
+            latencies, elapsed = await _run(client, path, body, args.n, args.c)
+            _report(f"{path} {name}", latencies, elapsed)
+
+    for client in transports.values():
+        await client.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""
+Benchmark: concurrent SQLite write throughput, default connection vs tuned profile.
+
+Writer threads each insert messages with one commit per message (like POST
+/messages), while reader threads keep running the inbox query. Runs once with a
+plain SQLite engine (rollback journal, synchronous=FULL, what database.py used to
+create) and once with database.configure_engine() (WAL, synchronous=NORMAL, mmap,
+busy_timeout...). From backend/:
+
+    python benchmarks/bench_sqlite_writes.py --writers 4 --readers 2 --seconds 10
+
+Each run uses a fresh database file in a temporary directory.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import configure_engine, engine_kwargs
+
+
+def _make_engine(path: str, tuned: bool):
+    url = f"sqlite:///{path}"
+    if tuned:
+        return configure_engine(create_engine(url, **engine_kwargs(url)))
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def _seed(Session, writers: int):
+    with Session() as db:
+        for i in range(writers + 1):
+            db.add(models.User(address=f"bench_user_{i}", username=f"bench{i}"))
+        db.commit()
+
+
+def _run(tuned: bool, writers: int, readers: int, seconds: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = _make_engine(os.path.join(tmp, "bench.db"), tuned)
+        models.Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        _seed(Session, writers)
+
+        stop = threading.Event()
+        counts = {"writes": 0, "reads": 0, "locked": 0}
+        lock = threading.Lock()
+
+        def bump(key):
+            with lock:
+                counts[key] += 1
+
+        def writer(i):
+            sender, recipient = i + 2, 1  # user ids, bench_user_0 is id 1
+            while not stop.is_set():
+                db = Session()
+                try:
+                    db.add(models.Message(sender_id=sender, recipient_id=recipient, content="x" * 256))
+                    db.commit()
+                    bump("writes")
+                except OperationalError:
+                    db.rollback()
+                    bump("locked")
+                finally:
+                    db.close()
+
+        def reader():
+            while not stop.is_set():
+                db = Session()
+                try:
+                    db.query(models.Message.sender_id, func.count(models.Message.id)).filter(
+                        models.Message.recipient_id == 1,
+                        models.Message.is_read == False,
+                    ).group_by(models.Message.sender_id).all()
+                    bump("reads")
+                except OperationalError:
+                    bump("locked")
+                finally:
+                    db.close()
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+        threads += [threading.Thread(target=reader) for _ in range(readers)]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        engine.dispose()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    for label, tuned in (("default", False), ("tuned", True)):
+        c = _run(tuned, args.writers, args.readers, args.seconds)
+        print(f"{label:<8} {c['writes'] / args.seconds:8.0f} writes/s  "
+              f"{c['reads'] / args.seconds:8.0f} reads/s  {c['locked']} 'database is locked' errors")
+
+
+if __name__ == "__main__":
+    main()
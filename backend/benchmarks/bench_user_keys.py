@@ -0,0 +1,113 @@
+"""
+Benchmark: on-disk size and index depth of address-keyed vs id-keyed users.
+
+Seeds the same PQC users (addresses are hex public keys, ~3900 chars) and
+direct messages into two SQLite files: one with the previous schema, where
+users.address is the primary key and every FK copies it, and one with the
+current models (integer users.id, fixed-size address_hash). Reports the file
+size and, per index, its size and B-tree depth (SQLite dbstat). From backend/:
+
+    python benchmarks/bench_user_keys.py --users 500 --messages 50000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import (Boolean, Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text,
+                        create_engine, insert)
+
+import models
+
+# The address-keyed tables, as before the surrogate ids
+legacy = MetaData()
+Table("users", legacy,
+      Column("address", String, primary_key=True, index=True),
+      Column("username", String))
+Table("messages", legacy,
+      Column("id", Integer, primary_key=True, index=True),
+      Column("sender_address", String, ForeignKey("users.address")),
+      Column("recipient_address", String, ForeignKey("users.address"), index=True),
+      Column("content", Text),
+      Column("is_read", Boolean, default=False, index=True),
+      Column("created_at", DateTime, index=True),
+      Index("ix_messages_sender_recipient_created_at", "sender_address", "recipient_address", "created_at"))
+
+PQC_ADDRESS_CHARS = 3904  # ML-DSA-65 public key, hex
+
+
+def _addresses(count: int):
+    rng = random.Random(7)
+    return [rng.randbytes(PQC_ADDRESS_CHARS // 2).hex() for _ in range(count)]
+
+
+def _messages(count: int, users: int):
+    rng = random.Random(11)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        sender, recipient = rng.sample(range(users), 2)
+        yield sender, recipient, start + timedelta(seconds=i)
+
+
+def _seed_legacy(engine, addresses, message_count):
+    legacy.create_all(engine)
+    users, messages = legacy.tables["users"], legacy.tables["messages"]
+    with engine.begin() as conn:
+        conn.execute(insert(users), [{"address": a, "username": a[:7]} for a in addresses])
+        conn.execute(insert(messages), [
+            {"sender_address": addresses[s], "recipient_address": addresses[r], "content": "x" * 64,
+             "is_read": False, "created_at": at}
+            for s, r, at in _messages(message_count, len(addresses))
+        ])
+
+
+def _seed_current(engine, addresses, message_count):
+    tables = [models.User.__table__, models.Message.__table__]
+    models.Base.metadata.create_all(engine, tables=tables)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__), [
+            {"id": i + 1, "address": a, "address_hash": models.address_hash(a), "username": a[:7]}
+            for i, a in enumerate(addresses)
+        ])
+        conn.execute(insert(models.Message.__table__), [
+            {"sender_id": s + 1, "recipient_id": r + 1, "content": "x" * 64, "is_read": False, "created_at": at}
+            for s, r, at in _messages(message_count, len(addresses))
+        ])
+
+
+def _report(engine, path):
+    with engine.connect() as conn:
+        conn.exec_driver_sql("VACUUM")
+        rows = conn.exec_driver_sql(
+            "SELECT name, SUM(pgsize), MAX(LENGTH(path) - LENGTH(REPLACE(path, '/', ''))) "
+            "FROM dbstat WHERE name IN (SELECT name FROM sqlite_schema WHERE type = 'index') "
+            "GROUP BY name ORDER BY name"
+        ).all()
+    return os.path.getsize(path), rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=50000)
+    args = parser.parse_args()
+
+    addresses = _addresses(args.users)
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, seed in (("address-keyed", _seed_legacy), ("id-keyed", _seed_current)):
+            path = os.path.join(tmp, f"{label}.db")
+            engine = create_engine(f"sqlite:///{path}")
+            seed(engine, addresses, args.messages)
+            size, indexes = _report(engine, path)
+            engine.dispose()
+            print(f"{label}: {size / 2**20:.1f} MiB")
+            for name, index_bytes, depth in indexes:
+                print(f"  {name:<45} {index_bytes / 2**20:8.2f} MiB  depth {depth}")
+
+
+if __name__ == "__main__":
+    main()
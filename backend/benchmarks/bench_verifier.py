@@ -0,0 +1,66 @@
+"""
+Benchmark: JWT signature verification in-process (dilithium.wasm) vs via the sidecar.
+
+The local backend always runs; pass --sidecar to also time the sidecar at
+PQC_SERVICE_URL. From backend/:
+
+    python benchmarks/bench_verifier.py -n 500
+    node pqc_service.js &
+    PQC_SHARED_SECRET=... python benchmarks/bench_verifier.py -n 500 --sidecar
+
+Uses the known-answer vectors from tests/vectors/dilithium_kind2.json, so the
+sidecar only needs to be running, not to share a key.
+Reports mean/p50/p95/p99 latency (ms) per verification.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import auth
+
+VECTORS = os.path.join(os.path.dirname(__file__), "..", "tests", "vectors", "dilithium_kind2.json")
+
+
+def _run(verify, n: int, message: str, signature_hex: str, public_key: str) -> list[float]:
+    if not verify(message, signature_hex, public_key):
+        raise RuntimeError("known-answer vector did not verify")
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        verify(message, signature_hex, public_key)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def _report(label: str, latencies: list[float]):
+    q = statistics.quantiles(latencies, n=100)
+    print(
+        f"{label:<8} mean={statistics.mean(latencies):7.3f}  p50={q[49]:7.3f}  "
+        f"p95={q[94]:7.3f}  p99={q[98]:7.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=500, help="verifications per backend")
+    parser.add_argument("--sidecar", action="store_true", help="also time the sidecar at PQC_SERVICE_URL")
+    args = parser.parse_args()
+
+    with open(VECTORS) as f:
+        vectors = json.load(f)
+    vector = vectors["vectors"][1]
+    sample = (vector["message"], vector["signature"], vectors["publicKey"])
+
+    _report("local", _run(auth.LocalDilithiumVerifier().verify, args.n, *sample))
+
+    if args.sidecar:
+        _report("sidecar", _run(auth.SidecarVerifier().verify, args.n, *sample))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,98 @@
 # Backend Configuration
+import os
 
 # Maximum total size for a chunked file upload (50MB)
 MAX_TOTAL_FILE_SIZE = 50 * 1024 * 1024
+# Maximum size of one encrypted chunk in bytes (~1MB; 2.1M characters as hex)
+MAX_CHUNK_SIZE = 1_050_000
+
+# Verified-token cache: max number of PQC-verified JWTs kept in memory.
+# Entries are evicted LRU when full and dropped at the token's `exp`.
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "10000"))
+
+# PQC sidecar client: connection pool limits and per-operation timeouts (seconds)
+PQC_POOL_MAX_CONNECTIONS = int(os.getenv("PQC_POOL_MAX_CONNECTIONS", "100"))
+PQC_POOL_MAX_KEEPALIVE = int(os.getenv("PQC_POOL_MAX_KEEPALIVE", "20"))
+PQC_POOL_KEEPALIVE_EXPIRY = float(os.getenv("PQC_POOL_KEEPALIVE_EXPIRY", "30"))
+PQC_TIMEOUT_SIGN = float(os.getenv("PQC_TIMEOUT_SIGN", "5"))
+PQC_TIMEOUT_VERIFY = float(os.getenv("PQC_TIMEOUT_VERIFY", "5"))
+PQC_TIMEOUT_PUBLIC_KEY = float(os.getenv("PQC_TIMEOUT_PUBLIC_KEY", "2"))
+
+# Micro-batching of async signature verification into /verify-batch calls.
+# Concurrent verifies are coalesced for up to PQC_BATCH_MAX_WAIT_MS or PQC_BATCH_MAX_SIZE items.
+PQC_BATCH_ENABLED = os.getenv("PQC_BATCH_ENABLED", "1") == "1"
+PQC_BATCH_MAX_SIZE = int(os.getenv("PQC_BATCH_MAX_SIZE", "64"))
+PQC_BATCH_MAX_WAIT_MS = float(os.getenv("PQC_BATCH_MAX_WAIT_MS", "2"))
+
+# PQC sidecar pool: PQC_SERVICE_URL may list several instances (comma-separated).
+# Failed instances are ejected for PQC_EJECT_SECONDS or until a health check passes.
+PQC_HEALTH_INTERVAL = float(os.getenv("PQC_HEALTH_INTERVAL", "5"))
+PQC_EJECT_SECONDS = float(os.getenv("PQC_EJECT_SECONDS", "10"))
+
+# Signature verification backend: "sidecar" (pqc_service.js) or "local"
+# (in-process dilithium.wasm via wasmtime). PQC_DILITHIUM_WASM overrides the wasm path.
+PQC_VERIFIER = os.getenv("PQC_VERIFIER", "sidecar")
+PQC_DILITHIUM_WASM = os.getenv("PQC_DILITHIUM_WASM") or None
+
+# Session tickets: short-lived HMAC tickets bound to a verified JWT (X-Session-Ticket).
+# A valid ticket skips Dilithium verification; its lifetime never exceeds the JWT's `exp`.
+SESSION_TICKETS_ENABLED = os.getenv("SESSION_TICKETS_ENABLED", "1") == "1"
+SESSION_TICKET_TTL_SECONDS = int(os.getenv("SESSION_TICKET_TTL_SECONDS", "300"))
+
+# Server key ring: how many server public keys are kept for rotation, how often
+# they are refreshed from the sidecar (seconds, 0 disables) and startup prefetch retries.
+SERVER_KEY_RING_SIZE = int(os.getenv("SERVER_KEY_RING_SIZE", "3"))
+SERVER_KEY_REFRESH_INTERVAL = float(os.getenv("SERVER_KEY_REFRESH_INTERVAL", "300"))
+SERVER_KEY_MIN_REFRESH_SECONDS = float(os.getenv("SERVER_KEY_MIN_REFRESH_SECONDS", "5"))
+SERVER_KEY_PREFETCH_RETRIES = int(os.getenv("SERVER_KEY_PREFETCH_RETRIES", "5"))
+SERVER_KEY_PREFETCH_DELAY = float(os.getenv("SERVER_KEY_PREFETCH_DELAY", "0.5"))
+
+# Worker pool for CPU-bound signature checks (Ethereum login recovery, local Dilithium):
+# "process", "thread" or "off". AUTH_WORKERS=0 means one worker per CPU core.
+AUTH_WORKER_POOL = os.getenv("AUTH_WORKER_POOL", "process")
+AUTH_WORKERS = int(os.getenv("AUTH_WORKERS", "0"))
+
+# Expose GET /metrics (internal counters as JSON). Keep it off on public deployments.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+
+# PQC circuit breaker: open after N consecutive failed calls (0 disables), then
+# fail fast for PQC_BREAKER_RESET_SECONDS before letting a probe call through.
+PQC_BREAKER_FAILURES = int(os.getenv("PQC_BREAKER_FAILURES", "5"))
+PQC_BREAKER_RESET_SECONDS = float(os.getenv("PQC_BREAKER_RESET_SECONDS", "5"))
+
+# Hedged async calls (needs several PQC instances): re-send to a second instance once a
+# call outlives the path's p95 (or PQC_HEDGE_DEFAULT_DELAY_MS until PQC_HEDGE_MIN_SAMPLES exist).
+PQC_HEDGE_ENABLED = os.getenv("PQC_HEDGE_ENABLED", "0") == "1"
+PQC_HEDGE_MIN_SAMPLES = int(os.getenv("PQC_HEDGE_MIN_SAMPLES", "50"))
+PQC_HEDGE_DEFAULT_DELAY_MS = float(os.getenv("PQC_HEDGE_DEFAULT_DELAY_MS", "50"))
+PQC_HEDGE_MIN_DELAY_MS = float(os.getenv("PQC_HEDGE_MIN_DELAY_MS", "2"))
+
+# Database: any SQLAlchemy URL; postgres:// and postgresql:// use the psycopg driver.
+# Pool settings apply to PostgreSQL and file-backed SQLite.
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sql_app.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+# URL for the async session layer (async routes); derived from DATABASE_URL when unset
+# (aiosqlite / psycopg async). Set it to e.g. postgresql+asyncpg://... to use asyncpg.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+# SQLite tuning, applied on every connection: WAL journal (file databases only),
+# synchronous level, mmap and page cache sizes (cache_size < 0 is in KiB) and how long a
+# writer waits on a lock. Checkpoint/ANALYZE intervals are in seconds (0 disables).
+SQLITE_WAL = os.getenv("SQLITE_WAL", "1") == "1"
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CHECKPOINT_INTERVAL = float(os.getenv("SQLITE_CHECKPOINT_INTERVAL", "300"))
+SQLITE_ANALYZE_INTERVAL = float(os.getenv("SQLITE_ANALYZE_INTERVAL", "3600"))
+
+# Expired access grants are deleted in the background every GRANT_SWEEP_INTERVAL seconds
+# (0 disables), GRANT_SWEEP_BATCH_SIZE rows per transaction. GRANT_EXPIRED_EVENTS sends the
+# grantee and the owner a GRANT_EXPIRED WebSocket event per deleted grant.
+GRANT_SWEEP_INTERVAL = float(os.getenv("GRANT_SWEEP_INTERVAL", "60"))
+GRANT_SWEEP_BATCH_SIZE = int(os.getenv("GRANT_SWEEP_BATCH_SIZE", "500"))
+GRANT_EXPIRED_EVENTS = os.getenv("GRANT_EXPIRED_EVENTS", "1") == "1"
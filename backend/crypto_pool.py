@@ -0,0 +1,106 @@
+"""
+Worker pool for CPU-bound signature checks done in the API process:
+secp256k1 recovery for Ethereum logins and in-process Dilithium verification.
+
+AUTH_WORKER_POOL selects the executor:
+- "process": a spawn-based process pool, so checks run outside the GIL (default)
+- "thread": a thread pool; only scales when the native code releases the GIL
+  (e.g. eth-keys with the coincurve backend)
+- "off": run inline on the calling thread
+
+The job functions are module-level so they can be pickled to worker processes;
+this module imports nothing heavy so spawned workers start quickly.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import config
+
+# --- Jobs (run inside the workers) ---
+
+_dilithium = None
+
+
+def recover_eth_address(message: str, signature: str) -> str:
+    from eth_account import Account
+    from eth_account.messages import encode_defunct
+    return Account.recover_message(encode_defunct(text=message), signature=signature)
+
+
+def dilithium_verify(wasm_path: str, message: str, signature_hex: str, public_key: str) -> bool:
+    global _dilithium
+    if _dilithium is None:
+        # One wasm module per worker process, compiled on its first job
+        from dilithium_wasm import DilithiumWasm
+        _dilithium = DilithiumWasm(wasm_path)
+    try:
+        return _dilithium.verify(bytes.fromhex(signature_hex), message.encode('utf-8'), bytes.fromhex(public_key))
+    except ValueError:
+        return False
+
+
+# --- Pool ---
+
+class CryptoPool:
+    def __init__(self, kind: str, workers: int):
+        if kind not in ("process", "thread", "off"):
+            raise ValueError(f"Unknown AUTH_WORKER_POOL: {kind}")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.submitted = 0
+        self.completed = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        # spawn, not fork: the API process has running threads and event loops
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                        )
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers, thread_name_prefix="crypto"
+                        )
+        return self._executor
+
+    async def run(self, fn, *args):
+        """Run `fn(*args)` on the pool and await its result."""
+        if self.kind == "off":
+            return fn(*args)
+        with self._lock:
+            self.pending += 1
+            self.submitted += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                # Jobs waiting for a free worker (beyond the ones being executed)
+                "queue_depth": max(0, self.pending - self.workers),
+                "pending": self.pending,
+                "submitted": self.submitted,
+                "completed": self.completed,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+crypto_pool = CryptoPool(config.AUTH_WORKER_POOL, config.AUTH_WORKERS)
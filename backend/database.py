@@ -1,12 +1,91 @@
-from sqlalchemy import create_engine
+import asyncio
+from sqlalchemy import create_engine, event, Integer
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql.functions import GenericFunction
 from models import Base
+import config
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def normalize_database_url(url: str) -> str:
+    """Use the psycopg (v3) driver for bare postgres:// / postgresql:// URLs."""
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix):]
+    return url
+
+
+def async_database_url(url: str) -> str:
+    """The same database through an asyncio driver: aiosqlite for SQLite, psycopg's async mode for PostgreSQL."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend == "postgresql" and url.get_driver_name() in ("psycopg", "asyncpg"):
+        return url.render_as_string(hide_password=False)
+    drivers = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+psycopg"}
+    if backend not in drivers:
+        raise ValueError(f"No async driver configured for {backend}")
+    return url.set(drivername=drivers[backend]).render_as_string(hide_password=False)
+
+
+def engine_kwargs(url: str) -> dict:
+    """Dialect-appropriate create_engine() arguments for `url`."""
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        # Sessions are used from FastAPI's threadpool, not just the creating thread
+        kwargs = {"connect_args": {"check_same_thread": False}}
+        if not _is_file_sqlite(url):
+            return kwargs
+    else:
+        kwargs = {}
+    kwargs.update(
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_recycle=config.DB_POOL_RECYCLE,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+    )
+    return kwargs
+
+
+_SYNCHRONOUS_LEVELS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def _is_file_sqlite(url) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    """Per-connection SQLite tuning (see the SQLITE_* settings in config.py)."""
+    synchronous = config.SQLITE_SYNCHRONOUS if config.SQLITE_SYNCHRONOUS in _SYNCHRONOUS_LEVELS else "NORMAL"
+    cursor = dbapi_connection.cursor()
+    try:
+        # Wait for a competing writer instead of failing with "database is locked"
+        cursor.execute(f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT_MS)}")
+        if config.SQLITE_WAL:
+            # Readers no longer block the writer; a no-op ("memory") for in-memory DBs
+            cursor.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is crash-safe in WAL mode and skips the fsync on every commit
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={int(config.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size={int(config.SQLITE_CACHE_SIZE)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+def configure_engine(engine):
+    """Install backend-specific connection hooks on `engine` (sync or async)."""
+    if engine.dialect.name == "sqlite":
+        event.listen(getattr(engine, "sync_engine", engine), "connect", apply_sqlite_pragmas)
+    return engine
+
+
+SQLALCHEMY_DATABASE_URL = normalize_database_url(config.DATABASE_URL)
+
+engine = configure_engine(create_engine(SQLALCHEMY_DATABASE_URL, **engine_kwargs(SQLALCHEMY_DATABASE_URL)))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def get_db():
@@ -15,3 +94,104 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Async sessions for `async def` routes, so queries don't block the event loop.
+# Objects stay usable after commit; relationships must be eager-loaded (no lazy IO).
+ASYNC_DATABASE_URL = config.ASYNC_DATABASE_URL or async_database_url(SQLALCHEMY_DATABASE_URL)
+
+async_engine = configure_engine(create_async_engine(ASYNC_DATABASE_URL, **engine_kwargs(ASYNC_DATABASE_URL)))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+class SQLiteMaintenance:
+    """
+    Periodic upkeep for a file-backed SQLite database: a passive WAL checkpoint
+    (keeps the -wal file from growing between automatic checkpoints while readers
+    are active) and ANALYZE (fresh planner statistics). A no-op on other backends.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.checkpoints = 0
+        self.analyzes = 0
+        self.last_checkpoint = None
+        self._tasks = []
+
+    @property
+    def enabled(self) -> bool:
+        return _is_file_sqlite(self.engine.url)
+
+    def checkpoint(self) -> dict:
+        with self.engine.connect() as conn:
+            busy, log_frames, checkpointed = conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)").one()
+        self.checkpoints += 1
+        self.last_checkpoint = {"busy": busy, "wal_frames": log_frames, "checkpointed": checkpointed}
+        return self.last_checkpoint
+
+    def analyze(self):
+        with self.engine.begin() as conn:
+            # Sample at most ~1000 rows per index so ANALYZE stays cheap on large tables
+            conn.exec_driver_sql("PRAGMA analysis_limit=1000")
+            conn.exec_driver_sql("ANALYZE")
+        self.analyzes += 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "checkpoints": self.checkpoints,
+            "analyzes": self.analyzes,
+            "last_checkpoint": self.last_checkpoint,
+        }
+
+    async def _loop(self, interval: float, job):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(job)
+            except Exception as e:
+                print(f"SQLite maintenance ({job.__name__}) failed: {e}")
+
+    # --- Lifecycle ---
+
+    async def startup(self):
+        if not self.enabled:
+            return
+        for interval, job in ((config.SQLITE_CHECKPOINT_INTERVAL, self.checkpoint),
+                              (config.SQLITE_ANALYZE_INTERVAL, self.analyze)):
+            if interval > 0:
+                self._tasks.append(asyncio.create_task(self._loop(interval, job)))
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+
+sqlite_maintenance = SQLiteMaintenance(engine)
+
+
+# --- Portable SQL functions ---
+
+class byte_length(GenericFunction):
+    """Stored size in bytes of a text/binary column, whatever the backend."""
+    type = Integer()
+    inherit_cache = True
+
+
+@compiles(byte_length)
+def _byte_length_default(element, compiler, **kw):
+    # SQLite: length() counts bytes for BLOBs (and characters for ASCII hex text)
+    return "length(%s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(byte_length, "postgresql")
+def _byte_length_postgresql(element, compiler, **kw):
+    return "octet_length(%s)" % compiler.process(element.clauses, **kw)
@@ -1,9 +1,11 @@
-from fastapi import Depends, HTTPException, status, Request
+from fastapi import Depends, HTTPException, status, Response, Header
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import auth
 import models
-from database import get_db
+from database import get_db, get_async_db
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
@@ -11,19 +13,49 @@ limiter = Limiter(key_func=get_remote_address)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    payload = auth.decode_access_token(token)
+async def get_token_payload(
+    response: Response,
+    token: str = Depends(oauth2_scheme),
+    x_session_ticket: str | None = Header(default=None),
+):
+    # A valid session ticket for this JWT skips the Dilithium check entirely
+    if x_session_ticket:
+        payload = auth.verify_session_ticket(x_session_ticket, token)
+        if payload is not None:
+            return payload
+
+    # Verified on the event loop via the pooled async PQC client
+    payload = await auth.decode_access_token_async(token)
     if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    # Hand out a fresh ticket so the client's next requests stay local
+    ticket = auth.issue_session_ticket(token, payload)
+    if ticket:
+        response.headers[auth.SESSION_TICKET_HEADER] = ticket
+    return payload
+
+def get_current_user(payload: dict = Depends(get_token_payload), db: Session = Depends(get_db)):
     address: str = payload.get("sub")
     if address is None:
         raise HTTPException(status_code=401, detail="Invalid token")
         
-    user = db.query(models.User).filter(models.User.address == address.lower()).first()
+    user = db.query(models.User).filter(models.User.has_address(address.lower())).first()
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+async def get_current_user_async(payload: dict = Depends(get_token_payload), db: AsyncSession = Depends(get_async_db)):
+    """get_current_user for async routes: same checks, loaded through the route's AsyncSession."""
+    address: str = payload.get("sub")
+    if address is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    user = await db.scalar(select(models.User).where(models.User.has_address(address.lower())))
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return user
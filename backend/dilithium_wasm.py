@@ -0,0 +1,142 @@
+"""
+In-process Dilithium verification through the dilithium-crystals-js WebAssembly build.
+
+pqc_service.js and the frontend both use dilithium-crystals-js, which compiles the
+pq-crystals reference implementation to `dilithium.wasm`. Running that same
+module under wasmtime gives verification that is bit-for-bit compatible with the
+keys and signatures they produce, without a round trip to the sidecar.
+
+Requires the optional `wasmtime` package.
+"""
+import os
+import threading
+
+# Parameter set used by pqc_service.js (`generateKeys(2, seed)`) and the frontend
+KIND = 2
+PUBLIC_KEY_BYTES = 1472
+SIGNATURE_BYTES = 2701
+
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+WASM_CANDIDATES = [
+    os.path.join(_BACKEND_DIR, "node_modules", "dilithium-crystals-js", "dist", "dilithium.wasm"),
+    os.path.join(_BACKEND_DIR, "node_modules", "dilithium-crystals-js", "dilithium.wasm"),
+    os.path.join(_BACKEND_DIR, "..", "frontend", "public", "dilithium.wasm"),
+]
+
+
+def find_wasm(path: str | None = None) -> str:
+    """Return the configured wasm path, or the first bundled copy that exists."""
+    if path:
+        return path
+    for candidate in WASM_CANDIDATES:
+        if os.path.exists(candidate):
+            return candidate
+    raise FileNotFoundError(
+        "dilithium.wasm not found; run `npm install` in backend/ or set PQC_DILITHIUM_WASM"
+    )
+
+
+class DilithiumWasm:
+    """
+    Thread-safe wrapper around dilithium.wasm. The compiled module is shared;
+    each thread gets its own wasmtime Store and instance (they are not thread-safe).
+    """
+
+    def __init__(self, wasm_path: str | None = None):
+        import wasmtime  # optional dependency, only needed for the local verifier
+
+        self._wasmtime = wasmtime
+        self.wasm_path = find_wasm(wasm_path)
+        self._engine = wasmtime.Engine()
+        self._module = wasmtime.Module.from_file(self._engine, self.wasm_path)
+        self._local = threading.local()
+
+    # --- Instantiation ---
+
+    def _import_handler(self, name: str):
+        wasmtime = self._wasmtime
+
+        def trap(*args):
+            raise wasmtime.Trap(f"dilithium.wasm: {name}")
+
+        if name == "emscripten_memcpy_big":
+            def memcpy_big(caller, dest, src, num):
+                memory = caller["memory"]
+                memory.write(caller, memory.read(caller, src, src + num), dest)
+                return dest
+            return memcpy_big, True
+        if name == "emscripten_resize_heap":
+            def resize_heap(caller, requested):
+                memory = caller["memory"]
+                page = 65536
+                missing = requested - memory.data_len(caller)
+                if missing <= 0:
+                    return 1
+                try:
+                    memory.grow(caller, (missing + page - 1) // page)
+                    return 1
+                except Exception:
+                    return 0
+            return resize_heap, True
+        if name in ("__syscall_open", "fd_read", "fd_write"):
+            # No filesystem or stdio: verification never needs them
+            return (lambda *args: -1 if name == "__syscall_open" else 0), False
+        return trap, False
+
+    def _instance(self):
+        state = getattr(self._local, "state", None)
+        if state is None:
+            wasmtime = self._wasmtime
+            store = wasmtime.Store(self._engine)
+            imports = []
+            for imp in self._module.imports:
+                handler, access_caller = self._import_handler(imp.name)
+                imports.append(wasmtime.Func(store, imp.type, handler, access_caller=access_caller))
+            instance = wasmtime.Instance(store, self._module, imports)
+            exports = instance.exports(store)
+            for init in ("__wasm_call_ctors", "emscripten_stack_init"):
+                if init in exports:
+                    exports[init](store)
+            state = (store, exports)
+            self._local.state = state
+        return state
+
+    def _copy_in(self, store, exports, data: bytes) -> int:
+        ptr = exports["malloc"](store, max(len(data), 1))
+        if not ptr:
+            raise MemoryError("dilithium.wasm: malloc failed")
+        exports["memory"].write(store, data, ptr)
+        return ptr
+
+    # --- Public API ---
+
+    def verify(self, signature: bytes, message: bytes, public_key: bytes, kind: int = KIND) -> bool:
+        """
+        Verify `signature` over `message`. Accepts both the detached signature and the
+        signed-message form (signature || message) that dilithium-crystals-js returns.
+        """
+        if len(signature) == SIGNATURE_BYTES:
+            signed_message = signature + message
+        elif len(signature) == SIGNATURE_BYTES + len(message) and signature[SIGNATURE_BYTES:] == message:
+            signed_message = signature
+        else:
+            return False
+        if len(public_key) != PUBLIC_KEY_BYTES:
+            return False
+
+        store, exports = self._instance()
+        ptrs = []
+        try:
+            sm_ptr = self._copy_in(store, exports, signed_message)
+            ptrs.append(sm_ptr)
+            msg_ptr = self._copy_in(store, exports, message)
+            ptrs.append(msg_ptr)
+            pk_ptr = self._copy_in(store, exports, public_key)
+            ptrs.append(pk_ptr)
+            result = exports["dilithium_verify"](
+                store, sm_ptr, len(signed_message), msg_ptr, len(message), pk_ptr, len(public_key), kind
+            )
+            return result == 0
+        finally:
+            for ptr in ptrs:
+                exports["free"](store, ptr)
@@ -0,0 +1,106 @@
+"""
+Background removal of expired (timebomb) access grants.
+
+Reads never return an expired grant (they filter with AccessGrant.is_live in
+SQL) and never delete one, so a GET costs the same however many expired rows
+are waiting. The sweeper deletes them periodically in batches of
+GRANT_SWEEP_BATCH_SIZE, one short transaction per batch, walking the
+expires_at index. With GRANT_EXPIRED_EVENTS on, the grantee and the secret's
+owner get a GRANT_EXPIRED WebSocket event per deleted grant.
+"""
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, select
+
+import config
+import models
+from database import SessionLocal
+from websocket_manager import manager
+
+
+class GrantExpirySweeper:
+    def __init__(self, session_factory, interval: float, batch_size: int):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self.sweeps = 0
+        self.deleted = 0
+        self.last_sweep = None
+        self._task: asyncio.Task | None = None
+
+    def sweep(self, now: datetime | None = None) -> list:
+        """
+        Delete every grant expired at `now`. Returns the deleted grants as
+        (grant_id, secret_id, grantee_address, owner_address) tuples.
+        """
+        now = now or datetime.now(timezone.utc)
+        g = models.AccessGrant
+        expired = []
+        with self.session_factory() as db:
+            while True:
+                batch = db.execute(
+                    select(g.id, g.secret_id, g.grantee_address, models.Secret.owner_address)
+                    .join(models.Secret, models.Secret.id == g.secret_id, isouter=True)
+                    .where(g.expires_at <= now)
+                    .order_by(g.expires_at)
+                    .limit(self.batch_size)
+                ).all()
+                if not batch:
+                    break
+                # Re-checked on delete: a grant re-shared meanwhile is a new row, not these ids.
+                # Only the rows this DELETE removed count; another worker's sweeper may have
+                # taken some of the batch first.
+                deleted = set(db.execute(
+                    delete(g).where(g.id.in_([row.id for row in batch]), g.expires_at <= now).returning(g.id)
+                ).scalars())
+                db.commit()
+                expired.extend(tuple(row) for row in batch if row.id in deleted)
+                if len(batch) < self.batch_size:
+                    break
+        self.sweeps += 1
+        self.deleted += len(expired)
+        self.last_sweep = {"at": now.isoformat(), "deleted": len(expired)}
+        return expired
+
+    async def notify(self, expired: list):
+        for grant_id, secret_id, grantee_address, owner_address in expired:
+            event = {"type": "GRANT_EXPIRED", "data": {"grant_id": grant_id, "secret_id": secret_id,
+                                                       "grantee": grantee_address}}
+            for address in {grantee_address, owner_address} - {None}:
+                await manager.send_personal_message(event, address)
+
+    async def run_once(self) -> int:
+        expired = await asyncio.to_thread(self.sweep)
+        if config.GRANT_EXPIRED_EVENTS:
+            await self.notify(expired)
+        return len(expired)
+
+    def stats(self) -> dict:
+        return {"sweeps": self.sweeps, "deleted": self.deleted, "last_sweep": self.last_sweep}
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Grant expiry sweep failed: {e}")
+
+    # --- Lifecycle ---
+
+    async def startup(self):
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+grant_sweeper = GrantExpirySweeper(SessionLocal, config.GRANT_SWEEP_INTERVAL, config.GRANT_SWEEP_BATCH_SIZE)
@@ -1,10 +1,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
+from contextlib import asynccontextmanager
+from database import engine, async_engine, Base, sqlite_maintenance
+from pqc_client import pqc
+from server_keys import key_ring
+from crypto_pool import crypto_pool
+from grant_expiry import grant_sweeper
+import config
 import os
 
 # Routers
-from routers import auth, users, secrets, multisig, messenger, groups, notifications
+from routers import auth, users, secrets, multisig, messenger, groups, notifications, metrics
 from dependencies import limiter
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
@@ -21,7 +27,25 @@ except Exception as e:
     print(f"Alembic migration failed, falling back to create_all: {e}")
     Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the pooled PQC sidecar client once per worker and close it on shutdown
+    await pqc.startup()
+    # Load the server public key before serving so the first requests don't 401
+    await key_ring.startup()
+    # Periodic WAL checkpoint + ANALYZE when running on a SQLite file
+    await sqlite_maintenance.startup()
+    # Periodic batched deletion of expired access grants
+    await grant_sweeper.startup()
+    yield
+    await grant_sweeper.shutdown()
+    await sqlite_maintenance.shutdown()
+    await key_ring.shutdown()
+    await pqc.shutdown()
+    crypto_pool.shutdown()
+    await async_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -57,6 +81,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Session-Ticket", "X-Next-Cursor", "X-Chunk-IV"],
 )
 
 # Include Routers
@@ -68,6 +93,8 @@ app.include_router(messenger.router)
 app.include_router(messenger.ws_router) # Include the WS router (root path /ws)
 app.include_router(groups.router)
 app.include_router(notifications.router)
+if config.METRICS_ENABLED:
+    app.include_router(metrics.router)
 
 # Root/Health check (optional)
 @app.get("/")
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean
-from sqlalchemy.orm import relationship, declarative_base
+import hashlib
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Index, LargeBinary, select, and_, or_
+from sqlalchemy.orm import relationship, declarative_base, column_property, query_expression, validates
 from datetime import datetime, timezone
 
 Base = declarative_base()
@@ -10,12 +11,18 @@ class Nonce(Base):
     address = Column(String, primary_key=True, index=True) # Address associated with nonce
     nonce = Column(String, nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    expires_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True) # Lazy cleanup on every nonce request
+
+def address_hash(address: str) -> bytes:
+    """Fixed-size lookup key for a user address (PQC addresses are multi-KB public keys)."""
+    return hashlib.sha256(address.encode()).digest()
 
 class User(Base):
     __tablename__ = "users"
 
-    address = Column(String, primary_key=True, index=True) # Ethereum address (lowercase)
+    id = Column(Integer, primary_key=True) # Surrogate key referenced by every user FK
+    address = Column(String, nullable=False) # Ethereum address or PQC public key (lowercase)
+    address_hash = Column(LargeBinary(32), nullable=False, unique=True, index=True) # sha256(address), set on assignment
     username = Column(String, nullable=True)
     encryption_public_key = Column(String, nullable=True) # For eth_decrypt
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
@@ -23,15 +30,44 @@ class User(Base):
     secrets = relationship("Secret", back_populates="owner")
     access_grants = relationship("AccessGrant", back_populates="grantee")
 
+    @validates("address")
+    def _set_address_hash(self, key, address):
+        self.address_hash = address_hash(address)
+        return address
+
+    @classmethod
+    def has_address(cls, address: str):
+        """Lookup by address through the hash index (the address compare guards against collisions)."""
+        return and_(cls.address_hash == address_hash(address), cls.address == address)
+
+    @classmethod
+    def has_any_address(cls, addresses):
+        """Hash-index IN lookup; callers match the loaded rows by address."""
+        return cls.address_hash.in_([address_hash(a) for a in addresses])
+
+def _address_of(user_id_column):
+    """
+    Read-only `*_address` attribute for a user FK, loaded in the same SELECT.
+    Kept across flushes (async sessions can't lazy-reload it); refresh() the
+    object after reassigning the FK.
+    """
+    return column_property(
+        select(User.address).where(User.id == user_id_column).correlate_except(User).scalar_subquery(),
+        expire_on_flush=False,
+    )
+
 class Secret(Base):
     __tablename__ = "secrets"
 
     id = Column(Integer, primary_key=True, index=True)
-    owner_address = Column(String, ForeignKey("users.address"))
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+    owner_address = _address_of(owner_id)
     name = Column(String, index=True)
     type = Column(String, default="standard") # 'standard' | 'file' | 'signed_document'
     encrypted_data = Column(Text) # AES-encrypted content or file metadata JSON
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    # Stored size of encrypted_data; only loaded by summary listings (with_expression)
+    size = query_expression()
 
     owner = relationship("User", back_populates="secrets")
     access_grants = relationship("AccessGrant", back_populates="secret")
@@ -39,22 +75,33 @@ class Secret(Base):
 
 class AccessGrant(Base):
     __tablename__ = "access_grants"
+    __table_args__ = (
+        # Access checks and share/revoke look up (secret, grantee); also serves secret_id alone
+        Index("ix_access_grants_secret_id_grantee_id", "secret_id", "grantee_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     secret_id = Column(Integer, ForeignKey("secrets.id"))
-    grantee_address = Column(String, ForeignKey("users.address"))
+    grantee_id = Column(Integer, ForeignKey("users.id"), index=True) # "Shared with me"
+    grantee_address = _address_of(grantee_id)
     encrypted_key = Column(Text) # The secret's key, encrypted for the grantee's public key
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    expires_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True, index=True) # Timebomb grants; swept by grant_expiry.py
 
     secret = relationship("Secret", back_populates="access_grants")
     grantee = relationship("User", back_populates="access_grants")
 
+    @classmethod
+    def is_live(cls, now: datetime):
+        """Not yet expired at `now`; expired rows wait for the sweeper (see grant_expiry.py)."""
+        return or_(cls.expires_at.is_(None), cls.expires_at > now)
+
 class Document(Base):
     __tablename__ = "documents"
 
     id = Column(Integer, primary_key=True, index=True)
-    owner_address = Column(String, ForeignKey("users.address"))
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+    owner_address = _address_of(owner_id)
     name = Column(String)
     content_hash = Column(String) # Hash of the document content
     signature = Column(String) # The user's signature of the hash
@@ -68,10 +115,14 @@ class MultisigWorkflow(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    owner_address = Column(String, ForeignKey("users.address"))
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+    owner_address = _address_of(owner_id)
     secret_id = Column(Integer, ForeignKey("secrets.id"))
     status = Column(String, default="pending") # 'pending', 'completed', 'rejected'
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    # Denormalized signer counts: signing bumps signed_count and completes the workflow in one UPDATE
+    required_signatures = Column(Integer, nullable=False, default=0)
+    signed_count = Column(Integer, nullable=False, default=0)
 
     owner = relationship("User", back_populates="workflows")
     secret = relationship("Secret")
@@ -80,10 +131,14 @@ class MultisigWorkflow(Base):
 
 class MultisigWorkflowSigner(Base):
     __tablename__ = "multisig_workflow_signers"
+    __table_args__ = (
+        Index("ix_multisig_workflow_signers_workflow_id_user_id", "workflow_id", "user_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     workflow_id = Column(Integer, ForeignKey("multisig_workflows.id"))
-    user_address = Column(String, ForeignKey("users.address"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True) # "Workflows I sign"
+    user_address = _address_of(user_id)
     has_signed = Column(Boolean, default=False) # 0=False, 1=True
     # SQLite/Some DBs are tricky with bools, but SQLAlchemy handles it. Let's stick to Boolean or Integer.
     # Existing code doesn't show much Bool usage, let's use Boolean if possible, or Integer.
@@ -97,10 +152,14 @@ class MultisigWorkflowSigner(Base):
 
 class MultisigWorkflowRecipient(Base):
     __tablename__ = "multisig_workflow_recipients"
+    __table_args__ = (
+        Index("ix_multisig_workflow_recipients_workflow_id_user_id", "workflow_id", "user_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     workflow_id = Column(Integer, ForeignKey("multisig_workflows.id"))
-    user_address = Column(String, ForeignKey("users.address"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    user_address = _address_of(user_id)
     encrypted_key = Column(Text) # Key encrypted for THIS recipient, held until release
 
     workflow = relationship("MultisigWorkflow", back_populates="recipients")
@@ -109,30 +168,57 @@ class MultisigWorkflowRecipient(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Keyset pages of a (sender, recipient) pair by id; also serves sender_id alone
+        Index("ix_messages_sender_recipient_id", "sender_id", "recipient_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    sender_address = Column(String, ForeignKey("users.address"), index=True)
-    recipient_address = Column(String, ForeignKey("users.address"), index=True)
+    sender_id = Column(Integer, ForeignKey("users.id"))
+    sender_address = _address_of(sender_id)
+    recipient_id = Column(Integer, ForeignKey("users.id"), index=True)
+    recipient_address = _address_of(recipient_id)
     content = Column(Text) # Encrypted Blob
     is_read = Column(Boolean, default=False, index=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
 
-    sender = relationship("User", foreign_keys=[sender_address], back_populates="sent_messages")
-    recipient = relationship("User", foreign_keys=[recipient_address], back_populates="received_messages")
+    sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
+    recipient = relationship("User", foreign_keys=[recipient_id], back_populates="received_messages")
+
+class ConversationSummary(Base):
+    """Inbox row per (user, partner), maintained with each message (see utils/conversations.py)."""
+    __tablename__ = "conversation_summaries"
+    __table_args__ = (
+        Index("uq_conversation_summaries_user_id_partner_id", "user_id", "partner_id", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    partner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    last_message_id = Column(Integer, ForeignKey("messages.id"), nullable=False)
+    last_activity = Column(DateTime) # created_at of the last message (NULL for some legacy rows)
+    unread_count = Column(Integer, nullable=False, default=0) # Messages from partner not yet read by user
+
+    partner = relationship("User", foreign_keys=[partner_id])
+    last_message = relationship("Message")
 
 # Update User relationship
 User.documents = relationship("Document", back_populates="owner")
 User.workflows = relationship("MultisigWorkflow", back_populates="owner")
-User.sent_messages = relationship("Message", foreign_keys=[Message.sender_address], back_populates="sender")
-User.received_messages = relationship("Message", foreign_keys=[Message.recipient_address], back_populates="recipient")
+User.sent_messages = relationship("Message", foreign_keys=[Message.sender_id], back_populates="sender")
+User.received_messages = relationship("Message", foreign_keys=[Message.recipient_id], back_populates="recipient")
 
 class FileChunk(Base):
     __tablename__ = "file_chunks"
+    __table_args__ = (
+        # Not unique: re-uploading a chunk index is currently allowed
+        Index("ix_file_chunks_secret_id_chunk_index", "secret_id", "chunk_index"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    secret_id = Column(Integer, ForeignKey("secrets.id"), index=True)
+    secret_id = Column(Integer, ForeignKey("secrets.id"))
     chunk_index = Column(Integer)  # 0-based ordering
-    encrypted_data = Column(Text)  # AES-GCM encrypted chunk (hex)
+    encrypted_data = Column(LargeBinary)  # AES-GCM encrypted chunk (raw bytes; hex/base64 only on the wire)
     iv = Column(String)            # Per-chunk IV (hex)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
@@ -154,7 +240,8 @@ class GroupChannel(Base):
 
     id = Column(String, primary_key=True)  # UUID (generated client-side)
     name = Column(String, nullable=False)
-    owner_address = Column(String, ForeignKey("users.address"))
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    owner_address = _address_of(owner_id)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
     owner = relationship("User")
@@ -164,12 +251,17 @@ class GroupChannel(Base):
 
 class GroupMember(Base):
     __tablename__ = "group_members"
+    __table_args__ = (
+        Index("uq_group_members_channel_id_user_id", "channel_id", "user_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    channel_id = Column(String, ForeignKey("group_channels.id"), index=True)
-    user_address = Column(String, ForeignKey("users.address"))
+    channel_id = Column(String, ForeignKey("group_channels.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True) # "My groups"
+    user_address = _address_of(user_id)
     role = Column(String, default="member")  # "owner" | "admin" | "member"
     joined_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    last_read_message_id = Column(Integer, nullable=True) # Read position (group_messages.id); NULL = nothing read
 
     channel = relationship("GroupChannel", back_populates="members")
     user = relationship("User")
@@ -177,10 +269,15 @@ class GroupMember(Base):
 
 class GroupMessage(Base):
     __tablename__ = "group_messages"
+    __table_args__ = (
+        # Keyset pages of a channel by id; also serves channel_id alone
+        Index("ix_group_messages_channel_id_id", "channel_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    channel_id = Column(String, ForeignKey("group_channels.id"), index=True)
-    sender_address = Column(String, ForeignKey("users.address"), index=True)
+    channel_id = Column(String, ForeignKey("group_channels.id"))
+    sender_id = Column(Integer, ForeignKey("users.id"), index=True)
+    sender_address = _address_of(sender_id)
     content = Column(Text)  # Encrypted blob (v2 payload)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
 
@@ -189,9 +286,14 @@ class GroupMessage(Base):
 
 class PushSubscription(Base):
     __tablename__ = "push_subscriptions"
+    __table_args__ = (
+        # subscribe() upserts by endpoint
+        Index("uq_push_subscriptions_endpoint", "endpoint", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    user_address = Column(String, ForeignKey("users.address"), index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    user_address = _address_of(user_id)
     endpoint = Column(Text, nullable=False)
     p256dh = Column(String, nullable=False)
     auth = Column(String, nullable=False)
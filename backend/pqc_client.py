@@ -0,0 +1,576 @@
+"""
+Shared client for the Node.js PQC sidecar (pqc_service.js).
+
+All auth paths talk to the sidecar through the single `pqc` instance below:
+- async callers use pooled, keep-alive httpx.AsyncClients
+- sync callers (sync routes, scripts) use the sync facade backed by pooled httpx.Clients
+
+PQC_SERVICE_URL may list several sidecar instances (comma-separated). An entry of
+the form unix:///path/to/pqc.sock talks HTTP over a Unix domain socket. Each call
+is routed to the available instance with the fewest in-flight requests;
+instances that fail are ejected until a /server-public-key health check passes.
+
+A circuit breaker fails calls fast (PQCUnavailable) after repeated failures
+instead of letting every request wait out its timeout, and async calls can be
+hedged to a second instance once they exceed the path's observed p95.
+Per-path latency histograms are kept for the metrics route.
+
+Clients are opened on app startup and closed on shutdown. They are also created
+lazily on first use so scripts and tests work without the app lifespan.
+"""
+import asyncio
+import os
+import threading
+import time
+import httpx
+import config
+
+PQC_SERVICE_URL = os.getenv("PQC_SERVICE_URL", "http://127.0.0.1:3002")
+
+# Per-operation timeouts (seconds), keyed by sidecar path
+TIMEOUTS = {
+    "/sign": config.PQC_TIMEOUT_SIGN,
+    "/verify": config.PQC_TIMEOUT_VERIFY,
+    "/verify-batch": config.PQC_TIMEOUT_VERIFY,
+    "/server-public-key": config.PQC_TIMEOUT_PUBLIC_KEY,
+}
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=config.PQC_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=config.PQC_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=config.PQC_POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+class PQCUnavailable(httpx.ConnectError):
+    """Raised without contacting the sidecar while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed calls; while open, calls
+    fail immediately. After `reset_seconds` one probe call is let through
+    (half-open): success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self.opened_at = 0.0
+            self._probing = False
+            self.rejected = 0
+
+    def allow(self):
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+        raise PQCUnavailable("PQC service circuit breaker is open")
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probing = False
+
+    def release_probe(self):
+        """Give back the half-open probe slot of a call that ended without an outcome (cancelled, other error)."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probing = False
+            if self.state == "half_open" or (
+                self.failure_threshold > 0 and self.consecutive_failures >= self.failure_threshold
+            ):
+                if self.state != "open":
+                    print(f"WARNING: PQC circuit breaker opened after {self.consecutive_failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "rejected": self.rejected,
+            }
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram with fixed millisecond buckets (Prometheus-style)."""
+
+    BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum_ms = 0.0
+
+    def observe(self, ms: float):
+        i = 0
+        while i < len(self.BUCKETS_MS) and ms > self.BUCKETS_MS[i]:
+            i += 1
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum_ms += ms
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate the q-quantile by linear interpolation inside its bucket."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            seen = 0
+            for i, n in enumerate(self.counts):
+                if n and seen + n >= rank:
+                    lower = self.BUCKETS_MS[i - 1] if i else 0
+                    upper = self.BUCKETS_MS[i] if i < len(self.BUCKETS_MS) else self.BUCKETS_MS[-1]
+                    return lower + (upper - lower) * (rank - seen) / n
+                seen += n
+            return float(self.BUCKETS_MS[-1])
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            count, sum_ms, counts = self.count, self.sum_ms, list(self.counts)
+        cumulative, buckets = 0, {}
+        for bound, n in zip(list(self.BUCKETS_MS) + ["+Inf"], counts):
+            cumulative += n
+            buckets[str(bound)] = cumulative
+        return {
+            "count": count,
+            "sum_ms": round(sum_ms, 3),
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+class PQCEndpoint:
+    """One sidecar instance: its pooled clients plus balancer and health state."""
+
+    def __init__(self, url: str, transport: httpx.BaseTransport | None = None):
+        self.uds = None
+        if url.startswith("unix://"):
+            # HTTP over a Unix domain socket; the host part of base_url is only cosmetic
+            self.uds = url[len("unix://"):]
+            self.url = "http://pqc-sidecar"
+        else:
+            self.url = url.rstrip("/")
+        self.transport = transport
+        self._sync_client: httpx.Client | None = None
+        self._async_client: httpx.AsyncClient | None = None
+        self._async_loop = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.healthy = True
+        self.ejected_until = 0.0
+
+    def available(self, now: float) -> bool:
+        # Ejected instances get a probe request again once the ejection window lapses
+        return self.healthy or now >= self.ejected_until
+
+    def mark_success(self):
+        self.healthy = True
+        self.ejected_until = 0.0
+
+    def mark_failure(self):
+        self.failures += 1
+        self.healthy = False
+        self.ejected_until = time.monotonic() + config.PQC_EJECT_SECONDS
+
+    def sync_client(self) -> httpx.Client:
+        if self._sync_client is None:
+            with self._lock:
+                if self._sync_client is None:
+                    transport = self.transport
+                    if transport is None and self.uds:
+                        transport = httpx.HTTPTransport(uds=self.uds, limits=_limits())
+                    self._sync_client = httpx.Client(
+                        base_url=self.url, limits=_limits(), transport=transport
+                    )
+        return self._sync_client
+
+    def async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        # Pooled connections are bound to the loop that opened them
+        if self._async_client is None or self._async_loop is not loop:
+            transport = self.transport
+            if transport is None and self.uds:
+                transport = httpx.AsyncHTTPTransport(uds=self.uds, limits=_limits())
+            self._async_client = httpx.AsyncClient(
+                base_url=self.url, limits=_limits(), transport=transport
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    async def aclose(self):
+        if self._async_client is not None and self._async_loop is asyncio.get_running_loop():
+            await self._async_client.aclose()
+        self._async_client = None
+        self._async_loop = None
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+            self._sync_client = None
+
+    def stats(self) -> dict:
+        return {
+            "url": f"unix://{self.uds}" if self.uds else self.url,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class PQCClient:
+    def __init__(self, urls: str | list[str], transport: httpx.BaseTransport | None = None):
+        if isinstance(urls, str):
+            urls = [u.strip() for u in urls.split(",") if u.strip()]
+        self.endpoints = [PQCEndpoint(u, transport) for u in urls]
+        self._state_lock = threading.Lock()
+        self._health_task: asyncio.Task | None = None
+        self.breaker = CircuitBreaker(config.PQC_BREAKER_FAILURES, config.PQC_BREAKER_RESET_SECONDS)
+        self._latency: dict[str, LatencyHistogram] = {}
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def _headers(self) -> dict:
+        secret = os.getenv("PQC_SHARED_SECRET")
+        return {"x-api-key": secret} if secret else {}
+
+    def _timeout(self, path: str) -> float:
+        return TIMEOUTS.get(path, config.PQC_TIMEOUT_VERIFY)
+
+    def use_transport(self, transport: httpx.BaseTransport | None):
+        """Swap the underlying transport (tests inject an httpx.MockTransport)."""
+        for endpoint in self.endpoints:
+            endpoint.close()
+            endpoint.transport = transport
+            endpoint._async_client = None
+            endpoint._async_loop = None
+            endpoint.mark_success()
+        self.breaker.reset()
+
+    # --- Balancing ---
+
+    def _acquire(self, tried: set) -> PQCEndpoint | None:
+        """Pick the available endpoint with the fewest in-flight requests and reserve a slot."""
+        now = time.monotonic()
+        with self._state_lock:
+            candidates = [e for e in self.endpoints if id(e) not in tried]
+            if not candidates:
+                return None
+            available = [e for e in candidates if e.available(now)]
+            if available:
+                endpoint = min(available, key=lambda e: (e.in_flight, e.requests))
+            else:
+                # Everything is ejected: probe the one whose ejection expires first
+                endpoint = min(candidates, key=lambda e: e.ejected_until)
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+            tried.add(id(endpoint))
+            return endpoint
+
+    def _release(self, endpoint: PQCEndpoint):
+        with self._state_lock:
+            endpoint.in_flight -= 1
+
+    def _settle(self, endpoint: PQCEndpoint, res: httpx.Response) -> httpx.Response:
+        if res.status_code >= 500:
+            endpoint.mark_failure()
+        else:
+            endpoint.mark_success()
+        return res
+
+    def _record(self, path: str, start: float, ok: bool):
+        self.latency(path).observe((time.perf_counter() - start) * 1000)
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def latency(self, path: str) -> LatencyHistogram:
+        histogram = self._latency.get(path)
+        if histogram is None:
+            histogram = self._latency.setdefault(path, LatencyHistogram())
+        return histogram
+
+    # --- Sync facade ---
+
+    def request(self, method: str, path: str, json: dict | None = None) -> httpx.Response:
+        self.breaker.allow()
+        start = time.perf_counter()
+        try:
+            res = self._request_with_retry(method, path, json, set())
+        except httpx.TransportError:
+            self._record(path, start, ok=False)
+            raise
+        except BaseException:
+            self.breaker.release_probe()
+            raise
+        self._record(path, start, ok=res.status_code < 500)
+        return res
+
+    def _request_with_retry(self, method: str, path: str, json: dict | None, tried: set) -> httpx.Response:
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                raise httpx.ConnectError("No PQC endpoint left to try")
+            try:
+                res = endpoint.sync_client().request(
+                    method, path, json=json, headers=self._headers(), timeout=self._timeout(path)
+                )
+            except httpx.TransportError:
+                endpoint.mark_failure()
+                if len(tried) < len(self.endpoints):
+                    continue
+                raise
+            finally:
+                self._release(endpoint)
+
+            self._settle(endpoint, res)
+            if res.status_code >= 500 and len(tried) < len(self.endpoints):
+                continue
+            return res
+
+    # --- Async client ---
+
+    async def arequest(self, method: str, path: str, json: dict | None = None) -> httpx.Response:
+        self.breaker.allow()
+        start = time.perf_counter()
+        try:
+            if config.PQC_HEDGE_ENABLED and len(self.endpoints) > 1:
+                res = await self._hedged(method, path, json)
+            else:
+                res = await self._arequest_with_retry(method, path, json, set())
+        except httpx.TransportError:
+            self._record(path, start, ok=False)
+            raise
+        except BaseException:
+            self.breaker.release_probe()
+            raise
+        self._record(path, start, ok=res.status_code < 500)
+        return res
+
+    async def _arequest_with_retry(self, method: str, path: str, json: dict | None, tried: set) -> httpx.Response:
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                raise httpx.ConnectError("No PQC endpoint left to try")
+            try:
+                res = await endpoint.async_client().request(
+                    method, path, json=json, headers=self._headers(), timeout=self._timeout(path)
+                )
+            except httpx.TransportError:
+                endpoint.mark_failure()
+                if len(tried) < len(self.endpoints):
+                    continue
+                raise
+            finally:
+                self._release(endpoint)
+
+            self._settle(endpoint, res)
+            if res.status_code >= 500 and len(tried) < len(self.endpoints):
+                continue
+            return res
+
+    def hedge_delay(self, path: str) -> float:
+        """Seconds to wait before hedging: the path's p95 once enough samples exist."""
+        histogram = self.latency(path)
+        p95 = histogram.quantile(0.95) if histogram.count >= config.PQC_HEDGE_MIN_SAMPLES else None
+        delay_ms = p95 if p95 is not None else config.PQC_HEDGE_DEFAULT_DELAY_MS
+        return max(delay_ms, config.PQC_HEDGE_MIN_DELAY_MS) / 1000
+
+    async def _hedged(self, method: str, path: str, json: dict | None) -> httpx.Response:
+        """
+        Send to one instance; if no answer within hedge_delay, send the same call to
+        another instance and take whichever succeeds first. All sidecar calls are
+        idempotent (signing is deterministic), so duplicates are harmless.
+        """
+        tried: set = set()
+        primary = asyncio.ensure_future(self._arequest_with_retry(method, path, json, tried))
+        pending = {primary}
+        result = None
+        # Covers every wait, so a cancelled caller never leaves attempts running unowned
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_delay(path))
+            if done or len(tried) >= len(self.endpoints):
+                return await primary
+
+            self.hedges_sent += 1
+            hedge = asyncio.ensure_future(self._arequest_with_retry(method, path, json, tried))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code < 500:
+                        if task is hedge:
+                            self.hedges_won += 1
+                        return task.result()
+                    result = task
+            # Neither attempt succeeded: surface the last outcome (response or error)
+            return result.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    # --- Health checks ---
+
+    async def _check_endpoint(self, endpoint: PQCEndpoint):
+        try:
+            res = await endpoint.async_client().get(
+                "/server-public-key", headers=self._headers(), timeout=self._timeout("/server-public-key")
+            )
+            ok = res.status_code == 200
+        except httpx.TransportError:
+            ok = False
+        if ok:
+            endpoint.mark_success()
+            # A healthy instance ends an open breaker without waiting for a probe call
+            self.breaker.record_success()
+        else:
+            endpoint.mark_failure()
+
+    async def check_health(self):
+        await asyncio.gather(*(self._check_endpoint(e) for e in self.endpoints))
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(config.PQC_HEALTH_INTERVAL)
+            try:
+                await self.check_health()
+            except Exception as e:
+                print(f"PQC health check error: {e}")
+
+    def stats(self) -> list[dict]:
+        return [e.stats() for e in self.endpoints]
+
+    def latency_stats(self) -> dict:
+        return {path: h.snapshot() for path, h in list(self._latency.items())}
+
+    # --- Lifecycle ---
+
+    async def startup(self):
+        for endpoint in self.endpoints:
+            endpoint.async_client()
+            endpoint.sync_client()
+        if config.PQC_HEALTH_INTERVAL > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def shutdown(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        for endpoint in self.endpoints:
+            await endpoint.aclose()
+
+
+class VerifyBatcher:
+    """
+    Coalesces concurrent async verify calls into one /verify-batch request.
+
+    Calls are collected for up to `max_wait_ms` or until `max_size` are pending,
+    then sent together; each caller's future resolves with its own result.
+    Falls back to per-item /verify if the sidecar predates /verify-batch.
+    """
+
+    def __init__(self, client: PQCClient, max_size: int, max_wait_ms: float):
+        self.client = client
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._loop = None
+        self._tasks: set[asyncio.Task] = set()
+        self.batches_sent = 0
+        self.items_sent = 0
+
+    async def verify(self, message: str, signature_hex: str, public_key: str) -> bool:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Pending items and timers belong to the loop that created them
+            self._pending, self._timer, self._loop = [], None, loop
+
+        future = loop.create_future()
+        self._pending.append(({"message": message, "signature": signature_hex, "publicKey": public_key}, future))
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: list[tuple[dict, asyncio.Future]]):
+        items = [item for item, _ in batch]
+        try:
+            res = await self.client.arequest("POST", "/verify-batch", json={"items": items})
+            if res.status_code == 404:
+                results = [await self._verify_one(item) for item in items]
+            elif res.status_code != 200:
+                print(f"ERROR: PQC Service HTTP Error: {res.text}")
+                results = [False] * len(items)
+            else:
+                results = res.json().get("results", [])
+            self.batches_sent += 1
+            self.items_sent += len(items)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for i, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(bool(results[i]) if i < len(results) else False)
+
+    async def _verify_one(self, item: dict) -> bool:
+        res = await self.client.arequest("POST", "/verify", json=item)
+        return res.status_code == 200 and res.json().get("valid", False)
+
+
+pqc = PQCClient(PQC_SERVICE_URL)
+verify_batcher = VerifyBatcher(pqc, config.PQC_BATCH_MAX_SIZE, config.PQC_BATCH_MAX_WAIT_MS)
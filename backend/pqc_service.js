@@ -2,14 +2,24 @@ const http = require('http');
 const dilithiumPromise = require('dilithium-crystals-js');
 const { Buffer } = require('buffer');
 const crypto = require('crypto');
+const cluster = require('cluster');
+const os = require('os');
+const fs = require('fs');
 require('dotenv').config();
 
 const HOST = process.env.HOST || '127.0.0.1';
 const PORT = process.env.PORT || 3002;
+// When set, listen on this Unix domain socket instead of HOST:PORT (same-host backends)
+const SOCKET_PATH = process.env.PQC_SOCKET_PATH;
+// Number of worker processes sharing the port ("auto" = one per core, default 1 = no cluster)
+const WORKERS = process.env.PQC_WORKERS === 'auto'
+    ? os.availableParallelism()
+    : parseInt(process.env.PQC_WORKERS || '1', 10);
 
 // Initialize Crypto and Keys
 let dilithium = null;
 let serverKeys = null;
+let serverKeyId = null;
 
 const toHex = (arr) => Buffer.from(arr).toString('hex');
 const fromHex = (hex) => new Uint8Array(Buffer.from(hex, 'hex'));
@@ -27,15 +37,11 @@ const generateKeysFromSecret = (mod) => {
 
     // Generate Deterministic Keys
     serverKeys = mod.generateKeys(2, seed);
-    console.log("[PQC Service] Server Keys generated deterministically from secret.");
+    // Key id: first 16 hex chars of SHA-256(public key); the backend key ring derives the same value
+    serverKeyId = crypto.createHash('sha256').update(serverKeys.publicKey).digest('hex').slice(0, 16);
+    console.log(`[PQC Service] Server Keys generated deterministically from secret (kid ${serverKeyId}).`);
 };
 
-dilithiumPromise.then(mod => {
-    dilithium = mod;
-    generateKeysFromSecret(mod);
-    console.log(`[PQC Service] Ready on http://${HOST}:${PORT}`);
-});
-
 const server = http.createServer(async (req, res) => {
     res.setHeader('Content-Type', 'application/json');
 
@@ -65,7 +71,7 @@ const server = http.createServer(async (req, res) => {
 
     if (req.method === 'GET' && req.url === '/server-public-key') {
         res.writeHead(200);
-        res.end(JSON.stringify({ publicKey: toHex(serverKeys.publicKey) }));
+        res.end(JSON.stringify({ publicKey: toHex(serverKeys.publicKey), keyId: serverKeyId }));
         return;
     }
 
@@ -103,7 +109,8 @@ const server = http.createServer(async (req, res) => {
 
                 res.writeHead(200);
                 res.end(JSON.stringify({
-                    signature: toHex(sigResult.signature)
+                    signature: toHex(sigResult.signature),
+                    keyId: serverKeyId
                 }));
             } catch (e) {
                 res.writeHead(400);
@@ -158,8 +165,95 @@ const server = http.createServer(async (req, res) => {
         return;
     }
 
+    if (req.method === 'POST' && req.url === '/verify-batch') {
+        let body = '';
+        let bodySize = 0;
+        const MAX_BODY_SIZE = 8 * 1024 * 1024; // 8MB (up to MAX_BATCH_ITEMS signatures)
+        const MAX_BATCH_ITEMS = 256;
+
+        req.on('data', chunk => {
+            bodySize += chunk.length;
+            if (bodySize > MAX_BODY_SIZE) {
+                res.writeHead(413); // Payload Too Large
+                res.end(JSON.stringify({ error: "Payload Too Large" }));
+                req.destroy();
+                return;
+            }
+            body += chunk;
+        });
+        req.on('end', () => {
+            try {
+                const { items } = JSON.parse(body);
+
+                if (!Array.isArray(items) || items.length > MAX_BATCH_ITEMS) {
+                    res.writeHead(400);
+                    res.end(JSON.stringify({ error: `items must be an array of at most ${MAX_BATCH_ITEMS}` }));
+                    return;
+                }
+
+                // Verify each tuple independently: one bad item must not fail the whole batch
+                const results = items.map(item => {
+                    try {
+                        const { message, signature, publicKey } = item || {};
+                        if (!message || !signature || !publicKey) {
+                            return false;
+                        }
+                        const msgBytes = new TextEncoder().encode(message);
+                        const resultObj = dilithium.verify(fromHex(signature), msgBytes, fromHex(publicKey), 2);
+                        return !!resultObj && resultObj.result === 0;
+                    } catch (e) {
+                        return false;
+                    }
+                });
+
+                res.writeHead(200);
+                res.end(JSON.stringify({ results }));
+
+            } catch (e) {
+                console.error("Batch Verification Error:", e.message);
+                res.writeHead(400);
+                res.end(JSON.stringify({ error: e.message }));
+            }
+        });
+        return;
+    }
+
     res.writeHead(404);
     res.end(JSON.stringify({ error: "Not Found" }));
 });
 
-server.listen(PORT, HOST);
+const startWorker = () => {
+    dilithiumPromise.then(mod => {
+        dilithium = mod;
+        // Keys are derived from SAFELOG_SECRET_KEY, so every worker serves the same identity
+        generateKeysFromSecret(mod);
+        const where = SOCKET_PATH ? `unix:${SOCKET_PATH}` : `http://${HOST}:${PORT}`;
+        console.log(`[PQC Service] Ready on ${where} (pid ${process.pid})`);
+    });
+    if (SOCKET_PATH) {
+        server.listen(SOCKET_PATH, () => {
+            // Only the service user may connect; requests still need the x-api-key
+            fs.chmodSync(SOCKET_PATH, 0o600);
+        });
+    } else {
+        server.listen(PORT, HOST);
+    }
+};
+
+// Remove a stale socket left by a previous run (once, before any worker binds it)
+if (SOCKET_PATH && (WORKERS <= 1 || cluster.isPrimary) && fs.existsSync(SOCKET_PATH)) {
+    fs.unlinkSync(SOCKET_PATH);
+}
+
+if (WORKERS > 1 && cluster.isPrimary) {
+    console.log(`[PQC Service] Cluster mode: starting ${WORKERS} workers`);
+    for (let i = 0; i < WORKERS; i++) {
+        cluster.fork();
+    }
+    cluster.on('exit', (worker, code, signal) => {
+        console.error(`[PQC Service] Worker ${worker.process.pid} exited (${signal || code}), restarting`);
+        cluster.fork();
+    });
+} else {
+    startWorker();
+}
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from dependencies import limiter
+from dependencies import limiter, get_token_payload, oauth2_scheme
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timezone, timedelta
+import json
 import models, schemas, auth
-from database import get_db
+from database import get_db, get_async_db
 
 router = APIRouter(
     prefix="/auth",
@@ -29,33 +32,34 @@ def get_nonce(request: Request, address: str, db: Session = Depends(get_db)):
 
 @router.post("/login", response_model=schemas.Token)
 @limiter.limit("5/minute")
-def login(request: Request, login_req: schemas.LoginRequest, db: Session = Depends(get_db)):
+async def login(request: Request, login_req: schemas.LoginRequest, db: AsyncSession = Depends(get_async_db)):
     address = login_req.address.lower()
     
     # Fetch nonce from DB
-    nonce_entry = db.query(models.Nonce).filter(models.Nonce.address == address).first()
+    nonce_entry = await db.scalar(select(models.Nonce).where(models.Nonce.address == address))
     
     if not nonce_entry:
         raise HTTPException(status_code=400, detail="Nonce not found. Request a nonce first.")
         
     # Check expiry
     if nonce_entry.expires_at.replace(tzinfo=timezone.utc) <= datetime.now(timezone.utc):
-        db.delete(nonce_entry)
-        db.commit()
+        await db.delete(nonce_entry)
+        await db.commit()
         raise HTTPException(status_code=400, detail="Nonce expired.")
     
     if login_req.nonce != nonce_entry.nonce:
          raise HTTPException(status_code=400, detail="Invalid nonce.")
 
-    if not auth.verify_signature(address, login_req.nonce, login_req.signature):
+    # Signature checks run on the crypto worker pool / PQC sidecar, off the event loop
+    if not await auth.verify_signature_async(address, login_req.nonce, login_req.signature):
         raise HTTPException(status_code=401, detail="Invalid signature")
     
     # Cleanup nonce (Anti-replay)
-    db.delete(nonce_entry)
-    db.commit()
+    await db.delete(nonce_entry)
+    await db.commit()
     
     # Find or create user
-    user = db.query(models.User).filter(models.User.address == address).first()
+    user = await db.scalar(select(models.User).where(models.User.has_address(address)))
     if not user:
         # Default username logic: Use provided username OR first 7 chars of address
         default_username = login_req.username if login_req.username else address[:7]
@@ -65,19 +69,38 @@ def login(request: Request, login_req: schemas.LoginRequest, db: Session = Depen
             username=default_username
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     elif login_req.encryption_public_key and user.encryption_public_key != login_req.encryption_public_key:
         # Update key if it changed or wasn't set
         user.encryption_public_key = login_req.encryption_public_key
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     else:
         # Ensure we refresh even if no changes to get latest state
-        db.refresh(user)
+        await db.refresh(user)
     
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = auth.create_access_token(
+    access_token = await auth.create_access_token_async(
         data={"sub": user.address}, expires_delta=access_token_expires
     )
-    return {"access_token": access_token, "token_type": "bearer", "user": user}
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": user,
+        "session_ticket": auth.issue_session_ticket(access_token),
+    }
+
+@router.post("/session-ticket", response_model=schemas.SessionTicketResponse)
+@limiter.limit("30/minute")
+def exchange_session_ticket(
+    request: Request,
+    payload: dict = Depends(get_token_payload),
+    token: str = Depends(oauth2_scheme),
+):
+    """Exchange a valid JWT for a short-lived session ticket (e.g. for the /ws AUTH message)."""
+    ticket = auth.issue_session_ticket(token, payload)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Session tickets are disabled")
+    claims = json.loads(auth.b64url_decode(ticket.split('.')[0]))
+    return {"session_ticket": ticket, "expires_at": claims["exp"]}
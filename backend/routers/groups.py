@@ -1,14 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from dependencies import limiter
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from typing import List
 import uuid
 import models, schemas
-from database import get_db
-from dependencies import get_current_user
+from database import get_db, get_async_db
+from dependencies import get_current_user, get_current_user_async
 from websocket_manager import manager
-from utils.push import notify_user_push
+from utils.push import notify_user_push_async
+from utils.pagination import NEXT_CURSOR_HEADER, page_bounds, next_cursor
 
 router = APIRouter(
     prefix="/groups",
@@ -16,6 +18,19 @@ router = APIRouter(
 )
 
 
+async def _get_channel(db: AsyncSession, channel_id: str, reload: bool = False):
+    """Channel with members (and their users) eager-loaded, as async sessions can't lazy-load."""
+    stmt = (
+        select(models.GroupChannel)
+        .options(selectinload(models.GroupChannel.members).selectinload(models.GroupMember.user))
+        .where(models.GroupChannel.id == channel_id)
+    )
+    if reload:
+        # Re-read members after a commit instead of keeping the stale collection
+        stmt = stmt.execution_options(populate_existing=True)
+    return await db.scalar(stmt)
+
+
 # ── Create Group ────────────────────────────────────────────────
 
 @router.post("", response_model=schemas.GroupChannelResponse)
@@ -23,8 +38,8 @@ router = APIRouter(
 async def create_group(
     request: Request,
     data: schemas.GroupChannelCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     if len(data.member_addresses) > 50:
         raise HTTPException(status_code=400, detail="Maximum 50 members per group")
@@ -35,14 +50,13 @@ async def create_group(
     if current_user.address not in member_addrs:
         member_addrs.append(current_user.address)
 
-    users = db.query(models.User).filter(models.User.address.in_(member_addrs)).all()
-    found_addrs = {u.address for u in users}
-    missing = set(member_addrs) - found_addrs
+    users = {u.address: u for u in await db.scalars(select(models.User).where(models.User.has_any_address(member_addrs)))}
+    missing = set(member_addrs) - users.keys()
     if missing:
         raise HTTPException(status_code=404, detail=f"Users not found: {', '.join(missing)}")
 
     # Validate all members have PQC keys (Messenger requirement)
-    for u in users:
+    for u in users.values():
         if not u.encryption_public_key or len(u.encryption_public_key) < 500:
             raise HTTPException(
                 status_code=400, 
@@ -53,7 +67,7 @@ async def create_group(
     channel = models.GroupChannel(
         id=channel_id,
         name=data.name.strip(),
-        owner_address=current_user.address,
+        owner_id=current_user.id,
     )
     db.add(channel)
 
@@ -62,12 +76,12 @@ async def create_group(
         role = "owner" if addr == current_user.address else "member"
         db.add(models.GroupMember(
             channel_id=channel_id,
-            user_address=addr,
+            user_id=users[addr].id,
             role=role,
         ))
 
-    db.commit()
-    db.refresh(channel)
+    await db.commit()
+    channel = await _get_channel(db, channel_id, reload=True)
 
     # Notify all members    # Real-time update
     for addr in member_addrs:
@@ -78,7 +92,7 @@ async def create_group(
             }, addr)
             
             # Push Notification
-            notify_user_push(
+            await notify_user_push_async(
                 db,
                 addr,
                 title="New Group",
@@ -89,6 +103,48 @@ async def create_group(
     return channel
 
 
+def _latest_message_id(channel_id):
+    """Scalar subquery: id of the newest message of `channel_id` (a value or column)."""
+    m = aliased(models.GroupMessage)
+    return select(func.max(m.id)).where(m.channel_id == channel_id).scalar_subquery()
+
+
+def _unread_count():
+    """Scalar subquery, correlated to GroupMember: messages from others past the member's read position."""
+    m = aliased(models.GroupMessage)
+    member = models.GroupMember
+    return (
+        select(func.count(m.id))
+        .where(
+            m.channel_id == member.channel_id,
+            m.id > func.coalesce(member.last_read_message_id, 0),
+            m.sender_id != member.user_id,
+        )
+        .correlate(member)
+        .scalar_subquery()
+    )
+
+
+def _group_inbox(db: Session, user_id: int):
+    """
+    (channel, latest message or None, unread count) for every channel of `user_id`,
+    most recent activity first. One query for all channels (unread = messages from
+    others after the member's read position); members and senders are batch-loaded.
+    """
+    channel, member, last = models.GroupChannel, models.GroupMember, models.GroupMessage
+    return (
+        db.query(channel, last, _unread_count().label("unread_count"))
+        .join(member, (member.channel_id == channel.id) & (member.user_id == user_id))
+        .outerjoin(last, last.id == _latest_message_id(member.channel_id))
+        .options(
+            selectinload(channel.members).selectinload(member.user),
+            selectinload(last.sender),
+        )
+        .order_by(func.coalesce(last.created_at, channel.created_at).desc())
+        .all()
+    )
+
+
 # ── List My Groups ──────────────────────────────────────────────
 
 @router.get("", response_model=List[schemas.GroupConversationResponse])
@@ -98,43 +154,10 @@ def list_groups(
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    # Find channels the user is a member of
-    memberships = (
-        db.query(models.GroupMember.channel_id)
-        .filter(models.GroupMember.user_address == current_user.address)
-        .subquery()
-    )
-
-    channels = (
-        db.query(models.GroupChannel)
-        .options(joinedload(models.GroupChannel.members).joinedload(models.GroupMember.user))
-        .filter(models.GroupChannel.id.in_(memberships))
-        .all()
-    )
-
-    # For each channel, find the latest message
-    result = []
-    for ch in channels:
-        last_msg = (
-            db.query(models.GroupMessage)
-            .options(joinedload(models.GroupMessage.sender))
-            .filter(models.GroupMessage.channel_id == ch.id)
-            .order_by(models.GroupMessage.created_at.desc())
-            .first()
-        )
-
-        # Unread count: messages sent after the last time the user would have seen them
-        # For simplicity, we count messages not sent by user (group has no per-user read tracking yet)
-        # We'll add read tracking via a last_read_at field on GroupMember
-        result.append({
-            "channel": ch,
-            "last_message": last_msg,
-            "unread_count": 0,  # Will be enhanced with read tracking
-        })
-
-    # Sort by most recent activity
-    result.sort(key=lambda r: r["last_message"].created_at if r["last_message"] else r["channel"].created_at, reverse=True)
-    return result
+    return [
+        {"channel": ch, "last_message": last_msg, "unread_count": unread}
+        for ch, last_msg, unread in _group_inbox(db, current_user.id)
+    ]
 
 
 # ── Get Group Details ───────────────────────────────────────────
@@ -157,7 +180,7 @@ def get_group(
         raise HTTPException(status_code=404, detail="Group not found")
 
     # Verify membership
-    if not any(m.user_address == current_user.address for m in channel.members):
+    if not any(m.user_id == current_user.id for m in channel.members):
         raise HTTPException(status_code=403, detail="Not a member of this group")
 
     return channel
@@ -171,32 +194,27 @@ async def send_group_message(
     request: Request,
     channel_id: str,
     data: schemas.GroupMessageCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     if len(data.content) > 50000:
         raise HTTPException(status_code=400, detail="Message too long")
 
-    channel = (
-        db.query(models.GroupChannel)
-        .options(joinedload(models.GroupChannel.members))
-        .filter(models.GroupChannel.id == channel_id)
-        .first()
-    )
+    channel = await _get_channel(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Group not found")
 
-    if not any(m.user_address == current_user.address for m in channel.members):
+    if not any(m.user_id == current_user.id for m in channel.members):
         raise HTTPException(status_code=403, detail="Not a member of this group")
 
     msg = models.GroupMessage(
         channel_id=channel_id,
-        sender_address=current_user.address,
+        sender_id=current_user.id,
         content=data.content,
     )
     db.add(msg)
-    db.commit()
-    db.refresh(msg)
+    await db.commit()
+    await db.refresh(msg, ["sender_address", "sender"])
 
     # Real-time update
     import schemas
@@ -214,7 +232,7 @@ async def send_group_message(
         
         # Push Notification (Skip sender)
         if member.user_address != current_user.address:
-            notify_user_push(
+            await notify_user_push_async(
                 db,
                 member.user_address,
                 title=f"Group: {channel.name}",
@@ -231,34 +249,52 @@ async def send_group_message(
 @limiter.limit("60/minute")
 def get_group_history(
     request: Request,
+    response: Response,
     channel_id: str,
     req: schemas.GroupHistoryRequest,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
+    """
+    A page of the channel in chronological order: the latest messages, those older
+    than before_id, or those newer than since_id (catching up after a reconnect).
+    The cursor for the next page in the same direction is returned in X-Next-Cursor.
+    """
+    before_id, since_id = page_bounds(req.before_id, req.since_id, req.cursor)
+
     # Verify membership
     membership = (
         db.query(models.GroupMember)
         .filter(
             models.GroupMember.channel_id == channel_id,
-            models.GroupMember.user_address == current_user.address,
+            models.GroupMember.user_id == current_user.id,
         )
         .first()
     )
     if not membership:
         raise HTTPException(status_code=403, detail="Not a member of this group")
 
-    msgs = (
+    # Range scan on (channel_id, id); senders loaded once per page, not joined per row
+    query = (
         db.query(models.GroupMessage)
-        .options(joinedload(models.GroupMessage.sender))
+        .options(selectinload(models.GroupMessage.sender))
         .filter(models.GroupMessage.channel_id == channel_id)
-        .order_by(models.GroupMessage.created_at.desc())
-        .limit(req.limit)
-        .offset(req.offset)
-        .all()
     )
-
-    return msgs[::-1]  # Return in chronological order
+    if since_id is not None:
+        query = query.filter(models.GroupMessage.id > since_id).order_by(models.GroupMessage.id.asc())
+    else:
+        if before_id is not None:
+            query = query.filter(models.GroupMessage.id < before_id)
+        query = query.order_by(models.GroupMessage.id.desc())
+        if req.offset and before_id is None:
+            query = query.offset(req.offset)  # Kept for older clients
+    msgs = query.limit(req.limit + 1).all()
+
+    cursor = next_cursor(msgs, req.limit, since_id)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    page = msgs[:req.limit]
+    return page if since_id is not None else page[::-1]  # Chronological order
 
 
 # ── Add Member ──────────────────────────────────────────────────
@@ -269,20 +305,15 @@ async def add_member(
     request: Request,
     channel_id: str,
     data: schemas.GroupMemberAdd,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    channel = (
-        db.query(models.GroupChannel)
-        .options(joinedload(models.GroupChannel.members))
-        .filter(models.GroupChannel.id == channel_id)
-        .first()
-    )
+    channel = await _get_channel(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Group not found")
 
     # Only owner/admin can add members
-    caller_member = next((m for m in channel.members if m.user_address == current_user.address), None)
+    caller_member = next((m for m in channel.members if m.user_id == current_user.id), None)
     if not caller_member or caller_member.role not in ("owner", "admin"):
         raise HTTPException(status_code=403, detail="Only owners/admins can add members")
 
@@ -293,7 +324,7 @@ async def add_member(
         raise HTTPException(status_code=400, detail="User is already a member")
 
     # Verify user exists and has PQC key
-    target_user = db.query(models.User).filter(models.User.address == new_addr).first()
+    target_user = await db.scalar(select(models.User).where(models.User.has_address(new_addr)))
     if not target_user:
         raise HTTPException(status_code=404, detail="User not found")
         
@@ -305,12 +336,13 @@ async def add_member(
 
     new_member = models.GroupMember(
         channel_id=channel_id,
-        user_address=new_addr,
+        user_id=target_user.id,
         role="member",
+        last_read_message_id=_latest_message_id(channel_id), # Earlier history doesn't count as unread
     )
     db.add(new_member)
-    db.commit()
-    db.refresh(new_member)
+    await db.commit()
+    await db.refresh(new_member, ["user_address", "user"])
 
     # Notify all members
     event = {
@@ -354,20 +386,15 @@ async def remove_member(
     request: Request,
     channel_id: str,
     member_address: str,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    channel = (
-        db.query(models.GroupChannel)
-        .options(joinedload(models.GroupChannel.members))
-        .filter(models.GroupChannel.id == channel_id)
-        .first()
-    )
+    channel = await _get_channel(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Group not found")
 
     target_addr = member_address.lower()
-    caller_member = next((m for m in channel.members if m.user_address == current_user.address), None)
+    caller_member = next((m for m in channel.members if m.user_id == current_user.id), None)
 
     if not caller_member:
         raise HTTPException(status_code=403, detail="Not a member of this group")
@@ -414,8 +441,10 @@ async def remove_member(
             
             # Proceed to remove the old owner
     
-    db.delete(target_member)
-    db.commit()
+    await db.delete(target_member)
+    await db.commit()
+    # Re-read members so the deleted one isn't cascaded back in by db.add(channel) below
+    channel = await _get_channel(db, channel_id, reload=True)
 
     # Notify remaining members
     remaining = [m.user_address for m in channel.members if m.user_address != target_addr]
@@ -429,9 +458,9 @@ async def remove_member(
     
     # If we are transferring ownership, we MUST update channel.owner_address
     if target_member.role == "owner" and not is_self:
-        channel.owner_address = caller_member.user_address
+        channel.owner_id = caller_member.user_id
         db.add(channel)
-        db.commit()
+        await db.commit()
 
     event = {
         "type": "GROUP_MEMBER_REMOVED",
@@ -458,19 +487,14 @@ async def update_member_role(
     channel_id: str,
     member_address: str,
     data: schemas.GroupMemberRoleUpdate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    channel = (
-        db.query(models.GroupChannel)
-        .options(joinedload(models.GroupChannel.members).joinedload(models.GroupMember.user))
-        .filter(models.GroupChannel.id == channel_id)
-        .first()
-    )
+    channel = await _get_channel(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Group not found")
 
-    caller_member = next((m for m in channel.members if m.user_address == current_user.address), None)
+    caller_member = next((m for m in channel.members if m.user_id == current_user.id), None)
     if not caller_member or caller_member.role != "owner":
         raise HTTPException(status_code=403, detail="Only the owner can manage roles")
 
@@ -488,8 +512,7 @@ async def update_member_role(
 
     target_member.role = new_role
     db.add(target_member)
-    db.commit()
-    db.refresh(target_member)
+    await db.commit()
 
     # Broadcast update
     event = {
@@ -517,26 +540,20 @@ async def update_group(
     request: Request,
     channel_id: str,
     data: schemas.GroupUpdate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    channel = (
-        db.query(models.GroupChannel)
-        .options(joinedload(models.GroupChannel.members).joinedload(models.GroupMember.user))
-        .filter(models.GroupChannel.id == channel_id)
-        .first()
-    )
+    channel = await _get_channel(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Group not found")
 
-    caller_member = next((m for m in channel.members if m.user_address == current_user.address), None)
+    caller_member = next((m for m in channel.members if m.user_id == current_user.id), None)
     if not caller_member or caller_member.role != "owner":
         raise HTTPException(status_code=403, detail="Only the owner can rename the group")
 
     channel.name = data.name.strip()
     db.add(channel)
-    db.commit()
-    db.refresh(channel)
+    await db.commit()
 
     # Broadcast update
     event = {
@@ -564,13 +581,14 @@ def mark_group_read(
         db.query(models.GroupMember)
         .filter(
             models.GroupMember.channel_id == channel_id,
-            models.GroupMember.user_address == current_user.address,
+            models.GroupMember.user_id == current_user.id,
         )
         .first()
     )
     if not membership:
         raise HTTPException(status_code=403, detail="Not a member of this group")
 
-    # For now, just acknowledge. Full read tracking can be added with a
-    # last_read_at timestamp on GroupMember if needed.
+    # Everything up to the channel's newest message is now read
+    membership.last_read_message_id = _latest_message_id(channel_id)
+    db.commit()
     return {"status": "ok"}
@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status, Request
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status, Request, Response
 from dependencies import limiter
-from sqlalchemy.orm import Session, defer
-from sqlalchemy import or_
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, union_all
 from typing import List
 import json
 import models, schemas, auth
-from database import get_db
-from dependencies import get_current_user
+from database import get_db, get_async_db
+from dependencies import get_current_user, get_current_user_async
 from websocket_manager import manager
-from utils.push import notify_user_push
+from utils.push import notify_user_push_async
+from utils.pagination import NEXT_CURSOR_HEADER, page_bounds, next_cursor
+from utils.conversations import summary_upsert, clear_unread
 
 router = APIRouter(
     prefix="/messages",
@@ -17,12 +20,12 @@ router = APIRouter(
 
 @router.post("", response_model=schemas.MessageResponse)
 @limiter.limit("20/minute")
-async def send_message(request: Request, msg: schemas.MessageCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def send_message(request: Request, msg: schemas.MessageCreate, current_user: models.User = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
     if len(msg.content) > 10000: # 10KB limit
         raise HTTPException(status_code=400, detail="Message too long")
     # Verify recipient exists and has PQC key
     recipient_addr = msg.recipient_address.lower()
-    recipient = db.query(models.User).filter(models.User.address == recipient_addr).first()
+    recipient = await db.scalar(select(models.User).where(models.User.has_address(recipient_addr)))
     if not recipient:
         raise HTTPException(status_code=404, detail="Recipient not found")
     
@@ -32,14 +35,17 @@ async def send_message(request: Request, msg: schemas.MessageCreate, current_use
     
     # Create message
     new_msg = models.Message(
-        sender_address=current_user.address,
-        recipient_address=recipient_addr, # Store lowercase
+        sender_id=current_user.id,
+        recipient_id=recipient.id,
         content=msg.content,
         is_read=False
     )
     db.add(new_msg)
-    db.commit()
-    db.refresh(new_msg)
+    await db.flush()
+    # Inbox rows of both participants, in the same transaction as the message
+    await db.execute(summary_upsert(db.bind.dialect.name, new_msg))
+    await db.commit()
+    await db.refresh(new_msg, ["sender_address", "recipient_address", "sender", "recipient"])
     
     # Real-time Broadcast
     msg_data = {
@@ -59,7 +65,7 @@ async def send_message(request: Request, msg: schemas.MessageCreate, current_use
     
     # Send Push Notification
     sender_name = current_user.username or f"{current_user.address[:8]}..."
-    notify_user_push(
+    await notify_user_push_async(
         db, 
         recipient_addr, 
         title="New Message", 
@@ -76,114 +82,86 @@ async def send_message(request: Request, msg: schemas.MessageCreate, current_use
 @limiter.limit("30/minute")
 def get_conversations(request: Request, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
     """
-    Fetch list of unique conversations for the current user.
-    Optimized to minimize DB queries (N+1 fixed) and avoid fetching all message content.
+    Fetch list of unique conversations for the current user, most recent first.
+    Reads the materialized conversation_summaries rows (see utils/conversations.py),
+    so the cost follows the number of conversations, not the message history.
     """
-    # SQLite-compatible optimization to get the latest message for each partner.
-    # We find the max ID for each conversation pair.
-    
-    # 1. Subquery: Find the latest message ID for each conversation pair (user <-> partner)
-    # The pair is identified by ensuring smaller address is first, or simply by checking both directions.
-    # Grouping by the "other person" is safer.
-    
-    # Let's get distinct partners first?
-    # Or strict SQL approach:
-    # SELECT * FROM messages m 
-    # WHERE m.id IN (
-    #   SELECT MAX(id) FROM messages 
-    #   WHERE sender_address = :me OR recipient_address = :me 
-    #   GROUP BY CASE WHEN sender_address = :me THEN recipient_address ELSE sender_address END
-    # )
-    
-    # SQLAlchemy expression:
-    from sqlalchemy import func, case, and_
-    
-    partner_address_col = case(
-        (models.Message.sender_address == current_user.address, models.Message.recipient_address),
-        else_=models.Message.sender_address
-    )
-    
-    subquery = db.query(
-        func.max(models.Message.id).label("max_id")
+    summaries = db.query(models.ConversationSummary).options(
+        selectinload(models.ConversationSummary.partner),
+        selectinload(models.ConversationSummary.last_message).selectinload(models.Message.sender),
+        selectinload(models.ConversationSummary.last_message).selectinload(models.Message.recipient),
     ).filter(
-        or_(
-            models.Message.sender_address == current_user.address,
-            models.Message.recipient_address == current_user.address
+        models.ConversationSummary.user_id == current_user.id
+    ).order_by(models.ConversationSummary.last_activity.desc()).all()
+
+    return [
+        {"user": s.partner, "last_message": s.last_message, "unread_count": s.unread_count}
+        for s in summaries
+    ]
+
+def _history_ids(user_id: int, partner_id: int, before_id, after_id, count: int):
+    """
+    SELECT of up to `count` message IDs of the conversation, newest first (oldest
+    first with after_id). Each direction is a bounded range scan on
+    (sender_id, recipient_id, id) cut at `count`, so the cost doesn't grow with
+    the depth; the caller merges the two halves.
+    """
+    order = models.Message.id.asc() if after_id is not None else models.Message.id.desc()
+
+    def direction(sender_id, recipient_id):
+        q = select(models.Message.id).where(
+            models.Message.sender_id == sender_id, models.Message.recipient_id == recipient_id
         )
-    ).group_by(partner_address_col).subquery()
-    
-    # 2. Main Query: Fetch messages that match these IDs
-    # Also eager load the sender/recipient to avoid N+1 when determining user info
-    from sqlalchemy.orm import joinedload
-    
-    latest_messages = db.query(models.Message).options(
-        joinedload(models.Message.sender),
-        joinedload(models.Message.recipient),
-        defer(models.Message.content) # Defer content unless needed
-    ).filter(
-        models.Message.id.in_(subquery)
-    ).order_by(models.Message.created_at.desc()).all()
-    
-    conversations = []
-    
-    # 3. Process results
-    # We need to compute unread count. Optimized approach: 
-    # A single query to get all unread counts grouped by sender?
-    #   SELECT sender_address, COUNT(*) FROM messages 
-    #   WHERE recipient_address = :me AND is_read = 0 
-    #   GROUP BY sender_address
-    
-    unread_counts_query = db.query(
-        models.Message.sender_address, func.count(models.Message.id)
-    ).filter(
-        models.Message.recipient_address == current_user.address,
-        models.Message.is_read == False
-    ).group_by(models.Message.sender_address).all()
-    
-    unread_map = {addr: count for addr, count in unread_counts_query}
-    
-    for m in latest_messages:
-        partner = m.recipient if m.sender_address == current_user.address else m.sender
-        
-        # Safety check if partner user exists (it should due to FK)
-        if not partner:
-            continue
-            
-        unread = unread_map.get(partner.address, 0)
-        
-        conversations.append({
-            "user": partner,
-            "last_message": m,
-            "unread_count": unread
-        })
-    
-    return conversations
+        if before_id is not None:
+            q = q.where(models.Message.id < before_id)
+        if after_id is not None:
+            q = q.where(models.Message.id > after_id)
+        return select(q.order_by(order).limit(count).subquery().c.id)
+
+    both = union_all(direction(user_id, partner_id), direction(partner_id, user_id)).subquery()
+    return select(both.c.id)
 
 @router.post("/history", response_model=List[schemas.MessageResponse])
 @limiter.limit("60/minute")
-def get_message_history(request: Request, req: schemas.HistoryRequest, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    if req.limit > 100:
-        req.limit = 100
-    
-    partner_address = req.partner_address.lower()
-    
+def get_message_history(request: Request, response: Response, req: schemas.HistoryRequest, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """
+    A page of the conversation in chronological order: the latest messages, those
+    older than before_id or newer than after_id (or a cursor). The cursor for the
+    next page in the same direction is returned in X-Next-Cursor.
+    """
+    before_id, after_id = page_bounds(req.before_id, req.after_id, req.cursor)
+
+    partner = db.query(models.User).filter(models.User.has_address(req.partner_address.lower())).first()
+    if not partner:
+        return []
+
+    # One extra row tells whether there is a next page; `offset` is kept for older clients
+    offset = req.offset if before_id is None and after_id is None else 0
+    count = offset + req.limit + 1
+    order = models.Message.id.asc() if after_id is not None else models.Message.id.desc()
     msgs = db.query(models.Message).filter(
-        or_(
-            (models.Message.sender_address == current_user.address) & (models.Message.recipient_address == partner_address),
-            (models.Message.sender_address == partner_address) & (models.Message.recipient_address == current_user.address)
-        )
-    ).order_by(models.Message.created_at.desc()).limit(req.limit).offset(req.offset).all()
-    
-    return msgs[::-1]
+        models.Message.id.in_(_history_ids(current_user.id, partner.id, before_id, after_id, count))
+    ).order_by(order).offset(offset).limit(req.limit + 1).all()
+
+    cursor = next_cursor(msgs, req.limit, after_id)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    page = msgs[:req.limit]
+    return page if after_id is not None else page[::-1]
 
 @router.post("/mark-read/{partner_address}")
 def mark_read(partner_address: str, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    partner_addr = partner_address.lower()
+    partner = db.query(models.User).filter(models.User.has_address(partner_address.lower())).first()
+    if not partner:
+        return {"status": "ok"}
     
+    # Summary first: its row lock orders this against a concurrent send_message
+    db.execute(clear_unread(current_user.id, partner.id))
+
     # Mark all messages sent BY partner TO me as read
     db.query(models.Message).filter(
-        models.Message.sender_address == partner_addr,
-        models.Message.recipient_address == current_user.address,
+        models.Message.sender_id == partner.id,
+        models.Message.recipient_id == current_user.id,
         models.Message.is_read == False
     ).update({"is_read": True})
     
@@ -233,7 +211,10 @@ async def websocket_endpoint(websocket: WebSocket):
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
             return
 
-        payload = auth.decode_access_token(token)
+        # Optional session ticket (see /auth/session-ticket) avoids the PQC check
+        payload = auth.verify_session_ticket(auth_data.get("ticket"), token)
+        if payload is None:
+            payload = await auth.decode_access_token_async(token)
         if not payload or not payload.get("sub"):
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
             return
@@ -0,0 +1,64 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+import auth
+from crypto_pool import crypto_pool
+from database import sqlite_maintenance
+from grant_expiry import grant_sweeper
+from pqc_client import pqc, verify_batcher
+
+# Internal counters as JSON or Prometheus text. Only mounted when METRICS_ENABLED=1
+# (see main.py); keep it behind the internal network / reverse proxy.
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"]
+)
+
+@router.get("")
+def get_metrics():
+    return {
+        "auth_workers": crypto_pool.stats(),
+        "token_cache": auth.token_cache.stats(),
+        "pqc_endpoints": pqc.stats(),
+        "pqc_breaker": pqc.breaker.stats(),
+        "pqc_latency": pqc.latency_stats(),
+        "pqc_hedging": {"sent": pqc.hedges_sent, "won": pqc.hedges_won},
+        "pqc_batches": {
+            "batches_sent": verify_batcher.batches_sent,
+            "items_sent": verify_batcher.items_sent,
+        },
+        "sqlite": sqlite_maintenance.stats(),
+        "grant_expiry": grant_sweeper.stats(),
+    }
+
+def prometheus_text() -> str:
+    lines = [
+        "# HELP safelog_pqc_request_duration_ms PQC sidecar call latency by path.",
+        "# TYPE safelog_pqc_request_duration_ms histogram",
+    ]
+    for path, snap in sorted(pqc.latency_stats().items()):
+        for bound, count in snap["buckets"].items():
+            lines.append(f'safelog_pqc_request_duration_ms_bucket{{path="{path}",le="{bound}"}} {count}')
+        lines.append(f'safelog_pqc_request_duration_ms_sum{{path="{path}"}} {snap["sum_ms"]}')
+        lines.append(f'safelog_pqc_request_duration_ms_count{{path="{path}"}} {snap["count"]}')
+
+    breaker = pqc.breaker.stats()
+    workers = crypto_pool.stats()
+    cache = auth.token_cache.stats()
+    gauges = [
+        ("safelog_pqc_breaker_open", "1 while the PQC circuit breaker is open.", int(breaker["state"] != "closed")),
+        ("safelog_pqc_breaker_rejected_total", "Calls failed fast by the breaker.", breaker["rejected"]),
+        ("safelog_pqc_hedges_sent_total", "Hedged PQC calls sent.", pqc.hedges_sent),
+        ("safelog_pqc_hedges_won_total", "Hedged PQC calls answered first.", pqc.hedges_won),
+        ("safelog_auth_worker_queue_depth", "Signature checks waiting for a worker.", workers["queue_depth"]),
+        ("safelog_token_cache_hits_total", "Verified-token cache hits.", cache["hits"]),
+        ("safelog_token_cache_misses_total", "Verified-token cache misses.", cache["misses"]),
+        ("safelog_expired_grants_deleted_total", "Expired access grants deleted by the sweeper.", grant_sweeper.deleted),
+    ]
+    for name, help_text, value in gauges:
+        kind = "counter" if name.endswith("_total") else "gauge"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+@router.get("/prometheus", response_class=PlainTextResponse)
+def get_prometheus_metrics():
+    return prometheus_text()
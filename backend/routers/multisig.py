@@ -1,13 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from dependencies import limiter
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import case, insert, select, union, update
 from typing import List
 from datetime import datetime, timezone
 import models, schemas
 from database import get_db
 from dependencies import get_current_user
 from websocket_manager import manager
-from utils.push import notify_user_push
+from utils.push import notify_user_push, notify_users_push
 
 router = APIRouter(
     prefix="/multisig",
@@ -17,134 +18,124 @@ router = APIRouter(
 @router.post("/workflow", response_model=schemas.MultisigWorkflowResponse)
 @limiter.limit("5/minute")
 def create_multisig_workflow(request: Request, workflow: schemas.MultisigWorkflowCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    # 1. Create the Secret (Owned by Creator)
+    """
+    Create the secret, the owner's grant, the workflow and its signer and
+    recipient rows as one unit of work: a single commit, so a failure leaves
+    nothing behind, and bulk INSERTs whatever the number of participants.
+    """
+    # Each participant once, in request order
+    signer_addrs = list(dict.fromkeys(a.lower() for a in workflow.signers))
+    recipient_addrs = list(dict.fromkeys(a.lower() for a in workflow.recipients))
+
+    # Signer/recipient rows reference users by id: resolve every address up front
+    addresses = set(signer_addrs) | set(recipient_addrs)
+    users = {u.address: u.id for u in db.query(models.User.id, models.User.address).filter(models.User.has_any_address(addresses))}
+    if addresses - users.keys():
+        raise HTTPException(status_code=404, detail="Signer or recipient not found")
+
     # 1. Create the Secret (Owned by Creator)
     new_secret = models.Secret(
-        owner_address=current_user.address,
+        owner_id=current_user.id,
         name=workflow.secret_data.name,
         type=workflow.secret_data.type,
         encrypted_data=workflow.secret_data.encrypted_data
     )
-    db.add(new_secret)
-    db.flush()
-
-    # 1.1 Create AccessGrant for Owner (Creator) - Envelope Logic
+    # 1.1 AccessGrant for Owner (Creator) - Envelope Logic
     # Schema validation ensures encrypted_key is present in secret_data
     owner_grant = models.AccessGrant(
-        secret_id=new_secret.id,
-        grantee_address=current_user.address,
+        secret=new_secret,
+        grantee_id=current_user.id,
         encrypted_key=workflow.secret_data.encrypted_key
     )
-    db.add(owner_grant)
-    
-    db.commit() # Commit secret and grant
-    db.refresh(new_secret)
-
-    # 2. Create Workflow
+    # 2. Workflow
     new_workflow = models.MultisigWorkflow(
         name=workflow.name,
-        owner_address=current_user.address,
-        secret_id=new_secret.id,
-        status="pending"
+        owner_id=current_user.id,
+        secret=new_secret,
+        status="pending",
+        required_signatures=len(signer_addrs)
     )
-    db.add(new_workflow)
-    db.commit()
-    db.refresh(new_workflow)
-
-    # 3. Add Signers & Their Access
-    for signer_addr in workflow.signers:
-        s_addr = signer_addr.lower()
-        # Verify user exists (optional, or auto-create/fail?)
-        # For robustness, we check if user exists. If not, we might fail or create stub.
-        # Let's assume frontend ensures users exist or we fail.
-        # But we need to add to WorkflowSigner
-        # Validate and Store Key directly in Signer Entry (No AccessGrant)
-        normalized_keys = {k.lower(): v for k, v in workflow.signer_keys.items()}
-        key = normalized_keys.get(s_addr)
-        
-        signer_entry = models.MultisigWorkflowSigner(
-            workflow_id=new_workflow.id,
-            user_address=s_addr,
-            has_signed=False,
-            encrypted_key=key
-        )
-        db.add(signer_entry)
+    db.add_all([new_secret, owner_grant, new_workflow])
+    db.flush()
 
-    # 4. Add Recipients (Access granted only upon completion)
-    for recipient_addr in workflow.recipients:
-        r_addr = recipient_addr.lower()
-        key = workflow.recipient_keys.get(r_addr)
-        
-        # Always add recipient, even if key is deferred
-        recipient_entry = models.MultisigWorkflowRecipient(
-            workflow_id=new_workflow.id,
-            user_address=r_addr,
-            encrypted_key=key # Can be None initially
-        )
-        db.add(recipient_entry)
+    # 3. Signers hold their key directly (No AccessGrant); 4. Recipients get theirs upon completion
+    signer_keys = {k.lower(): v for k, v in workflow.signer_keys.items()}
+    recipient_keys = {k.lower(): v for k, v in workflow.recipient_keys.items()}
+    if signer_addrs:
+        db.execute(insert(models.MultisigWorkflowSigner), [
+            {"workflow_id": new_workflow.id, "user_id": users[addr], "has_signed": False, "encrypted_key": signer_keys.get(addr)}
+            for addr in signer_addrs
+        ])
+    if recipient_addrs:
+        # Always add recipient, even if key is deferred (None)
+        db.execute(insert(models.MultisigWorkflowRecipient), [
+            {"workflow_id": new_workflow.id, "user_id": users[addr], "encrypted_key": recipient_keys.get(addr)}
+            for addr in recipient_addrs
+        ])
 
     db.commit()
-    db.refresh(new_workflow)
-    
+    new_workflow = _load_workflows(db).filter(models.MultisigWorkflow.id == new_workflow.id).populate_existing().one()
+
     # Notify Signers
     sender_name = current_user.username or f"{current_user.address[:8]}..."
-    for signer_addr in workflow.signers:
-        s_addr = signer_addr.lower()
-        if s_addr != current_user.address:
-            notify_user_push(
-                db,
-                s_addr,
-                title="Signature Required",
-                body=f"{sender_name} requested your signature for: {new_workflow.name}",
-                data={"type": "multisig_request", "workflow_id": new_workflow.id}
-            )
+    notify_users_push(
+        db,
+        [addr for addr in signer_addrs if addr != current_user.address],
+        title="Signature Required",
+        body=f"{sender_name} requested your signature for: {new_workflow.name}",
+        data={"type": "multisig_request", "workflow_id": new_workflow.id}
+    )
 
     return new_workflow
 
+def _load_workflows(db: Session):
+    """Workflow query batch-loading everything MultisigWorkflowResponse reads."""
+    wf = models.MultisigWorkflow
+    return db.query(wf).options(
+        selectinload(wf.owner),
+        selectinload(wf.secret).selectinload(models.Secret.owner),
+        selectinload(wf.signers).selectinload(models.MultisigWorkflowSigner.user),
+        selectinload(wf.recipients).selectinload(models.MultisigWorkflowRecipient.user),
+    )
+
 @router.get("/workflows", response_model=List[schemas.MultisigWorkflowResponse])
 def list_multisig_workflows(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    # Return workflows where I am owner OR signer
-    # Using python filtering for simplicity unless perf is issue, OR union query.
-    # Simple Union query:
-    
-    # Owned - Eager load secret to avoid N+1 and ensure we have it for validation
-    owned = db.query(models.MultisigWorkflow).options(joinedload(models.MultisigWorkflow.secret)).filter(models.MultisigWorkflow.owner_address == current_user.address).all()
-    
-    # Helper to fetch workflows where I am signer
-    signed_subq = db.query(models.MultisigWorkflowSigner.workflow_id).filter(models.MultisigWorkflowSigner.user_address == current_user.address)
-    as_signer = db.query(models.MultisigWorkflow).options(joinedload(models.MultisigWorkflow.secret)).filter(models.MultisigWorkflow.id.in_(signed_subq)).all()
+    """
+    Workflows I own or sign, plus completed ones I receive: one query for the
+    workflows (a UNION of the three memberships), batch loads for their secrets,
+    owners, signers and recipients, and one IN query for my owner grants.
+    """
+    wf, signer, recipient = models.MultisigWorkflow, models.MultisigWorkflowSigner, models.MultisigWorkflowRecipient
+    visible = union(
+        select(wf.id).where(wf.owner_id == current_user.id),
+        select(signer.workflow_id).where(signer.user_id == current_user.id),
+        select(recipient.workflow_id).join(recipient.workflow).where(
+            recipient.user_id == current_user.id, wf.status == 'completed'
+        ),
+    )
+    workflows = _load_workflows(db).filter(wf.id.in_(visible)).order_by(wf.id).all()
+
+    # My envelope keys for the workflows I own
+    owned_secret_ids = [w.secret_id for w in workflows if w.owner_id == current_user.id]
+    owner_keys = dict(db.query(models.AccessGrant.secret_id, models.AccessGrant.encrypted_key).filter(
+        models.AccessGrant.secret_id.in_(owned_secret_ids),
+        models.AccessGrant.grantee_id == current_user.id
+    )) if owned_secret_ids else {}
 
-    # Helper to fetch workflows where I am recipient (ONLY COMPLETED)
-    recipient_subq = db.query(models.MultisigWorkflowRecipient.workflow_id).filter(models.MultisigWorkflowRecipient.user_address == current_user.address)
-    as_recipient = db.query(models.MultisigWorkflow).options(joinedload(models.MultisigWorkflow.secret)).filter(
-        models.MultisigWorkflow.id.in_(recipient_subq),
-        models.MultisigWorkflow.status == 'completed'
-    ).all()
-    
-    # Deduplicate (if I am owner AND signer?)
-    all_wf_orm = {w.id: w for w in owned + as_signer + as_recipient}
-    
     response_list = []
-    for wf in all_wf_orm.values():
+    for w in workflows:
         # Check if secret exists (Data Corruption Handling)
-        if not wf.secret:
+        if not w.secret:
             continue
-            
-        val = schemas.MultisigWorkflowResponse.model_validate(wf)
-        
-        # If I am owner, fetch and attach key
-        if wf.owner_address == current_user.address and wf.secret:
-             # Optimization: Could load all grants in one go, but keeping it simple for fix
-             grant = db.query(models.AccessGrant).filter(
-                models.AccessGrant.secret_id == wf.secret.id,
-                models.AccessGrant.grantee_address == current_user.address
-            ).first()
-             if grant:
-                 val.owner_encrypted_key = grant.encrypted_key
-                 val.secret.encrypted_key = grant.encrypted_key
-        
+
+        val = schemas.MultisigWorkflowResponse.model_validate(w)
+        key = owner_keys.get(w.secret_id) if w.owner_id == current_user.id else None
+        if key:
+            val.owner_encrypted_key = key
+            val.secret.encrypted_key = key
+
         response_list.append(val)
-        
+
     return response_list
 
 @router.get("/workflow/{workflow_id}", response_model=schemas.MultisigWorkflowResponse)
@@ -155,15 +146,15 @@ def get_multisig_workflow(workflow_id: int, current_user: models.User = Depends(
         raise HTTPException(status_code=404, detail="Workflow not found")
         
     # Check permissions (Owner/Signer/Recipient?)
-    is_owner = wf.owner_address == current_user.address
+    is_owner = wf.owner_id == current_user.id
     is_signer = db.query(models.MultisigWorkflowSigner).filter(
         models.MultisigWorkflowSigner.workflow_id == wf.id,
-        models.MultisigWorkflowSigner.user_address == current_user.address
+        models.MultisigWorkflowSigner.user_id == current_user.id
     ).first() is not None
 
     is_recipient = db.query(models.MultisigWorkflowRecipient).filter(
         models.MultisigWorkflowRecipient.workflow_id == wf.id,
-        models.MultisigWorkflowRecipient.user_address == current_user.address
+        models.MultisigWorkflowRecipient.user_id == current_user.id
     ).first() is not None
     
     # Access Logic: Owner/Signer always. Recipient ONLY if completed.
@@ -180,7 +171,7 @@ def get_multisig_workflow(workflow_id: int, current_user: models.User = Depends(
         # Checking Grant for Secret
         grant = db.query(models.AccessGrant).filter(
             models.AccessGrant.secret_id == wf.secret.id,
-            models.AccessGrant.grantee_address == current_user.address
+            models.AccessGrant.grantee_id == current_user.id
         ).first()
         
         if grant:
@@ -194,42 +185,66 @@ def get_multisig_workflow(workflow_id: int, current_user: models.User = Depends(
 @router.post("/workflow/{workflow_id}/sign", response_model=schemas.MultisigWorkflowResponse)
 @limiter.limit("20/minute")
 def sign_multisig_workflow(request: Request, workflow_id: int, sig_req: schemas.MultisigSignatureRequest, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    wf = db.query(models.MultisigWorkflow).filter(models.MultisigWorkflow.id == workflow_id).first()
+    """
+    Record the caller's signature, release any recipient keys it carries and
+    complete the workflow once every signer has signed, in one transaction and a
+    fixed number of statements whatever the number of signers and recipients.
+    """
+    wf_model, signer_model = models.MultisigWorkflow, models.MultisigWorkflowSigner
+    recipient_model = models.MultisigWorkflowRecipient
+    wf = db.query(wf_model).filter(wf_model.id == workflow_id).first()
     if not wf:
         raise HTTPException(status_code=404, detail="Workflow not found")
-        
-    signer = db.query(models.MultisigWorkflowSigner).filter(
-        models.MultisigWorkflowSigner.workflow_id == wf.id,
-        models.MultisigWorkflowSigner.user_address == current_user.address.lower()
-    ).first()
-    
-    if not signer:
-        raise HTTPException(status_code=403, detail="You are not a signer for this workflow")
-        
-    if signer.has_signed:
+
+    # Claim the signature: only one request can flip has_signed for this signer
+    claimed = db.execute(
+        update(signer_model)
+        .where(signer_model.workflow_id == wf.id, signer_model.user_id == current_user.id,
+               signer_model.has_signed.is_not(True))
+        .values(has_signed=True, signature=sig_req.signature, signed_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        is_signer = db.query(signer_model.id).filter(
+            signer_model.workflow_id == wf.id, signer_model.user_id == current_user.id
+        ).first() is not None
+        if not is_signer:
+            raise HTTPException(status_code=403, detail="You are not a signer for this workflow")
         raise HTTPException(status_code=400, detail="Already signed")
-        
-    # Update Signer
-    signer.has_signed = True
-    signer.signature = sig_req.signature
-    signer.signed_at = datetime.now(timezone.utc)
-    
-    # Store Recipient Keys (Release Mechanism) if provided
+
+    # Store Recipient Keys (Release Mechanism) if provided: one UPDATE for all recipients
     if sig_req.recipient_keys:
-        for r_addr, enc_key in sig_req.recipient_keys.items():
-            recipient = db.query(models.MultisigWorkflowRecipient).filter(
-                models.MultisigWorkflowRecipient.workflow_id == wf.id,
-                models.MultisigWorkflowRecipient.user_address == r_addr
-            ).first()
-            if recipient:
-                recipient.encrypted_key = enc_key
+        keys = {addr.lower(): key for addr, key in sig_req.recipient_keys.items()}
+        user_ids = {u.address: u.id for u in db.query(models.User.id, models.User.address).filter(models.User.has_any_address(keys))}
+        keys_by_id = {user_ids[addr]: key for addr, key in keys.items() if addr in user_ids}
+        if keys_by_id:
+            db.execute(
+                update(recipient_model)
+                .where(recipient_model.workflow_id == wf.id, recipient_model.user_id.in_(keys_by_id))
+                .values(encrypted_key=case(keys_by_id, value=recipient_model.user_id))
+                .execution_options(synchronize_session=False)
+            )
 
-    db.commit() # Commit this signature and keys first
-    
+    # Count the signature and complete on the last one. The row lock taken by this
+    # UPDATE serializes concurrent signers, so exactly one of them sees the final count.
+    db.execute(
+        update(wf_model)
+        .where(wf_model.id == wf.id)
+        .values(
+            signed_count=wf_model.signed_count + 1,
+            status=case((wf_model.signed_count + 1 >= wf_model.required_signatures, "completed"), else_=wf_model.status),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    signed_count, required = db.query(wf_model.signed_count, wf_model.required_signatures).filter(wf_model.id == wf.id).one()
+    completed_now = signed_count == required
+    db.commit()
+
+    wf = _load_workflows(db).filter(wf_model.id == workflow_id).populate_existing().one()
     sender_name = current_user.username or f"{current_user.address[:8]}..."
-    
+
     # Notify Owner
-    if wf.owner_address != current_user.address:
+    if wf.owner_id != current_user.id:
         notify_user_push(
             db,
             wf.owner_address,
@@ -238,24 +253,14 @@ def sign_multisig_workflow(request: Request, workflow_id: int, sig_req: schemas.
             data={"type": "multisig_signed", "workflow_id": wf.id}
         )
 
-    # Check if ALL have signed
-    all_signers = db.query(models.MultisigWorkflowSigner).filter(models.MultisigWorkflowSigner.workflow_id == wf.id).all()
-    all_signed = all(s.has_signed for s in all_signers)
-    
-    if all_signed:
-        wf.status = "completed"
-        # Release handled above via Recipient Key updates in table
-        db.commit()
-        
+    if completed_now:
         # Notify Recipients
-        for recipient in wf.recipients:
-            notify_user_push(
-                db,
-                recipient.user_address,
-                title="Secret Released",
-                body=f"Multisig workflow '{wf.name}' is complete. You now have access to the secret.",
-                data={"type": "multisig_completed", "workflow_id": wf.id}
-            )
-    
-    db.refresh(wf)
+        notify_users_push(
+            db,
+            [recipient.user_address for recipient in wf.recipients],
+            title="Secret Released",
+            body=f"Multisig workflow '{wf.name}' is complete. You now have access to the secret.",
+            data={"type": "multisig_completed", "workflow_id": wf.id}
+        )
+
     return wf
@@ -21,7 +21,7 @@ def subscribe(request: Request, sub: schemas.PushSubscriptionCreate, current_use
     
     if existing:
         # Update user if it changed (e.g. login with different account on same browser)
-        existing.user_address = current_user.address
+        existing.user_id = current_user.id
         existing.p256dh = sub.p256dh
         existing.auth = sub.auth
         db.commit()
@@ -29,7 +29,7 @@ def subscribe(request: Request, sub: schemas.PushSubscriptionCreate, current_use
         return existing
 
     new_sub = models.PushSubscription(
-        user_address=current_user.address,
+        user_id=current_user.id,
         endpoint=sub.endpoint,
         p256dh=sub.p256dh,
         auth=sub.auth
@@ -43,7 +43,7 @@ def subscribe(request: Request, sub: schemas.PushSubscriptionCreate, current_use
 @limiter.limit("10/minute")
 def unsubscribe(request: Request, endpoint: str, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
     db.query(models.PushSubscription).filter(
-        models.PushSubscription.user_address == current_user.address,
+        models.PushSubscription.user_id == current_user.id,
         models.PushSubscription.endpoint == endpoint
     ).delete()
     db.commit()
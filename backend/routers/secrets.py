@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, status, Request, Response, Query
 from dependencies import limiter
-from sqlalchemy.orm import Session, joinedload
-from typing import List
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, joinedload, selectinload, contains_eager, defer, with_expression
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import base64
+import binascii
 from datetime import datetime, timezone, timedelta
 import models, schemas
-from database import get_db
-from dependencies import get_current_user
+from database import get_db, get_async_db, byte_length
+from dependencies import get_current_user, get_current_user_async
 from websocket_manager import manager
-from utils.push import notify_user_push
+from utils.push import notify_user_push_async
+from utils.pagination import NEXT_CURSOR_HEADER, page_bounds, next_cursor
 import config
 
 router = APIRouter(tags=["secrets"]) # Secrets and Documents mixed? Or should I separate? Plan said secrets.py
@@ -18,7 +23,7 @@ router = APIRouter(tags=["secrets"]) # Secrets and Documents mixed? Or should I
 def create_secret(request: Request, secret: schemas.SecretCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
     # 1. Create Secret (Content)
     new_secret = models.Secret(
-        owner_address=current_user.address,
+        owner_id=current_user.id,
         name=secret.name,
         type=secret.type,
         encrypted_data=secret.encrypted_data
@@ -29,7 +34,7 @@ def create_secret(request: Request, secret: schemas.SecretCreate, current_user:
     # 2. Create AccessGrant for Owner (Key)
     owner_grant = models.AccessGrant(
         secret_id=new_secret.id,
-        grantee_address=current_user.address,
+        grantee_id=current_user.id,
         encrypted_key=secret.encrypted_key
     )
     db.add(owner_grant)
@@ -45,8 +50,8 @@ def get_secrets(current_user: models.User = Depends(get_current_user), db: Sessi
     # Fetch secrets owned by user AND their corresponding AccessGrant key
     # We join AccessGrant to get the key efficiently
     results = db.query(models.Secret, models.AccessGrant.encrypted_key)\
-        .join(models.AccessGrant, (models.AccessGrant.secret_id == models.Secret.id) & (models.AccessGrant.grantee_address == current_user.address))\
-        .filter(models.Secret.owner_address == current_user.address)\
+        .join(models.AccessGrant, (models.AccessGrant.secret_id == models.Secret.id) & (models.AccessGrant.grantee_id == current_user.id))\
+        .filter(models.Secret.owner_id == current_user.id)\
         .all()
     
     response = []
@@ -57,6 +62,59 @@ def get_secrets(current_user: models.User = Depends(get_current_user), db: Sessi
         
     return response
 
+def _summary_loading():
+    """Loader options for Secret summaries: encrypted_data stays deferred, its size is computed in SQL."""
+    return (
+        defer(models.Secret.encrypted_data),
+        with_expression(models.Secret.size, byte_length(models.Secret.encrypted_data)),
+    )
+
+def _page(query, id_column, limit: int, cursor: Optional[str], response: Response):
+    """
+    One page of `query`, newest `id_column` first. The cursor for the next page
+    goes in X-Next-Cursor (see utils/pagination.py).
+    """
+    before_id, after_id = page_bounds(None, None, cursor)
+    if after_id is not None:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if before_id is not None:
+        query = query.filter(id_column < before_id)
+    rows = query.order_by(id_column.desc()).limit(limit + 1).all()
+    next_page = next_cursor(rows, limit, None)
+    if next_page:
+        response.headers[NEXT_CURSOR_HEADER] = next_page
+    return rows[:limit]
+
+@router.get("/secrets/summary", response_model=List[schemas.SecretSummary])
+def get_secrets_summary(response: Response, limit: int = Query(50, ge=1, le=200), cursor: Optional[str] = None,
+                        current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """
+    Owned secrets, newest first, without encrypted_data (which can be up to 16MB
+    per secret): metadata and stored size only. Fetch a payload from
+    /secrets/{id}/payload.
+    """
+    query = db.query(models.Secret).options(*_summary_loading()).filter(
+        models.Secret.owner_id == current_user.id
+    )
+    return _page(query, models.Secret.id, limit, cursor, response)
+
+@router.get("/secrets/{secret_id}/payload", response_model=schemas.SecretPayload)
+def get_secret_payload(secret_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """One secret's encrypted_data with the caller's key, for the owner or a live grantee."""
+    row = db.query(models.Secret.id, models.Secret.encrypted_data, models.AccessGrant.encrypted_key).join(
+        models.AccessGrant,
+        (models.AccessGrant.secret_id == models.Secret.id) & (models.AccessGrant.grantee_id == current_user.id)
+    ).filter(
+        models.Secret.id == secret_id,
+        models.AccessGrant.is_live(datetime.now(timezone.utc))
+    ).first()
+    if row:
+        return row._asdict()
+
+    # No key: 404/403, unless the owner revoked their own grant
+    secret = _check_secret_access(secret_id, current_user.id, db)
+    return {"id": secret.id, "encrypted_data": secret.encrypted_data, "encrypted_key": None}
+
 @router.put("/secrets/{secret_id}", response_model=schemas.SecretResponse)
 def update_secret(secret_id: int, secret_update: schemas.SecretCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
     secret = db.query(models.Secret).filter(models.Secret.id == secret_id).first()
@@ -64,7 +122,7 @@ def update_secret(secret_id: int, secret_update: schemas.SecretCreate, current_u
         raise HTTPException(status_code=404, detail="Secret not found")
     
     # Check ownership
-    if secret.owner_address != current_user.address:
+    if secret.owner_id != current_user.id:
          raise HTTPException(status_code=403, detail="Not authorized")
 
     secret.name = secret_update.name
@@ -79,7 +137,7 @@ def delete_secret(secret_id: int, current_user: models.User = Depends(get_curren
     if not secret:
         raise HTTPException(status_code=404, detail="Secret not found")
     
-    if secret.owner_address != current_user.address:
+    if secret.owner_id != current_user.id:
          raise HTTPException(status_code=403, detail="Not authorized")
     
     # Cascade delete grants
@@ -90,29 +148,31 @@ def delete_secret(secret_id: int, current_user: models.User = Depends(get_curren
 
 @router.post("/secrets/share", response_model=schemas.AccessGrantResponse)
 @limiter.limit("30/minute")
-async def share_secret(request: Request, grant: schemas.AccessGrantCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    secret = db.query(models.Secret).filter(models.Secret.id == grant.secret_id).first()
+async def share_secret(request: Request, grant: schemas.AccessGrantCreate, current_user: models.User = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+    secret = await db.scalar(
+        select(models.Secret).options(selectinload(models.Secret.owner)).where(models.Secret.id == grant.secret_id)
+    )
     if not secret:
         raise HTTPException(status_code=404, detail="Secret not found")
     
     # Verify ownership
-    if secret.owner_address != current_user.address:
+    if secret.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
 
     # Verify grantee exists
-    grantee = db.query(models.User).filter(models.User.address == grant.grantee_address.lower()).first()
+    grantee = await db.scalar(select(models.User).where(models.User.has_address(grant.grantee_address.lower())))
     if not grantee:
         raise HTTPException(status_code=404, detail="Grantee not found")
 
     # Check if already shared
-    existing_grant = db.query(models.AccessGrant).filter(
+    existing_grant = await db.scalar(select(models.AccessGrant).where(
         models.AccessGrant.secret_id == grant.secret_id,
-        models.AccessGrant.grantee_address == grant.grantee_address.lower()
-    ).first()
+        models.AccessGrant.grantee_id == grantee.id
+    ))
     
     if existing_grant:
-        db.delete(existing_grant)
-        db.commit()
+        await db.delete(existing_grant)
+        await db.commit()
 
     expires_at = None
     if grant.expires_in:
@@ -120,13 +180,13 @@ async def share_secret(request: Request, grant: schemas.AccessGrantCreate, curre
 
     new_grant = models.AccessGrant(
         secret_id=grant.secret_id,
-        grantee_address=grant.grantee_address.lower(),
+        grantee_id=grantee.id,
         encrypted_key=grant.encrypted_key,
         expires_at=expires_at
     )
     db.add(new_grant)
-    db.commit()
-    db.refresh(new_grant)
+    await db.commit()
+    await db.refresh(new_grant, ["grantee_address", "secret", "grantee"])
 
     # Real-time Update
     await manager.send_personal_message({
@@ -140,7 +200,7 @@ async def share_secret(request: Request, grant: schemas.AccessGrantCreate, curre
 
     # Push Notification
     sender_name = current_user.username or f"{current_user.address[:8]}..."
-    notify_user_push(
+    await notify_user_push_async(
         db,
         grant.grantee_address.lower(),
         title="Secret Shared",
@@ -159,8 +219,8 @@ def revoke_grant(grant_id: int, current_user: models.User = Depends(get_current_
     # Check permissions: Caller must be Secret Owner OR Grantee
     secret = db.query(models.Secret).filter(models.Secret.id == grant.secret_id).first()
     
-    is_owner = secret and secret.owner_address == current_user.address
-    is_grantee = grant.grantee_address == current_user.address
+    is_owner = secret and secret.owner_id == current_user.id
+    is_grantee = grant.grantee_id == current_user.id
     
     if not (is_owner or is_grantee):
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -175,74 +235,46 @@ def get_secret_access(secret_id: int, current_user: models.User = Depends(get_cu
     if not secret:
         raise HTTPException(status_code=404, detail="Secret not found")
         
-    if secret.owner_address != current_user.address:
+    if secret.owner_id != current_user.id:
          raise HTTPException(status_code=403, detail="Not authorized")
          
-    # Active Cleanup: Delete expired grants
-    now = datetime.now(timezone.utc)
-    all_grants = db.query(models.AccessGrant).filter(models.AccessGrant.secret_id == secret_id).all()
-    
-    active_grants = []
-    dirty = False
-    for grant in all_grants:
-        if grant.expires_at:
-            # Safe datetime comparison: ensure both are aware or handle naive as UTC
-            grant_expires = grant.expires_at
-            if grant_expires.tzinfo is None:
-                grant_expires = grant_expires.replace(tzinfo=timezone.utc)
-            
-            if grant_expires <= now:
-                db.delete(grant)
-                dirty = True
-            else:
-                active_grants.append(grant)
-        else:
-            active_grants.append(grant)
-    
-    if dirty:
-        db.commit()
-         
-    return active_grants
+    # Expired grants are filtered out here and deleted by the sweeper (grant_expiry.py)
+    return db.query(models.AccessGrant).filter(
+        models.AccessGrant.secret_id == secret_id,
+        models.AccessGrant.is_live(datetime.now(timezone.utc))
+    ).all()
 
 @router.get("/secrets/shared-with-me", response_model=List[schemas.AccessGrantResponse])
 def get_shared_secrets(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    now = datetime.now(timezone.utc)
-    
-    # query grants where grantee is me BUT secret owner is NOT me
-    grants = db.query(models.AccessGrant).options(
+    # query live grants where grantee is me BUT secret owner is NOT me
+    return db.query(models.AccessGrant).options(
         joinedload(models.AccessGrant.secret).joinedload(models.Secret.owner),
         joinedload(models.AccessGrant.grantee)
     ).join(models.Secret).filter(
-        models.AccessGrant.grantee_address == current_user.address,
-        models.Secret.owner_address != current_user.address
+        models.AccessGrant.grantee_id == current_user.id,
+        models.Secret.owner_id != current_user.id,
+        models.AccessGrant.is_live(datetime.now(timezone.utc))
     ).all()
-    
-    valid_grants = []
-    dirty = False
-    for g in grants:
-        # Check expiry
-        # Check expiry
-        if g.expires_at:
-            g_expires = g.expires_at
-            if g_expires.tzinfo is None:
-                 g_expires = g_expires.replace(tzinfo=timezone.utc)
-            
-            if g_expires <= now:
-                db.delete(g)
-                dirty = True
-                continue
-        valid_grants.append(g)
-    
-    if dirty:
-        db.commit()
-            
-    return valid_grants
+
+@router.get("/secrets/shared-with-me/summary", response_model=List[schemas.SharedSecretSummary])
+def get_shared_secrets_summary(response: Response, limit: int = Query(50, ge=1, le=200), cursor: Optional[str] = None,
+                               current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Live grants shared with the current user, newest first, with secret summaries instead of payloads."""
+    query = db.query(models.AccessGrant).join(models.Secret).options(
+        defer(models.AccessGrant.encrypted_key),
+        contains_eager(models.AccessGrant.secret).options(*_summary_loading())
+    ).filter(
+        models.AccessGrant.grantee_id == current_user.id,
+        models.Secret.owner_id != current_user.id,
+        models.AccessGrant.is_live(datetime.now(timezone.utc))
+    )
+    return _page(query, models.AccessGrant.id, limit, cursor, response)
 
 # Documents (Keep in secrets router as per plan implication or separate if desired. "Move secrets and sharing endpoints here." Documents are kind of secrets.)
 @router.post("/documents", response_model=schemas.DocumentResponse)
 def create_document(doc: schemas.DocumentCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
     new_doc = models.Document(
-        owner_address=current_user.address,
+        owner_id=current_user.id,
         name=doc.name,
         content_hash=doc.content_hash,
         signature=doc.signature
@@ -254,23 +286,25 @@ def create_document(doc: schemas.DocumentCreate, current_user: models.User = Dep
 
 @router.get("/documents", response_model=List[schemas.DocumentResponse])
 def get_documents(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(models.Document).filter(models.Document.owner_address == current_user.address).all()
+    return db.query(models.Document).filter(models.Document.owner_id == current_user.id).all()
 
 
 # --- File Chunks ---
 
-def _check_secret_access(secret_id: int, user_address: str, db: Session) -> models.Secret:
-    """Verify the user owns the secret or has an AccessGrant to it."""
-    secret = db.query(models.Secret).filter(models.Secret.id == secret_id).first()
+def _check_secret_access(secret_id: int, user_id: int, db: Session) -> models.Secret:
+    """Verify the user owns the secret or has a live (unexpired) AccessGrant to it."""
+    # The payload isn't needed for the check (it loads on access if a caller wants it)
+    secret = db.query(models.Secret).options(defer(models.Secret.encrypted_data)).filter(models.Secret.id == secret_id).first()
     if not secret:
         raise HTTPException(status_code=404, detail="Secret not found")
 
-    if secret.owner_address == user_address:
+    if secret.owner_id == user_id:
         return secret
 
     grant = db.query(models.AccessGrant).filter(
         models.AccessGrant.secret_id == secret_id,
-        models.AccessGrant.grantee_address == user_address
+        models.AccessGrant.grantee_id == user_id,
+        models.AccessGrant.is_live(datetime.now(timezone.utc))
     ).first()
     if not grant:
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -278,76 +312,100 @@ def _check_secret_access(secret_id: int, user_address: str, db: Session) -> mode
     return secret
 
 
-@router.post("/secrets/chunks", status_code=201)
-@limiter.limit("120/minute")
-def upload_chunk(request: Request, chunk: schemas.FileChunkUpload,
-                 current_user: models.User = Depends(get_current_user),
-                 db: Session = Depends(get_db)):
-    """Upload a single encrypted file chunk. Only the secret owner can upload."""
-    secret = db.query(models.Secret).filter(models.Secret.id == chunk.secret_id).first()
+# Chunks are stored as raw bytes. JSON clients pick hex (the default, for older
+# clients) or base64 with `encoding`; binary clients PUT and GET
+# application/octet-stream bodies, with the IV in X-Chunk-IV.
+CHUNK_IV_HEADER = "X-Chunk-IV"
+OCTET_STREAM = "application/octet-stream"
+
+
+def _decode_chunk(data: str, encoding: str) -> bytes:
+    try:
+        if encoding == "base64":
+            return base64.b64decode(data, validate=True)
+        return bytes.fromhex(data)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail=f"encrypted_data is not valid {encoding}")
+
+
+def _encode_chunk(chunk: models.FileChunk, encoding: str) -> dict:
+    data = chunk.encrypted_data
+    return {
+        "chunk_index": chunk.chunk_index,
+        "iv": chunk.iv,
+        "encrypted_data": base64.b64encode(data).decode() if encoding == "base64" else data.hex(),
+    }
+
+
+def _store_chunk(db: Session, user_id: int, secret_id: int, chunk_index: int, iv: str, data: bytes):
+    """Save one chunk for the owner of `secret_id`, within the per-file size limit."""
+    secret = db.query(models.Secret).options(defer(models.Secret.encrypted_data)).filter(models.Secret.id == secret_id).first()
     if not secret:
         raise HTTPException(status_code=404, detail="Secret not found")
-    if secret.owner_address != current_user.address:
+    if secret.owner_id != user_id:
         raise HTTPException(status_code=403, detail="Only the owner can upload chunks")
 
-    # Check Total Size Limit
-    # Calculate current usage
-    current_size = db.query(models.FileChunk.encrypted_data).filter(
-        models.FileChunk.secret_id == chunk.secret_id
-    ).all()
-    
-    # encrypted_data is hex -> 2 hex chars = 1 byte. 
-    # But wait, the limit is likely on the *original* file size or the *encrypted* storage size?
-    # Config says MAX_TOTAL_FILE_SIZE (50MB). The uploaded chunks are encrypted (slightly larger).
-    # Let's enforcing against the stored hex string length / 2 approx.
-    # To avoid fetching all data, we can sum the lengths in SQL if supported, or just iterate metadata if we stored size.
-    # Since we don't store chunk size in DB, we have to estimate or fetch lengths.
-    # Fetching all encrypted_data is bad for memory. 
-    # Better approach: Add `size` column to FileChunk? Or just use `length(encrypted_data)` in SQL.
-    # SQLite supports `length()`.
-    
-    from sqlalchemy import func
-    total_stored_size_hex = db.query(func.sum(func.length(models.FileChunk.encrypted_data))).filter(
-        models.FileChunk.secret_id == chunk.secret_id
+    # Check Total Size Limit: sum the stored byte lengths in SQL rather than
+    # fetching every chunk's data.
+    current_total_bytes = db.query(func.sum(byte_length(models.FileChunk.encrypted_data))).filter(
+        models.FileChunk.secret_id == secret_id
     ).scalar() or 0
-    
-    current_total_bytes = total_stored_size_hex / 2
-    new_chunk_size = len(chunk.encrypted_data) / 2
-    
-    if (current_total_bytes + new_chunk_size) > config.MAX_TOTAL_FILE_SIZE:
+
+    if len(data) > config.MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=413, detail="Chunk too large")
+    if (current_total_bytes + len(data)) > config.MAX_TOTAL_FILE_SIZE:
          raise HTTPException(status_code=413, detail="File too large (Max 50MB)")
 
-    new_chunk = models.FileChunk(
-        secret_id=chunk.secret_id,
-        chunk_index=chunk.chunk_index,
-        iv=chunk.iv,
-        encrypted_data=chunk.encrypted_data
-    )
-    db.add(new_chunk)
+    db.add(models.FileChunk(secret_id=secret_id, chunk_index=chunk_index, iv=iv, encrypted_data=data))
     db.commit()
-    return {"status": "ok", "chunk_index": chunk.chunk_index}
+    return {"status": "ok", "chunk_index": chunk_index}
+
+
+@router.post("/secrets/chunks", status_code=201)
+@limiter.limit("120/minute")
+def upload_chunk(request: Request, chunk: schemas.FileChunkUpload,
+                 current_user: models.User = Depends(get_current_user),
+                 db: Session = Depends(get_db)):
+    """Upload a single encrypted file chunk (hex or base64). Only the secret owner can upload."""
+    data = _decode_chunk(chunk.encrypted_data, chunk.encoding)
+    return _store_chunk(db, current_user.id, chunk.secret_id, chunk.chunk_index, chunk.iv, data)
+
+
+@router.put("/secrets/{secret_id}/chunks/{chunk_index}", status_code=201)
+@limiter.limit("120/minute")
+def upload_chunk_binary(request: Request, secret_id: int, chunk_index: int,
+                        data: bytes = Body(..., media_type=OCTET_STREAM),
+                        iv: str = Header(..., alias=CHUNK_IV_HEADER, max_length=100),
+                        current_user: models.User = Depends(get_current_user),
+                        db: Session = Depends(get_db)):
+    """Upload a chunk as a raw application/octet-stream body, IV in X-Chunk-IV."""
+    return _store_chunk(db, current_user.id, secret_id, chunk_index, iv, data)
 
 
 @router.get("/secrets/{secret_id}/chunks", response_model=List[schemas.FileChunkResponse])
-def list_chunks(secret_id: int,
+def list_chunks(secret_id: int, encoding: str = Query("hex", pattern="^(hex|base64)$"),
                 current_user: models.User = Depends(get_current_user),
                 db: Session = Depends(get_db)):
-    """List all chunks for a secret (metadata only if needed, or full data)."""
-    _check_secret_access(secret_id, current_user.address, db)
+    """List all chunks for a secret, their data hex- or base64-encoded."""
+    _check_secret_access(secret_id, current_user.id, db)
 
     chunks = db.query(models.FileChunk).filter(
         models.FileChunk.secret_id == secret_id
     ).order_by(models.FileChunk.chunk_index).all()
 
-    return chunks
+    return [_encode_chunk(chunk, encoding) for chunk in chunks]
 
 
 @router.get("/secrets/{secret_id}/chunks/{chunk_index}", response_model=schemas.FileChunkResponse)
-def get_chunk(secret_id: int, chunk_index: int,
+def get_chunk(request: Request, secret_id: int, chunk_index: int,
+              encoding: str = Query("hex", pattern="^(hex|base64)$"),
               current_user: models.User = Depends(get_current_user),
               db: Session = Depends(get_db)):
-    """Download a single encrypted chunk by index."""
-    _check_secret_access(secret_id, current_user.address, db)
+    """
+    Download a single encrypted chunk by index: raw bytes (IV in X-Chunk-IV)
+    when the client accepts application/octet-stream, JSON otherwise.
+    """
+    _check_secret_access(secret_id, current_user.id, db)
 
     chunk = db.query(models.FileChunk).filter(
         models.FileChunk.secret_id == secret_id,
@@ -357,4 +415,6 @@ def get_chunk(secret_id: int, chunk_index: int,
     if not chunk:
         raise HTTPException(status_code=404, detail=f"Chunk {chunk_index} not found")
 
-    return chunk
+    if OCTET_STREAM in request.headers.get("accept", ""):
+        return Response(content=chunk.encrypted_data, media_type=OCTET_STREAM, headers={CHUNK_IV_HEADER: chunk.iv})
+    return _encode_chunk(chunk, encoding)
@@ -34,7 +34,7 @@ def update_user(address: str, user_update: schemas.UserUpdate, current_user: mod
 
 @router.get("/{address}", response_model=schemas.UserResponse)
 def get_user(address: str, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.address == address.lower()).first()
+    user = db.query(models.User).filter(models.User.has_address(address.lower())).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -49,8 +49,8 @@ def list_users(request: Request, search: str = None, only_pqc: bool = False, lim
     if search:
         search_pattern = f"%{search.lower()}%"
         query = query.filter(
-            (models.User.address.like(search_pattern)) | 
-            (models.User.username.like(search_pattern))
+            (models.User.address.ilike(search_pattern)) | 
+            (models.User.username.ilike(search_pattern))
         )
     
     if only_pqc:
@@ -69,7 +69,7 @@ class UserResolveRequest(schemas.BaseModel):
 @limiter.limit("60/minute")
 def resolve_user(request: Request, req: UserResolveRequest, db: Session = Depends(get_db)):
     # Helper to resolve user by address (Eth or PQC)
-    user = db.query(models.User).filter(models.User.address == req.address).first()
+    user = db.query(models.User).filter(models.User.has_address(req.address)).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -40,11 +40,28 @@ class SecretResponse(SecretBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+class SecretSummary(BaseModel):
+    """Listing entry without the payload; fetch it from /secrets/{id}/payload."""
+    id: int
+    name: str
+    type: str
+    size: int # Bytes of stored encrypted_data
+    owner_address: str
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class SecretPayload(BaseModel):
+    id: int
+    encrypted_data: str
+    encrypted_key: Optional[str] = None # The requesting user's key (from their AccessGrant)
+
 class FileChunkUpload(BaseModel):
     secret_id: int
     chunk_index: int
     iv: str = Field(..., max_length=100)
-    encrypted_data: str = Field(..., max_length=2_100_000)  # ~1MB chunk hex-encoded
+    encrypted_data: str = Field(..., max_length=2_100_000)  # ~1MB chunk hex-encoded (~1.4M as base64)
+    encoding: str = Field("hex", pattern="^(hex|base64)$") # Of encrypted_data; stored as raw bytes
 
 class FileChunkResponse(BaseModel):
     chunk_index: int
@@ -79,6 +96,15 @@ class AccessGrantResponse(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class SharedSecretSummary(BaseModel):
+    id: int # Grant id
+    secret_id: int
+    created_at: datetime
+    expires_at: Optional[datetime]
+    secret: SecretSummary
+
+    model_config = ConfigDict(from_attributes=True)
+
 class DocumentBase(BaseModel):
     name: str = Field(..., max_length=200)
     content_hash: str = Field(..., max_length=500)
@@ -186,7 +212,10 @@ class ConversationResponse(BaseModel):
 class HistoryRequest(BaseModel):
     partner_address: str
     limit: int = Field(50, ge=1, le=100) # Default 50, Max 100
-    offset: int = Field(0, ge=0)
+    offset: int = Field(0, ge=0) # Deprecated: prefer before_id / after_id / cursor
+    before_id: Optional[int] = None # Messages older than this id (scrolling back)
+    after_id: Optional[int] = None # Messages newer than this id (catching up)
+    cursor: Optional[str] = None # X-Next-Cursor from the previous page
 
 # ── Group Channels ──────────────────────────────────────────────
 
@@ -233,7 +262,10 @@ class GroupConversationResponse(BaseModel):
 
 class GroupHistoryRequest(BaseModel):
     limit: int = Field(50, ge=1, le=100)
-    offset: int = Field(0, ge=0)
+    offset: int = Field(0, ge=0) # Deprecated: prefer before_id / since_id / cursor
+    before_id: Optional[int] = None # Messages older than this id (scrolling back)
+    since_id: Optional[int] = None # Messages newer than this id (sync after reconnecting)
+    cursor: Optional[str] = None # X-Next-Cursor from the previous page
 
 class GroupMemberAdd(BaseModel):
     user_address: str
@@ -248,6 +280,12 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     user: UserResponse
+    session_ticket: Optional[str] = None
+
+
+class SessionTicketResponse(BaseModel):
+    session_ticket: str
+    expires_at: float
 
 
 class PushSubscriptionCreate(BaseModel):
@@ -0,0 +1,144 @@
+"""
+Key ring of the PQC sidecar's server public keys, used to verify our own JWTs.
+
+Each key is identified by a `kid` (first 16 hex chars of SHA-256 over the raw
+public key), which create_access_token writes into the JWT header. The most
+recently fetched key is the current signing key; older keys stay in the ring
+so tokens issued before a rotation keep verifying until they expire.
+
+The ring is prefetched (with retries) during app startup and refreshed in the
+background, so request handling never waits on a key lookup.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import config
+from pqc_client import pqc
+
+
+def key_id(public_key: str) -> str:
+    return hashlib.sha256(bytes.fromhex(public_key)).hexdigest()[:16]
+
+
+class ServerKeyRing:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._keys: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._refresh_task: asyncio.Task | None = None
+        self.current_kid: str | None = None
+        self.last_refresh = 0.0
+
+    # --- Ring ---
+
+    def add(self, public_key: str) -> str:
+        """Add (or re-confirm) a key and make it current. Returns its kid."""
+        kid = key_id(public_key)
+        with self._lock:
+            if self.current_kid != kid:
+                print(f"INFO: Server public key {kid} is now current")
+            self._keys[kid] = public_key
+            self._keys.move_to_end(kid)
+            while len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+            self.current_kid = kid
+        return kid
+
+    def get(self, kid: str | None = None) -> str | None:
+        """Public key for `kid`, or the current key when no kid is given."""
+        with self._lock:
+            return self._keys.get(kid or self.current_kid)
+
+    def kids(self) -> list[str]:
+        with self._lock:
+            return list(self._keys)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self.current_kid = None
+            self.last_refresh = 0.0
+
+    # --- Fetching from the sidecar ---
+
+    def _parse(self, res) -> str | None:
+        if res.status_code != 200:
+            print(f"Error fetching server public key: HTTP {res.status_code}")
+            return None
+        public_key = res.json().get("publicKey")
+        if not public_key:
+            return None
+        self.last_refresh = time.monotonic()
+        return self.add(public_key)
+
+    def refresh(self) -> str | None:
+        try:
+            return self._parse(pqc.request("GET", "/server-public-key"))
+        except Exception as e:
+            print(f"Error fetching server public key: {e}")
+            return None
+
+    async def arefresh(self) -> str | None:
+        try:
+            return self._parse(await pqc.arequest("GET", "/server-public-key"))
+        except Exception as e:
+            print(f"Error fetching server public key: {e}")
+            return None
+
+    def _may_refresh(self) -> bool:
+        # Unknown kids trigger a refresh, but at most once per interval so forged
+        # headers cannot turn into sidecar traffic
+        return time.monotonic() - self.last_refresh >= config.SERVER_KEY_MIN_REFRESH_SECONDS
+
+    def resolve(self, kid: str | None = None) -> str | None:
+        """get(), refreshing from the sidecar if the key is missing."""
+        key = self.get(kid)
+        if key is None and (self.current_kid is None or self._may_refresh()):
+            self.refresh()
+            key = self.get(kid)
+        return key
+
+    async def aresolve(self, kid: str | None = None) -> str | None:
+        key = self.get(kid)
+        if key is None and (self.current_kid is None or self._may_refresh()):
+            await self.arefresh()
+            key = self.get(kid)
+        return key
+
+    async def prefetch(self, retries: int, delay: float) -> bool:
+        """Fetch the current key, retrying with exponential backoff (capped at 5s)."""
+        for attempt in range(retries + 1):
+            if await self.arefresh():
+                return True
+            if attempt < retries:
+                await asyncio.sleep(min(delay * 2 ** attempt, 5))
+        print("WARNING: Could not prefetch the server public key; will retry in the background.")
+        return False
+
+    async def _refresh_loop(self):
+        while True:
+            # Retry sooner while we have no key at all
+            interval = config.SERVER_KEY_REFRESH_INTERVAL if self.current_kid else config.SERVER_KEY_PREFETCH_DELAY
+            await asyncio.sleep(interval)
+            await self.arefresh()
+
+    # --- Lifecycle ---
+
+    async def startup(self):
+        await self.prefetch(config.SERVER_KEY_PREFETCH_RETRIES, config.SERVER_KEY_PREFETCH_DELAY)
+        if config.SERVER_KEY_REFRESH_INTERVAL > 0:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def shutdown(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+
+key_ring = ServerKeyRing(config.SERVER_KEY_RING_SIZE)
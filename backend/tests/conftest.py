@@ -1,13 +1,14 @@
 """
 Shared test fixtures for Safelog backend tests.
 
-Uses an in-memory SQLite database and mocks out the PQC sidecar service
-entirely so tests run without any external processes.
+Uses a throwaway SQLite database file (shared by the sync and async session
+layers) and mocks out the PQC sidecar service entirely so tests run without
+any external processes.
 """
 
-import sys, os
+import sys, os, json, atexit, shutil, tempfile
+import httpx
 import pytest
-from unittest.mock import patch, MagicMock
 
 # Ensure backend root is importable
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -18,26 +19,44 @@ os.environ["VAPID_PRIVATE_KEY"] = "fake_priv"
 os.environ["VAPID_SUBJECT"] = "mailto:test@test.com"
 
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+import models
 from models import Base
 from database import get_db
 from main import app
+from server_keys import key_ring, key_id
 
 
-# ---------- Database (in-memory, shared across a single test) ----------
+# ---------- Database ----------
 
-# Use a single in-memory DB with StaticPool to share across threads
-from sqlalchemy.pool import StaticPool
+# TEST_DATABASE_URL runs the suite against another backend (e.g. a local
+# PostgreSQL: postgresql://postgres@localhost/safelog_test). Tables are created
+# and dropped around every test, so point it at a throwaway database.
+# Default: a temporary SQLite file; not :memory:, because the async engine
+# (aiosqlite) opens its own connections and must see the same data.
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from database import normalize_database_url, async_database_url, engine_kwargs, configure_engine, get_async_db
 
-engine = create_engine(
-    "sqlite://",
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-)
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+if TEST_DATABASE_URL:
+    TEST_DATABASE_URL = normalize_database_url(TEST_DATABASE_URL)
+else:
+    _test_db_dir = tempfile.mkdtemp(prefix="safelog-test-")
+    atexit.register(shutil.rmtree, _test_db_dir, ignore_errors=True)
+    TEST_DATABASE_URL = f"sqlite:///{os.path.join(_test_db_dir, 'test.db')}"
+
+engine = configure_engine(create_engine(TEST_DATABASE_URL, **engine_kwargs(TEST_DATABASE_URL)))
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# NullPool: TestClient runs each request on a new event loop, so async
+# connections must not be reused across requests.
+async_engine = configure_engine(create_async_engine(async_database_url(TEST_DATABASE_URL), poolclass=NullPool))
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 
 def override_get_db():
     db = TestingSessionLocal()
@@ -47,33 +66,35 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 
 # ---------- Fake PQC responses ----------
 
 FAKE_SERVER_PUBLIC_KEY = "aabbccdd" * 100
 FAKE_SIGNATURE_HEX = "deadbeef" * 64
+FAKE_SERVER_KEY_ID = key_id(FAKE_SERVER_PUBLIC_KEY)
 
 
-def _mock_requests_post(url, **kwargs):
-    resp = MagicMock()
-    resp.status_code = 200
-    if "/verify" in url:
-        resp.json.return_value = {"valid": True}
-    elif "/sign" in url:
-        resp.json.return_value = {"signature": FAKE_SIGNATURE_HEX}
-    else:
-        resp.status_code = 404
-        resp.json.return_value = {"error": "not found"}
-    return resp
-
-
-def _mock_requests_get(url, **kwargs):
-    resp = MagicMock()
-    resp.status_code = 200
-    resp.json.return_value = {"publicKey": FAKE_SERVER_PUBLIC_KEY}
-    return resp
+def _mock_pqc_handler(request):
+    """httpx.MockTransport handler standing in for pqc_service.js."""
+    path = request.url.path
+    if path == "/verify":
+        return httpx.Response(200, json={"valid": True})
+    if path == "/verify-batch":
+        items = json.loads(request.content)["items"]
+        return httpx.Response(200, json={"results": [True] * len(items)})
+    if path == "/sign":
+        return httpx.Response(200, json={"signature": FAKE_SIGNATURE_HEX, "keyId": FAKE_SERVER_KEY_ID})
+    if path == "/server-public-key":
+        return httpx.Response(200, json={"publicKey": FAKE_SERVER_PUBLIC_KEY, "keyId": FAKE_SERVER_KEY_ID})
+    return httpx.Response(404, json={"error": "not found"})
 
 
 # ---------- Constants ----------
@@ -112,6 +133,11 @@ def auth_header(token):
     return {"Authorization": f"Bearer {token}"}
 
 
+def user_id(db, address):
+    """Surrogate id of a logged-in user, for seeding rows directly."""
+    return db.query(models.User.id).filter(models.User.has_address(address)).scalar()
+
+
 # ---------- Fixtures ----------
 
 @pytest.fixture(autouse=True)
@@ -135,11 +161,26 @@ def _reset_rate_limiter():
 
 @pytest.fixture(autouse=True)
 def _mock_pqc():
-    """Globally mock out the PQC HTTP calls."""
-    with patch("httpx.post", side_effect=_mock_requests_post), \
-         patch("httpx.get", side_effect=_mock_requests_get), \
-         patch("auth._SERVER_PUBLIC_KEY", FAKE_SERVER_PUBLIC_KEY):
-        yield
+    """Globally mock out the PQC sidecar by swapping the shared client's transport."""
+    from pqc_client import pqc
+    pqc.use_transport(httpx.MockTransport(_mock_pqc_handler))
+    # As if the app lifespan had prefetched the server key
+    key_ring.clear()
+    key_ring.add(FAKE_SERVER_PUBLIC_KEY)
+    yield
+    key_ring.clear()
+    pqc.use_transport(None)
+
+
+@pytest.fixture(autouse=True)
+def _reset_token_cache():
+    """Start each test with an empty verified-token cache and ticket denylist."""
+    import auth
+    auth.token_cache.clear()
+    auth.ticket_revocations.clear()
+    yield
+    auth.token_cache.clear()
+    auth.ticket_revocations.clear()
 
 
 @pytest.fixture()
@@ -0,0 +1,103 @@
+"""Tests for the async session layer used by the async routes."""
+
+import asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from utils import conversations
+from conftest import do_login, auth_header, TEST_USER_ADDRESS, TEST_USER_ADDRESS_2, TestingAsyncSessionLocal
+
+# Long enough for the Messenger PQC-key check (>= 500 chars)
+MESSENGER_KEY = "enc_pub_key_" + "d" * 600
+TEST_USER_ADDRESS_3 = "pqc_test_user_" + "e" * 100
+
+
+def _messenger_users(client, count=2):
+    addresses = [TEST_USER_ADDRESS, TEST_USER_ADDRESS_2, TEST_USER_ADDRESS_3][:count]
+    return [do_login(client, addr, MESSENGER_KEY, f"Async{i}") for i, addr in enumerate(addresses)]
+
+
+class TestAsyncSession:
+    def test_override_yields_async_session(self):
+        async def scenario():
+            async with TestingAsyncSessionLocal() as db:
+                assert isinstance(db, AsyncSession)
+                return (await db.execute(models.User.__table__.select())).all()
+
+        assert asyncio.run(scenario()) == []
+
+    def test_login_creates_user_visible_to_sync_session(self, client, db_session):
+        token, user = do_login(client, TEST_USER_ADDRESS, MESSENGER_KEY, "Async")
+        stored = db_session.query(models.User).filter_by(address=user["address"]).one()
+        assert stored.username == "Async"
+        assert stored.encryption_public_key == MESSENGER_KEY
+
+
+class TestAsyncRoutes:
+    def test_send_message_returns_loaded_relationships(self, client):
+        (token1, u1), (_, u2) = _messenger_users(client)
+        resp = client.post("/messages", json={"recipient_address": u2["address"], "content": "hi"},
+                           headers=auth_header(token1))
+        assert resp.status_code == 200, resp.text
+        data = resp.json()
+        assert data["sender"]["address"] == u1["address"]
+        assert data["recipient"]["address"] == u2["address"]
+
+    def test_send_message_maintains_conversation_summaries(self, client, db_session):
+        (token1, u1), (token2, u2) = _messenger_users(client)
+        for token, recipient in ((token1, u2), (token2, u1), (token1, u2)):
+            resp = client.post("/messages", json={"recipient_address": recipient["address"], "content": "hi"},
+                               headers=auth_header(token))
+            assert resp.status_code == 200, resp.text
+        assert conversations.check(db_session) == []
+
+        inbox = client.get("/messages/conversations", headers=auth_header(token2)).json()
+        assert [(c["user"]["address"], c["last_message"]["id"], c["unread_count"]) for c in inbox] == [
+            (u1["address"], resp.json()["id"], 2)
+        ]
+
+    def test_group_lifecycle(self, client):
+        (token1, u1), (token2, u2), (_, u3) = _messenger_users(client, 3)
+        resp = client.post("/groups", json={"name": "Async", "member_addresses": [u2["address"]]},
+                           headers=auth_header(token1))
+        assert resp.status_code == 200, resp.text
+        channel = resp.json()
+        assert {m["user_address"] for m in channel["members"]} == {u1["address"], u2["address"]}
+        assert all(m["user"] for m in channel["members"])
+        cid = channel["id"]
+
+        resp = client.post(f"/groups/{cid}/messages", json={"content": "hello"}, headers=auth_header(token2))
+        assert resp.status_code == 200, resp.text
+        assert resp.json()["sender"]["address"] == u2["address"]
+
+        resp = client.post(f"/groups/{cid}/members", json={"user_address": u3["address"]}, headers=auth_header(token1))
+        assert resp.status_code == 200, resp.text
+        assert resp.json()["user"]["address"] == u3["address"]
+
+        resp = client.put(f"/groups/{cid}/members/{u2['address']}/role", json={"role": "admin"}, headers=auth_header(token1))
+        assert resp.status_code == 200, resp.text
+        assert resp.json()["role"] == "admin"
+
+        resp = client.put(f"/groups/{cid}", json={"name": "Renamed"}, headers=auth_header(token1))
+        assert resp.status_code == 200, resp.text
+        assert resp.json()["name"] == "Renamed"
+        assert len(resp.json()["members"]) == 3
+
+        # Admin removes the owner: ownership moves to the admin
+        resp = client.delete(f"/groups/{cid}/members/{u1['address']}", headers=auth_header(token2))
+        assert resp.status_code == 200, resp.text
+        group = client.get(f"/groups/{cid}", headers=auth_header(token2)).json()
+        assert group["owner_address"] == u2["address"]
+        assert {m["user_address"] for m in group["members"]} == {u2["address"], u3["address"]}
+
+    def test_share_secret_returns_loaded_relationships(self, client):
+        (token1, u1), (_, u2) = _messenger_users(client)
+        secret = client.post("/secrets", json={"name": "S", "encrypted_data": "x", "encrypted_key": "k"},
+                             headers=auth_header(token1)).json()
+        resp = client.post("/secrets/share", json={
+            "secret_id": secret["id"], "grantee_address": u2["address"], "encrypted_key": "k2",
+        }, headers=auth_header(token1))
+        assert resp.status_code == 200, resp.text
+        data = resp.json()
+        assert data["secret"]["owner"]["address"] == u1["address"]
+        assert data["grantee"]["address"] == u2["address"]
@@ -1,7 +1,7 @@
 """Tests for /auth endpoints — nonce generation and login flow."""
 
 from conftest import (
-    TEST_USER_ADDRESS, TEST_ENCRYPTION_KEY,
+    TEST_USER_ADDRESS, TEST_USER_ADDRESS_2, TEST_ENCRYPTION_KEY,
     get_nonce, do_login, auth_header,
 )
 
@@ -82,3 +82,170 @@ class TestLogin:
     def test_login_default_username_from_address(self, client):
         token, user = do_login(client, TEST_USER_ADDRESS, TEST_ENCRYPTION_KEY)
         assert user["username"] == TEST_USER_ADDRESS.lower()[:7]
+
+
+class TestVerifiedTokenCache:
+    def _count_verify_calls(self):
+        import httpx
+        from contextlib import contextmanager
+        from conftest import _mock_pqc_handler
+        from pqc_client import pqc
+        calls = []
+
+        def counting_handler(request):
+            if request.url.path in ("/verify", "/verify-batch"):
+                calls.append(request.url.path)
+            return _mock_pqc_handler(request)
+
+        @contextmanager
+        def patcher():
+            pqc.use_transport(httpx.MockTransport(counting_handler))
+            yield
+            pqc.use_transport(httpx.MockTransport(_mock_pqc_handler))
+
+        return calls, patcher()
+
+    def test_second_request_skips_pqc_verification(self, client):
+        token, _ = do_login(client, TEST_USER_ADDRESS, TEST_ENCRYPTION_KEY)
+        calls, patcher = self._count_verify_calls()
+        with patcher:
+            assert client.get("/secrets", headers=auth_header(token)).status_code == 200
+            assert client.get("/secrets", headers=auth_header(token)).status_code == 200
+        assert len(calls) == 1
+
+        import auth
+        stats = auth.token_cache.stats()
+        assert stats["hits"] == 1
+        assert stats["size"] == 1
+
+    def test_invalidate_forces_reverification(self, client):
+        import auth
+        token, _ = do_login(client, TEST_USER_ADDRESS, TEST_ENCRYPTION_KEY)
+        calls, patcher = self._count_verify_calls()
+        with patcher:
+            client.get("/secrets", headers=auth_header(token))
+            assert auth.invalidate_token(token) is True
+            client.get("/secrets", headers=auth_header(token))
+        assert len(calls) == 2
+
+    def test_expired_entry_is_dropped(self):
+        from datetime import datetime, timezone
+        import auth
+        cache = auth.VerifiedTokenCache(max_size=10)
+        cache.put("tok", {"sub": "x", "exp": datetime.now(timezone.utc).timestamp() - 1})
+        assert cache.get("tok") is None
+        assert cache.stats()["size"] == 0
+
+    def test_lru_eviction(self):
+        from datetime import datetime, timezone
+        import auth
+        exp = datetime.now(timezone.utc).timestamp() + 60
+        cache = auth.VerifiedTokenCache(max_size=2)
+        cache.put("a", {"sub": "a", "exp": exp})
+        cache.put("b", {"sub": "b", "exp": exp})
+        assert cache.get("a") is not None  # "a" is now most recently used
+        cache.put("c", {"sub": "c", "exp": exp})
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats()["evictions"] == 1
+
+
+class TestSessionTickets:
+    def _ticket_headers(self, token, ticket):
+        return {**auth_header(token), "X-Session-Ticket": ticket}
+
+    def test_login_returns_ticket(self, client):
+        import auth
+        nonce = get_nonce(client, TEST_USER_ADDRESS)
+        data = client.post("/auth/login", json={
+            "address": TEST_USER_ADDRESS,
+            "signature": "fake",
+            "nonce": nonce,
+            "encryption_public_key": TEST_ENCRYPTION_KEY,
+        }).json()
+        assert auth.verify_session_ticket(data["session_ticket"], data["access_token"])["sub"] == TEST_USER_ADDRESS.lower()
+
+    def test_ticket_skips_pqc_verification(self, client):
+        import auth
+        token, _ = do_login(client, TEST_USER_ADDRESS, TEST_ENCRYPTION_KEY)
+        ticket = auth.issue_session_ticket(token)
+        before = auth.token_cache.stats()
+        calls, patcher = TestVerifiedTokenCache()._count_verify_calls()
+        with patcher:
+            for _ in range(3):
+                resp = client.get("/secrets", headers=self._ticket_headers(token, ticket))
+                assert resp.status_code == 200
+        assert calls == []
+        # Not even the verified-token cache is consulted
+        assert auth.token_cache.stats() == before
+
+    def test_jwt_only_request_gets_ticket_header(self, client):
+        import auth
+        token, _ = do_login(client, TEST_USER_ADDRESS, TEST_ENCRYPTION_KEY)
+        resp = client.get("/secrets", headers=auth_header(token))
+        assert resp.status_code == 200
+        assert auth.verify_session_ticket(resp.headers["X-Session-Ticket"], token) is not None
+
+    def test_ticket_bound_to_its_token(self, client):
+        import auth
+        token_a, _ = do_login(client, TEST_USER_ADDRESS, TEST_ENCRYPTION_KEY)
+        token_b, _ = do_login(client, TEST_USER_ADDRESS_2, TEST_ENCRYPTION_KEY)
+        ticket_a = auth.issue_session_ticket(token_a)
+        assert auth.verify_session_ticket(ticket_a, token_b) is None
+
+        calls, patcher = TestVerifiedTokenCache()._count_verify_calls()
+        with patcher:
+            # Falls back to full verification of token_b
+            resp = client.get("/secrets", headers=self._ticket_headers(token_b, ticket_a))
+        assert resp.status_code == 200
+        assert len(calls) == 1
+
+    def test_tampered_ticket_rejected(self, client):
+        import auth
+        token, _ = do_login(client, TEST_USER_ADDRESS, TEST_ENCRYPTION_KEY)
+        body, mac = auth.issue_session_ticket(token).split(".")
+        forged_mac = ("A" if mac[0] != "A" else "B") + mac[1:]
+        assert auth.verify_session_ticket(f"{body}.{forged_mac}", token) is None
+        assert auth.verify_session_ticket("garbage", token) is None
+
+    def test_expired_ticket_rejected(self, client, monkeypatch):
+        import auth, config
+        token, _ = do_login(client, TEST_USER_ADDRESS, TEST_ENCRYPTION_KEY)
+        monkeypatch.setattr(config, "SESSION_TICKET_TTL_SECONDS", -1)
+        assert auth.verify_session_ticket(auth.issue_session_ticket(token), token) is None
+
+    def test_ticket_never_outlives_jwt(self):
+        import json, time
+        import auth
+        jwt_exp = time.time() + 5
+        ticket = auth.issue_session_ticket("h.p.s", {"sub": "x", "exp": jwt_exp})
+        claims = json.loads(auth.b64url_decode(ticket.split(".")[0]))
+        assert claims["exp"] == jwt_exp
+
+    def test_invalidate_token_revokes_tickets(self, client):
+        import auth
+        token, _ = do_login(client, TEST_USER_ADDRESS, TEST_ENCRYPTION_KEY)
+        ticket = auth.issue_session_ticket(token)
+        auth.invalidate_token(token)
+        assert auth.verify_session_ticket(ticket, token) is None
+
+        # Re-verification issues a new ticket that is accepted again
+        resp = client.get("/secrets", headers=self._ticket_headers(token, ticket))
+        assert resp.status_code == 200
+        assert auth.verify_session_ticket(resp.headers["X-Session-Ticket"], token) is not None
+
+    def test_exchange_endpoint(self, client):
+        import auth
+        token, _ = do_login(client, TEST_USER_ADDRESS, TEST_ENCRYPTION_KEY)
+        resp = client.post("/auth/session-ticket", headers=auth_header(token))
+        assert resp.status_code == 200
+        assert auth.verify_session_ticket(resp.json()["session_ticket"], token) is not None
+
+    def test_disabled(self, client, monkeypatch):
+        import auth, config
+        token, _ = do_login(client, TEST_USER_ADDRESS, TEST_ENCRYPTION_KEY)
+        ticket = auth.issue_session_ticket(token)
+        monkeypatch.setattr(config, "SESSION_TICKETS_ENABLED", False)
+        assert auth.issue_session_ticket(token) is None
+        assert auth.verify_session_ticket(ticket, token) is None
+        assert client.post("/auth/session-ticket", headers=auth_header(token)).status_code == 404
@@ -0,0 +1,82 @@
+"""Tests for the crypto worker pool and async Ethereum login verification."""
+
+import asyncio
+import threading
+import pytest
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+import auth
+from crypto_pool import CryptoPool, crypto_pool, recover_eth_address
+from conftest import get_nonce, TEST_ENCRYPTION_KEY
+
+
+def _eth_login_signature(account, nonce):
+    message = encode_defunct(text=auth._login_message(nonce))
+    return account.sign_message(message).signature.hex()
+
+
+class TestCryptoPool:
+    @pytest.mark.parametrize("kind", ["process", "thread", "off"])
+    def test_recovers_address(self, kind):
+        account = Account.create()
+        signature = _eth_login_signature(account, "ab" * 16)
+        pool = CryptoPool(kind, workers=2)
+        try:
+            recovered = asyncio.run(pool.run(recover_eth_address, auth._login_message("ab" * 16), signature))
+        finally:
+            pool.shutdown()
+        assert recovered == account.address
+
+    def test_unknown_kind_rejected(self):
+        with pytest.raises(ValueError):
+            CryptoPool("gpu", workers=1)
+
+    def test_queue_depth(self):
+        pool = CryptoPool("thread", workers=1)
+        release = threading.Event()
+        seen = {}
+
+        async def scenario():
+            jobs = [asyncio.ensure_future(pool.run(release.wait, 5)) for _ in range(4)]
+            await asyncio.sleep(0.05)
+            seen.update(pool.stats())
+            release.set()
+            await asyncio.gather(*jobs)
+
+        asyncio.run(scenario())
+        pool.shutdown()
+        assert seen["pending"] == 4
+        assert seen["queue_depth"] == 3
+        stats = pool.stats()
+        assert stats["queue_depth"] == 0
+        assert stats["completed"] == 4
+
+
+class TestEthLogin:
+    def _login(self, client, account, signature=None):
+        nonce = get_nonce(client, account.address)
+        return client.post("/auth/login", json={
+            "address": account.address,
+            "signature": signature or _eth_login_signature(account, nonce),
+            "nonce": nonce,
+            "encryption_public_key": TEST_ENCRYPTION_KEY,
+        })
+
+    def test_login_with_eth_signature(self, client):
+        account = Account.create()
+        before = crypto_pool.stats()["submitted"]
+        resp = self._login(client, account)
+        assert resp.status_code == 200
+        assert resp.json()["user"]["address"] == account.address.lower()
+        assert crypto_pool.stats()["submitted"] == before + 1
+
+    def test_login_with_wrong_eth_signature(self, client):
+        account, other = Account.create(), Account.create()
+        nonce_for_other = "00" * 16
+        resp = self._login(client, account, signature=_eth_login_signature(other, nonce_for_other))
+        assert resp.status_code == 401
+
+    def test_metrics_report_worker_pool(self):
+        from routers.metrics import get_metrics
+        assert "queue_depth" in get_metrics()["auth_workers"]
@@ -0,0 +1,133 @@
+"""Tests for database URL handling and backend-portable SQL helpers."""
+
+import asyncio
+import hashlib
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+import config
+import models
+from database import normalize_database_url, engine_kwargs, byte_length, configure_engine, SQLiteMaintenance
+from conftest import do_login, auth_header, user_id
+
+
+class TestDatabaseUrl:
+    def test_postgres_urls_use_psycopg(self):
+        assert normalize_database_url("postgres://u:p@db/safelog") == "postgresql+psycopg://u:p@db/safelog"
+        assert normalize_database_url("postgresql://u:p@db/safelog") == "postgresql+psycopg://u:p@db/safelog"
+
+    def test_explicit_driver_and_sqlite_untouched(self):
+        assert normalize_database_url("postgresql+asyncpg://db/x") == "postgresql+asyncpg://db/x"
+        assert normalize_database_url("sqlite:///./sql_app.db") == "sqlite:///./sql_app.db"
+
+
+class TestEngineKwargs:
+    def test_memory_sqlite_has_no_pool_settings(self):
+        assert engine_kwargs("sqlite://") == {"connect_args": {"check_same_thread": False}}
+
+    def test_file_sqlite_is_pooled(self):
+        kwargs = engine_kwargs("sqlite:///./sql_app.db")
+        assert kwargs["connect_args"] == {"check_same_thread": False}
+        assert kwargs["pool_size"] == config.DB_POOL_SIZE
+
+    def test_postgresql_pool_settings(self):
+        kwargs = engine_kwargs("postgresql+psycopg://db/safelog")
+        assert "connect_args" not in kwargs
+        assert kwargs["pool_size"] == config.DB_POOL_SIZE
+        assert kwargs["max_overflow"] == config.DB_MAX_OVERFLOW
+        assert kwargs["pool_recycle"] == config.DB_POOL_RECYCLE
+        assert kwargs["pool_pre_ping"] == config.DB_POOL_PRE_PING
+
+
+class TestByteLength:
+    def _sql(self, dialect):
+        stmt = select(byte_length(models.FileChunk.encrypted_data))
+        return str(stmt.compile(dialect=dialect))
+
+    def test_sqlite_uses_length(self):
+        assert "length(file_chunks.encrypted_data)" in self._sql(sqlite.dialect())
+
+    def test_postgresql_uses_octet_length(self):
+        assert "octet_length(file_chunks.encrypted_data)" in self._sql(postgresql.dialect())
+
+
+def _file_engine(tmp_path):
+    url = f"sqlite:///{tmp_path / 'tuned.db'}"
+    return configure_engine(create_engine(url, **engine_kwargs(url)))
+
+
+def _pragma(engine, name):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+class TestSQLitePragmas:
+    def test_pragmas_applied_on_connect(self, tmp_path):
+        engine = _file_engine(tmp_path)
+        assert _pragma(engine, "journal_mode") == "wal"
+        assert _pragma(engine, "synchronous") == 1  # NORMAL
+        assert _pragma(engine, "busy_timeout") == config.SQLITE_BUSY_TIMEOUT_MS
+        assert _pragma(engine, "cache_size") == config.SQLITE_CACHE_SIZE
+        assert _pragma(engine, "temp_store") == 2  # MEMORY
+        engine.dispose()
+
+    def test_invalid_synchronous_falls_back_to_normal(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config, "SQLITE_SYNCHRONOUS", "NORMAL; DROP TABLE users")
+        engine = _file_engine(tmp_path)
+        assert _pragma(engine, "synchronous") == 1
+        engine.dispose()
+
+    def test_wal_can_be_disabled(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config, "SQLITE_WAL", False)
+        engine = _file_engine(tmp_path)
+        assert _pragma(engine, "journal_mode") == "delete"
+        engine.dispose()
+
+
+class TestSQLiteMaintenance:
+    def test_checkpoint_and_analyze(self, tmp_path):
+        engine = _file_engine(tmp_path)
+        models.Base.metadata.create_all(bind=engine)
+        maintenance = SQLiteMaintenance(engine)
+        assert maintenance.enabled
+        result = maintenance.checkpoint()
+        assert result["busy"] == 0
+        maintenance.analyze()
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT count(*) FROM sqlite_master WHERE name = 'sqlite_stat1'").scalar() == 1
+        assert maintenance.stats()["checkpoints"] == 1
+        assert maintenance.stats()["analyzes"] == 1
+        engine.dispose()
+
+    def test_disabled_for_memory_database(self):
+        maintenance = SQLiteMaintenance(create_engine("sqlite://"))
+        assert not maintenance.enabled
+        asyncio.run(maintenance.startup())
+        assert maintenance._tasks == []
+
+
+class TestSurrogateUserIds:
+    PQC_ADDRESS = "pqc_" + "ab" * 2000
+
+    def test_login_assigns_id_and_address_hash(self, client, db_session):
+        _, user = do_login(client, self.PQC_ADDRESS)
+        stored = db_session.query(models.User).filter(models.User.has_address(self.PQC_ADDRESS)).one()
+        assert isinstance(stored.id, int)
+        assert stored.address_hash == hashlib.sha256(self.PQC_ADDRESS.encode()).digest()
+        assert user["address"] == self.PQC_ADDRESS
+
+    def test_foreign_keys_store_ids_and_api_returns_addresses(self, client, db_session, user1):
+        token1, _ = user1
+        do_login(client, self.PQC_ADDRESS)
+        secret = client.post("/secrets", json={"name": "S", "encrypted_data": "x", "encrypted_key": "k"},
+                             headers=auth_header(token1)).json()
+        client.post("/secrets/share", json={
+            "secret_id": secret["id"], "grantee_address": self.PQC_ADDRESS, "encrypted_key": "k2",
+        }, headers=auth_header(token1))
+
+        grantee_id = user_id(db_session, self.PQC_ADDRESS)
+        grant = db_session.query(models.AccessGrant).filter_by(grantee_id=grantee_id).one()
+        assert grant.grantee_address == self.PQC_ADDRESS
+
+        access = client.get(f"/secrets/{secret['id']}/access", headers=auth_header(token1)).json()
+        assert self.PQC_ADDRESS in {g["grantee_address"] for g in access}
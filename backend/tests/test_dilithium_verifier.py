@@ -0,0 +1,131 @@
+"""
+Tests for the in-process Dilithium verifier.
+
+Vectors in vectors/dilithium_kind2.json were produced by dilithium-crystals-js
+(kind 2, the parameter set pqc_service.js uses) from a key derived from
+sha256("safelog-test-vectors"); signatures are in its signed-message form.
+"""
+
+import json
+import os
+import asyncio
+import pytest
+
+pytest.importorskip("wasmtime")
+
+import auth
+from conftest import auth_header
+from dilithium_wasm import SIGNATURE_BYTES
+
+with open(os.path.join(os.path.dirname(__file__), "vectors", "dilithium_kind2.json")) as f:
+    VECTORS = json.load(f)
+
+PUBLIC_KEY = VECTORS["publicKey"]
+LOGIN_VECTOR, TOKEN_VECTOR = VECTORS["vectors"]
+
+
+@pytest.fixture(scope="module")
+def local_verifier():
+    try:
+        return auth.LocalDilithiumVerifier()
+    except RuntimeError as e:
+        pytest.skip(str(e))
+
+
+@pytest.fixture
+def use_local_verifier(local_verifier):
+    """Route auth through the local verifier with the vector key as the current server key."""
+    from server_keys import key_ring
+    original_verifier = auth.verifier
+    auth.verifier = local_verifier
+    key_ring.add(PUBLIC_KEY)
+    yield local_verifier
+    auth.verifier = original_verifier
+
+
+def _vector_token():
+    signature = bytes.fromhex(TOKEN_VECTOR["signature"])
+    return f"{TOKEN_VECTOR['message']}.{auth.b64url_encode(signature)}"
+
+
+class TestKnownVectors:
+    @pytest.mark.parametrize("vector", VECTORS["vectors"], ids=["login", "token"])
+    def test_vector_verifies(self, local_verifier, vector):
+        assert local_verifier.verify(vector["message"], vector["signature"], PUBLIC_KEY) is True
+
+    def test_detached_signature_verifies(self, local_verifier):
+        detached = LOGIN_VECTOR["signature"][:SIGNATURE_BYTES * 2]
+        assert local_verifier.verify(LOGIN_VECTOR["message"], detached, PUBLIC_KEY) is True
+
+    def test_tampered_message_fails(self, local_verifier):
+        detached = LOGIN_VECTOR["signature"][:SIGNATURE_BYTES * 2]
+        assert local_verifier.verify(LOGIN_VECTOR["message"] + "x", detached, PUBLIC_KEY) is False
+        assert local_verifier.verify(LOGIN_VECTOR["message"] + "x", LOGIN_VECTOR["signature"], PUBLIC_KEY) is False
+
+    def test_tampered_signature_fails(self, local_verifier):
+        signature = bytearray(bytes.fromhex(LOGIN_VECTOR["signature"]))
+        signature[10] ^= 0x01
+        assert local_verifier.verify(LOGIN_VECTOR["message"], signature.hex(), PUBLIC_KEY) is False
+
+    def test_wrong_public_key_fails(self, local_verifier):
+        wrong_key = bytearray(bytes.fromhex(PUBLIC_KEY))
+        wrong_key[40] ^= 0x01
+        assert local_verifier.verify(LOGIN_VECTOR["message"], LOGIN_VECTOR["signature"], wrong_key.hex()) is False
+
+    def test_malformed_input_fails(self, local_verifier):
+        assert local_verifier.verify(LOGIN_VECTOR["message"], "not-hex", PUBLIC_KEY) is False
+        assert local_verifier.verify(LOGIN_VECTOR["message"], "deadbeef", PUBLIC_KEY) is False
+        assert local_verifier.verify(LOGIN_VECTOR["message"], LOGIN_VECTOR["signature"], "aabb") is False
+
+
+class TestLocalVerifierInAuth:
+    def test_decode_access_token_without_sidecar(self, use_local_verifier):
+        import httpx
+        from pqc_client import pqc
+        from conftest import _mock_pqc_handler
+        calls = []
+
+        def counting_handler(request):
+            calls.append(request.url.path)
+            return _mock_pqc_handler(request)
+
+        pqc.use_transport(httpx.MockTransport(counting_handler))
+        payload = auth.decode_access_token(_vector_token())
+        assert payload["sub"] == "0xabc"
+        assert calls == []
+
+    def test_decode_access_token_async(self, use_local_verifier):
+        auth.token_cache.clear()
+        payload = asyncio.run(auth.decode_access_token_async(_vector_token()))
+        assert payload["sub"] == "0xabc"
+
+    def test_forged_token_rejected(self, use_local_verifier):
+        header_b64, _, signature_b64 = _vector_token().split(".")
+        forged_payload = auth.b64url_encode(b'{"sub": "0xevil", "exp": 4102444800.0}')
+        assert auth.decode_access_token(f"{header_b64}.{forged_payload}.{signature_b64}") is None
+
+    def test_pqc_login_signature(self, use_local_verifier):
+        nonce = LOGIN_VECTOR["message"].rsplit(" ", 1)[1]
+        assert auth.verify_signature(PUBLIC_KEY, nonce, LOGIN_VECTOR["signature"]) is True
+        assert auth.verify_signature(PUBLIC_KEY, "0" * 32, LOGIN_VECTOR["signature"]) is False
+
+    def test_protected_route_with_local_verifier(self, client, use_local_verifier):
+        # The token verifies; its subject just isn't a registered user
+        assert client.get("/secrets", headers=auth_header(_vector_token())).status_code == 404
+        header_b64, payload_b64, _ = _vector_token().split(".")
+        forged = f"{header_b64}.{payload_b64}.{auth.b64url_encode(b'x' * SIGNATURE_BYTES)}"
+        assert client.get("/secrets", headers=auth_header(forged)).status_code == 401
+
+
+def test_make_verifier_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        auth.make_verifier("nope")
+
+
+def test_incomplete_verifier_fails_at_construction():
+    class SyncOnlyVerifier(auth.SignatureVerifier):
+        def verify(self, message, signature_hex, public_key):
+            return True
+
+    with pytest.raises(TypeError):
+        SyncOnlyVerifier()
@@ -1,7 +1,11 @@
+import base64
+import os
 import pytest
 from unittest.mock import patch
 from uuid import uuid4
 
+import models
+
 def create_test_secret(client, token):
     response = client.post(
         "/secrets",
@@ -30,7 +34,7 @@ class TestFileChunks:
             "secret_id": secret_id,
             "chunk_index": 0,
             "iv": "iv_hex_0",
-            "encrypted_data": "encrypted_hex_0"
+            "encrypted_data": "e0e0e0"
         }
         res0 = client.post("/secrets/chunks", headers=auth_headers, json=chunk_0)
         assert res0.status_code == 201
@@ -41,7 +45,7 @@ class TestFileChunks:
             "secret_id": secret_id,
             "chunk_index": 1,
             "iv": "iv_hex_1",
-            "encrypted_data": "encrypted_hex_1"
+            "encrypted_data": "e1e1e1"
         }
         res1 = client.post("/secrets/chunks", headers=auth_headers, json=chunk_1)
         assert res1.status_code == 201
@@ -56,7 +60,7 @@ class TestFileChunks:
         # Upload 2 chunks
         for i in range(2):
             client.post("/secrets/chunks", headers=auth_headers, json={
-                "secret_id": secret_id, "chunk_index": i, "iv": f"iv_{i}", "encrypted_data": f"data_{i}"
+                "secret_id": secret_id, "chunk_index": i, "iv": f"iv_{i}", "encrypted_data": f"da7a0{i}"
             })
 
         # List
@@ -70,7 +74,7 @@ class TestFileChunks:
         
         assert chunks[0]["chunk_index"] == 0
         assert chunks[1]["chunk_index"] == 1
-        assert chunks[0]["encrypted_data"] == "data_0"
+        assert chunks[0]["encrypted_data"] == "da7a00"
 
     def test_get_chunk(self, client, user1):
         token, _ = user1
@@ -81,7 +85,7 @@ class TestFileChunks:
 
         # Upload
         client.post("/secrets/chunks", headers=auth_headers, json={
-            "secret_id": secret_id, "chunk_index": 0, "iv": "iv_0", "encrypted_data": "data_0"
+            "secret_id": secret_id, "chunk_index": 0, "iv": "iv_0", "encrypted_data": "da7a00"
         })
 
         # Get
@@ -89,7 +93,7 @@ class TestFileChunks:
         assert res.status_code == 200
         data = res.json()
         assert data["chunk_index"] == 0
-        assert data["encrypted_data"] == "data_0"
+        assert data["encrypted_data"] == "da7a00"
 
     def test_upload_chunk_not_owner_fails(self, client, user1, user2):
         token1, _ = user1
@@ -102,7 +106,7 @@ class TestFileChunks:
 
         # User 2 tries to upload to User 1's secret
         res = client.post("/secrets/chunks", headers=user2_headers, json={
-            "secret_id": secret_id, "chunk_index": 0, "iv": "idx", "encrypted_data": "data"
+            "secret_id": secret_id, "chunk_index": 0, "iv": "idx", "encrypted_data": "da7a"
         })
         assert res.status_code == 403
 
@@ -117,7 +121,7 @@ class TestFileChunks:
         secret = create_test_secret(client, token1)
         secret_id = secret["id"]
         client.post("/secrets/chunks", headers=auth_headers, json={
-            "secret_id": secret_id, "chunk_index": 0, "iv": "iv", "encrypted_data": "data"
+            "secret_id": secret_id, "chunk_index": 0, "iv": "iv", "encrypted_data": "da7a"
         })
 
         # User 2 tries to read
@@ -135,7 +139,7 @@ class TestFileChunks:
         # User 2 tries again -> Success
         res2 = client.get(f"/secrets/{secret_id}/chunks/0", headers=user2_headers)
         assert res2.status_code == 200
-        assert res2.json()["encrypted_data"] == "data"
+        assert res2.json()["encrypted_data"] == "da7a"
 
     def test_delete_secret_removes_chunks(self, client, user1):
         token, _ = user1
@@ -145,7 +149,7 @@ class TestFileChunks:
         secret = create_test_secret(client, token)
         secret_id = secret["id"]
         client.post("/secrets/chunks", headers=auth_headers, json={
-            "secret_id": secret_id, "chunk_index": 0, "iv": "iv", "encrypted_data": "data"
+            "secret_id": secret_id, "chunk_index": 0, "iv": "iv", "encrypted_data": "da7a"
         })
 
         # Verify chunk exists
@@ -183,3 +187,70 @@ class TestFileChunks:
             })
             assert res2.status_code == 413
             assert "too large" in res2.json()["detail"].lower()
+
+
+class TestChunkEncodings:
+    def test_chunks_are_stored_as_raw_bytes(self, client, db_session, user1):
+        token, _ = user1
+        secret_id = create_test_secret(client, token)["id"]
+        client.post("/secrets/chunks", headers={"Authorization": f"Bearer {token}"}, json={
+            "secret_id": secret_id, "chunk_index": 0, "iv": "iv", "encrypted_data": "00ff10ab"
+        })
+        stored = db_session.query(models.FileChunk).filter_by(secret_id=secret_id).one()
+        assert stored.encrypted_data == b"\x00\xff\x10\xab"
+
+    def test_base64_upload_and_download(self, client, user1):
+        token, _ = user1
+        auth_headers = {"Authorization": f"Bearer {token}"}
+        secret_id = create_test_secret(client, token)["id"]
+        payload = os.urandom(300)
+        res = client.post("/secrets/chunks", headers=auth_headers, json={
+            "secret_id": secret_id, "chunk_index": 0, "iv": "iv",
+            "encrypted_data": base64.b64encode(payload).decode(), "encoding": "base64",
+        })
+        assert res.status_code == 201
+
+        as_b64 = client.get(f"/secrets/{secret_id}/chunks/0", params={"encoding": "base64"}, headers=auth_headers)
+        as_hex = client.get(f"/secrets/{secret_id}/chunks", headers=auth_headers)
+        assert base64.b64decode(as_b64.json()["encrypted_data"]) == payload
+        assert as_hex.json()[0]["encrypted_data"] == payload.hex()
+
+    def test_invalid_encoding_rejected(self, client, user1):
+        token, _ = user1
+        auth_headers = {"Authorization": f"Bearer {token}"}
+        secret_id = create_test_secret(client, token)["id"]
+        for data, encoding in (("not hex", "hex"), ("***", "base64")):
+            res = client.post("/secrets/chunks", headers=auth_headers, json={
+                "secret_id": secret_id, "chunk_index": 0, "iv": "iv", "encrypted_data": data, "encoding": encoding,
+            })
+            assert res.status_code == 400
+        res = client.get(f"/secrets/{secret_id}/chunks", params={"encoding": "utf8"}, headers=auth_headers)
+        assert res.status_code == 422
+
+    def test_binary_upload_and_download(self, client, user1):
+        token, _ = user1
+        secret_id = create_test_secret(client, token)["id"]
+        payload = os.urandom(1024)
+        res = client.put(f"/secrets/{secret_id}/chunks/0", content=payload, headers={
+            "Authorization": f"Bearer {token}", "Content-Type": "application/octet-stream", "X-Chunk-IV": "iv_0",
+        })
+        assert res.status_code == 201
+
+        res = client.get(f"/secrets/{secret_id}/chunks/0", headers={
+            "Authorization": f"Bearer {token}", "Accept": "application/octet-stream",
+        })
+        assert res.status_code == 200
+        assert res.content == payload
+        assert res.headers["X-Chunk-IV"] == "iv_0"
+        # Older clients still get hex JSON
+        res = client.get(f"/secrets/{secret_id}/chunks/0", headers={"Authorization": f"Bearer {token}"})
+        assert res.json() == {"chunk_index": 0, "iv": "iv_0", "encrypted_data": payload.hex()}
+
+    def test_binary_chunk_size_limit(self, client, user1):
+        token, _ = user1
+        secret_id = create_test_secret(client, token)["id"]
+        with patch("config.MAX_CHUNK_SIZE", 16):
+            res = client.put(f"/secrets/{secret_id}/chunks/0", content=b"x" * 17, headers={
+                "Authorization": f"Bearer {token}", "Content-Type": "application/octet-stream", "X-Chunk-IV": "iv",
+            })
+        assert res.status_code == 413
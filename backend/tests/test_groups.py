@@ -2,7 +2,8 @@
 Tests for the Group Channels feature.
 """
 import pytest
-from conftest import do_login, auth_header, TEST_USER_ADDRESS, TEST_USER_ADDRESS_2, TEST_ENCRYPTION_KEY
+import models
+from conftest import do_login, auth_header, user_id, TEST_USER_ADDRESS, TEST_USER_ADDRESS_2, TEST_ENCRYPTION_KEY
 
 
 TEST_USER_ADDRESS_3 = "pqc_test_user_" + "d" * 100
@@ -152,6 +153,92 @@ class TestGroupMessages:
         assert resp.status_code == 403
 
 
+def _seed_channel(db_session, users, count, channel_id="seeded"):
+    """Channel with `users` as members and messages m0..m{count-1}, seeded directly
+    (fixture keys are too short for POST /groups)."""
+    ids = [user_id(db_session, u["address"]) for u in users]
+    db_session.add(models.GroupChannel(id=channel_id, name=channel_id.title(), owner_id=ids[0]))
+    for uid in ids:
+        db_session.add(models.GroupMember(channel_id=channel_id, user_id=uid))
+    for i in range(count):
+        db_session.add(models.GroupMessage(channel_id=channel_id, sender_id=ids[i % len(ids)], content=f"m{i}"))
+        db_session.flush()
+    db_session.commit()
+    return channel_id
+
+
+class TestGroupHistoryCursor:
+    def _history(self, client, token, channel_id, **params):
+        return client.post(f"/groups/{channel_id}/history", json=params, headers=auth_header(token))
+
+    def test_cursor_walks_back_through_channel(self, client, db_session, user1, user2):
+        (token1, u1), (_, u2) = user1, user2
+        cid = _seed_channel(db_session, [u1, u2], 5)
+
+        pages, params = [], {"limit": 2}
+        while True:
+            resp = self._history(client, token1, cid, **params)
+            assert resp.status_code == 200
+            pages.append([m["content"] for m in resp.json()])
+            if "X-Next-Cursor" not in resp.headers:
+                break
+            params = {"limit": 2, "cursor": resp.headers["X-Next-Cursor"]}
+        assert pages == [["m3", "m4"], ["m1", "m2"], ["m0"]]
+        assert resp.json()[0]["sender"]["address"] == u1["address"]
+
+    def test_since_id_returns_only_new_messages(self, client, db_session, user1, user2):
+        (token1, u1), (_, u2) = user1, user2
+        cid = _seed_channel(db_session, [u1, u2], 5)
+        latest = self._history(client, token1, cid, limit=50).json()
+        last_seen = latest[2]["id"]
+
+        resp = self._history(client, token1, cid, since_id=last_seen, limit=1)
+        assert [m["content"] for m in resp.json()] == ["m3"]
+        resp = self._history(client, token1, cid, limit=1, cursor=resp.headers["X-Next-Cursor"])
+        assert [m["content"] for m in resp.json()] == ["m4"]
+        assert "X-Next-Cursor" not in resp.headers
+
+        assert self._history(client, token1, cid, since_id=latest[-1]["id"]).json() == []
+
+    def test_before_id_and_conflicts(self, client, db_session, user1, user2):
+        (token1, u1), (_, u2) = user1, user2
+        cid = _seed_channel(db_session, [u1, u2], 4)
+        ids = [m["id"] for m in self._history(client, token1, cid).json()]
+        assert [m["id"] for m in self._history(client, token1, cid, before_id=ids[2]).json()] == ids[:2]
+        assert self._history(client, token1, cid, before_id=ids[2], since_id=ids[0]).status_code == 400
+        assert self._history(client, token1, cid, cursor="???").status_code == 400
+
+
+class TestGroupInbox:
+    def _inbox(self, client, token):
+        return [(g["channel"]["id"], g["last_message"] and g["last_message"]["content"], g["unread_count"])
+                for g in client.get("/groups", headers=auth_header(token)).json()]
+
+    def test_latest_message_and_unread_counts(self, client, db_session, user1, user2, user3):
+        (token1, u1), (token2, u2), (_, u3) = user1, user2, user3
+        _seed_channel(db_session, [u1, u2], 5, "pair")    # u1 sent m0, m2, m4
+        _seed_channel(db_session, [u1, u2, u3], 0, "empty")
+        _seed_channel(db_session, [u2, u1], 2, "recent")  # u2 sent m0
+
+        assert self._inbox(client, token1) == [("recent", "m1", 1), ("empty", None, 0), ("pair", "m4", 2)]
+        assert self._inbox(client, token2)[2] == ("pair", "m4", 3)
+
+    def test_mark_read_records_position(self, client, db_session, user1, user2):
+        (token1, u1), (_, u2) = user1, user2
+        cid = _seed_channel(db_session, [u1, u2], 4)
+        assert client.post(f"/groups/{cid}/mark-read", headers=auth_header(token1)).status_code == 200
+        assert self._inbox(client, token1) == [(cid, "m3", 0)]
+
+        id2 = user_id(db_session, u2["address"])
+        db_session.add(models.GroupMessage(channel_id=cid, sender_id=id2, content="new"))
+        db_session.commit()
+        assert self._inbox(client, token1) == [(cid, "new", 1)]
+
+    def test_mark_read_requires_membership(self, client, db_session, user1, user2, user3):
+        cid = _seed_channel(db_session, [user1[1], user2[1]], 1)
+        assert client.post(f"/groups/{cid}/mark-read", headers=auth_header(user3[0])).status_code == 403
+
+
 class TestGroupMembers:
     def test_owner_can_add_member(self, client, user1, user2, user3):
         token1, u1 = user1
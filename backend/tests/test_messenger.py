@@ -1,6 +1,13 @@
 """Tests for /messages endpoints — send, history, conversations, mark-read."""
 
-from conftest import auth_header
+from datetime import datetime
+
+import models
+from conftest import auth_header, do_login, user_id, TEST_ENCRYPTION_KEY
+from utils import conversations
+
+
+TEST_USER_ADDRESS_3 = "pqc_test_user_" + "c" * 100
 
 
 def _send_message(client, token, recipient_address, content="Hello encrypted"):
@@ -76,6 +83,81 @@ class TestMessageHistory:
         assert resp.status_code == 422  # Pydantic rejects limit > 100
 
 
+def _seed_message(db_session, sender_id, recipient_id, content):
+    """A message and its conversation summaries, written as send_message does (uncommitted)."""
+    msg = models.Message(sender_id=sender_id, recipient_id=recipient_id, content=content)
+    db_session.add(msg)
+    db_session.flush()
+    db_session.execute(conversations.summary_upsert(db_session.bind.dialect.name, msg))
+    return msg
+
+
+def _seed_conversation(db_session, u1, u2, count):
+    """Alternating messages m0..m{count-1}, seeded directly (fixture keys are too short for POST /messages)."""
+    id1, id2 = user_id(db_session, u1["address"]), user_id(db_session, u2["address"])
+    for i in range(count):
+        sender, recipient = (id1, id2) if i % 2 == 0 else (id2, id1)
+        _seed_message(db_session, sender, recipient, f"m{i}")
+    db_session.commit()
+
+
+class TestHistoryCursor:
+    def _history(self, client, token, partner, **params):
+        return client.post("/messages/history", json={"partner_address": partner, **params},
+                           headers=auth_header(token))
+
+    def test_cursor_walks_back_through_whole_conversation(self, client, db_session, user1, user2):
+        token1, u1 = user1
+        _, u2 = user2
+        _seed_conversation(db_session, u1, u2, 7)
+
+        pages, params = [], {"limit": 3}
+        while True:
+            resp = self._history(client, token1, u2["address"], **params)
+            assert resp.status_code == 200
+            pages.append([m["content"] for m in resp.json()])
+            cursor = resp.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            params = {"limit": 3, "cursor": cursor}
+        assert pages == [["m4", "m5", "m6"], ["m1", "m2", "m3"], ["m0"]]
+
+    def test_new_messages_do_not_shift_pages(self, client, db_session, user1, user2):
+        token1, u1 = user1
+        _, u2 = user2
+        _seed_conversation(db_session, u1, u2, 4)
+        first = self._history(client, token1, u2["address"], limit=2)
+        _seed_conversation(db_session, u1, u2, 3)  # arrive mid-scroll
+        second = self._history(client, token1, u2["address"], limit=2, cursor=first.headers["X-Next-Cursor"])
+        assert [m["content"] for m in second.json()] == ["m0", "m1"]
+
+    def test_after_id_pages_forward(self, client, db_session, user1, user2):
+        token1, u1 = user1
+        _, u2 = user2
+        _seed_conversation(db_session, u1, u2, 5)
+        ids = [m["id"] for m in self._history(client, token1, u2["address"], limit=10).json()]
+
+        resp = self._history(client, token1, u2["address"], limit=2, after_id=ids[0])
+        assert [m["id"] for m in resp.json()] == ids[1:3]
+        resp = self._history(client, token1, u2["address"], limit=2, cursor=resp.headers["X-Next-Cursor"])
+        assert [m["id"] for m in resp.json()] == ids[3:5]
+        assert "X-Next-Cursor" not in resp.headers
+
+    def test_before_id(self, client, db_session, user1, user2):
+        token1, u1 = user1
+        _, u2 = user2
+        _seed_conversation(db_session, u1, u2, 5)
+        ids = [m["id"] for m in self._history(client, token1, u2["address"], limit=10).json()]
+        resp = self._history(client, token1, u2["address"], limit=10, before_id=ids[2])
+        assert [m["id"] for m in resp.json()] == ids[:2]
+
+    def test_invalid_cursor_and_conflicting_bounds_rejected(self, client, user1, user2):
+        token1, _ = user1
+        _, u2 = user2
+        assert self._history(client, token1, u2["address"], cursor="not-a-cursor").status_code == 400
+        assert self._history(client, token1, u2["address"], before_id=5, after_id=1).status_code == 400
+
+
 class TestConversations:
     def test_conversations_list(self, client, user1, user2):
         token1, _ = user1
@@ -88,6 +170,21 @@ class TestConversations:
         partner_addresses = [c["user"]["address"] for c in convos]
         assert u2["address"] in partner_addresses
 
+    def test_conversation_merges_both_directions(self, client, db_session, user1, user2):
+        token1, u1 = user1
+        _, u2 = user2
+        # Seeded directly: the fixture keys are too short for POST /messages
+        id1, id2 = user_id(db_session, u1["address"]), user_id(db_session, u2["address"])
+        _seed_message(db_session, id1, id2, "first")
+        reply_id = _seed_message(db_session, id2, id1, "reply").id
+        db_session.commit()
+        resp = client.get("/messages/conversations", headers=auth_header(token1))
+        convos = resp.json()
+        assert len(convos) == 1
+        assert convos[0]["user"]["address"] == u2["address"]
+        assert convos[0]["last_message"]["id"] == reply_id
+        assert convos[0]["unread_count"] == 1
+
     def test_empty_conversations(self, client, user1):
         token, _ = user1
         resp = client.get("/messages/conversations", headers=auth_header(token))
@@ -116,3 +213,60 @@ class TestMarkRead:
             "partner_address": u1["address"], "limit": 50, "offset": 0,
         }, headers=auth_header(token2))
         assert hist2.json()[0]["is_read"] is True
+
+
+class TestConversationSummaries:
+    def _inbox(self, client, token):
+        return {c["user"]["address"]: c for c in client.get("/messages/conversations", headers=auth_header(token)).json()}
+
+    def test_summaries_follow_messages_and_mark_read(self, client, db_session, user1, user2):
+        token1, u1 = user1
+        token2, u2 = user2
+        _, u3 = do_login(client, TEST_USER_ADDRESS_3, TEST_ENCRYPTION_KEY, "TestUser3")
+        _seed_conversation(db_session, u1, u2, 5)  # u1 sent m0, m2, m4
+        last = _seed_message(db_session, user_id(db_session, u3["address"]), user_id(db_session, u1["address"]), "hi")
+        db_session.commit()
+        assert conversations.check(db_session) == []
+
+        inbox = self._inbox(client, token1)
+        assert list(inbox) == [u3["address"], u2["address"]]  # most recent first
+        assert inbox[u3["address"]]["last_message"]["id"] == last.id
+        assert inbox[u3["address"]]["unread_count"] == 1
+        assert inbox[u2["address"]]["last_message"]["content"] == "m4"
+        assert inbox[u2["address"]]["unread_count"] == 2
+        assert self._inbox(client, token2)[u1["address"]]["unread_count"] == 3
+
+        client.post(f"/messages/mark-read/{u1['address']}", headers=auth_header(token2))
+        assert self._inbox(client, token2)[u1["address"]]["unread_count"] == 0
+        assert self._inbox(client, token1)[u2["address"]]["unread_count"] == 2
+        db_session.expire_all()
+        assert conversations.check(db_session) == []
+
+    def test_note_to_self_is_one_conversation(self, client, db_session, user1):
+        token1, u1 = user1
+        id1 = user_id(db_session, u1["address"])
+        _seed_message(db_session, id1, id1, "note")
+        db_session.commit()
+        assert conversations.check(db_session) == []
+        assert self._inbox(client, token1)[u1["address"]]["unread_count"] == 1
+
+    def test_check_reports_drift_and_rebuild_repairs_it(self, client, db_session, user1, user2):
+        _, u1 = user1
+        _, u2 = user2
+        _, u3 = do_login(client, TEST_USER_ADDRESS_3, TEST_ENCRYPTION_KEY, "TestUser3")
+        id1, id2, id3 = (user_id(db_session, u["address"]) for u in (u1, u2, u3))
+        _seed_conversation(db_session, u1, u2, 3)
+        # Written without summaries, as before the table existed
+        db_session.add(models.Message(sender_id=id3, recipient_id=id1, content="untracked"))
+        s = models.ConversationSummary
+        db_session.query(s).filter(s.user_id == id2).update({"unread_count": 7})
+        db_session.add(s(user_id=id2, partner_id=id3, last_message_id=1, last_activity=datetime.now(), unread_count=0))
+        db_session.commit()
+
+        assert conversations.check(db_session) == [
+            ("extra", id2, id3), ("missing", id1, id3), ("missing", id3, id1), ("stale", id2, id1),
+        ]
+        conversations.rebuild(db_session)
+        assert conversations.check(db_session) == []
+        assert db_session.query(s).filter_by(user_id=id2, partner_id=id1).one().unread_count == 2
+
@@ -1,6 +1,13 @@
 """Tests for /multisig endpoints — workflow creation, signing, completion."""
 
-from conftest import auth_header
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import event
+
+import models
+from conftest import auth_header, engine, user_id
 
 
 def _create_workflow(client, token, signer_addresses, recipient_addresses=None):
@@ -34,6 +41,11 @@ class TestCreateWorkflow:
         assert data["signers"][0]["user_address"] == u2["address"]
         assert data["signers"][0]["has_signed"] is False
 
+    def test_create_workflow_unknown_signer(self, client, user1):
+        token1, _ = user1
+        resp = _create_workflow(client, token1, ["0x" + "9" * 40])
+        assert resp.status_code == 404
+
     def test_create_workflow_unauthenticated(self, client):
         resp = client.post("/multisig/workflow", json={
             "name": "x",
@@ -47,6 +59,46 @@ class TestCreateWorkflow:
         assert resp.status_code == 401
 
 
+class TestCreateWorkflowUnitOfWork:
+    def _bulk_users(self, db_session, count):
+        users = [models.User(address=f"bulk_user_{i}") for i in range(count)]
+        db_session.add_all(users)
+        db_session.commit()
+        return [u.address for u in users]
+
+    def test_duplicate_signers_collapse(self, client, db_session, user1, user2):
+        token1, _ = user1
+        _, u2 = user2
+        resp = _create_workflow(client, token1, [u2["address"], u2["address"].upper()])
+        assert resp.status_code == 200
+        data = resp.json()
+        assert [s["user_address"] for s in data["signers"]] == [u2["address"]]
+        assert data["signers"][0]["encrypted_key"] is not None
+        assert db_session.get(models.MultisigWorkflow, data["id"]).required_signatures == 1
+
+    def test_query_count_independent_of_signers(self, client, db_session, user1):
+        token1, _ = user1
+        addresses = self._bulk_users(db_session, 60)
+        counts = []
+        for signers in (addresses[:2], addresses[2:60]):
+            with _count_queries() as statements:
+                resp = _create_workflow(client, token1, signers, signers[:1])
+            assert resp.status_code == 200
+            assert len(resp.json()["signers"]) == len(signers)
+            counts.append(len(statements))
+        assert counts[0] == counts[1]
+
+    def test_failure_leaves_nothing_behind(self, client, db_session, user1, user2):
+        token1, _ = user1
+        _, u2 = user2
+        with patch("routers.multisig.insert", side_effect=RuntimeError("crash mid-creation")):
+            with pytest.raises(RuntimeError):
+                _create_workflow(client, token1, [u2["address"]])
+        assert db_session.query(models.Secret).count() == 0
+        assert db_session.query(models.MultisigWorkflow).count() == 0
+        assert db_session.query(models.AccessGrant).count() == 0
+
+
 class TestListWorkflows:
     def test_owner_sees_own_workflows(self, client, user1, user2):
         token1, _ = user1
@@ -65,6 +117,83 @@ class TestListWorkflows:
         assert len(resp.json()) >= 1
 
 
+def _seed_workflows(db_session, owner, signer, count, status="pending"):
+    """`count` workflows of `owner` signed by `signer`, who also receives the completed ones (seeded directly)."""
+    owner_id, signer_id = user_id(db_session, owner["address"]), user_id(db_session, signer["address"])
+    for i in range(count):
+        secret = models.Secret(owner_id=owner_id, name=f"S{i}", encrypted_data="payload")
+        db_session.add(secret)
+        db_session.flush()
+        db_session.add(models.AccessGrant(secret_id=secret.id, grantee_id=owner_id, encrypted_key=f"owner_key_{i}"))
+        wf = models.MultisigWorkflow(name=f"W{i}", owner_id=owner_id, secret_id=secret.id, status=status)
+        db_session.add(wf)
+        db_session.flush()
+        db_session.add(models.MultisigWorkflowSigner(workflow_id=wf.id, user_id=signer_id, encrypted_key="k"))
+        if status == "completed":
+            db_session.add(models.MultisigWorkflowRecipient(workflow_id=wf.id, user_id=signer_id, encrypted_key="r"))
+    db_session.commit()
+
+
+@contextmanager
+def _count_queries():
+    statements = []
+    record = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+class TestListWorkflowsBatched:
+    def _list(self, client, token):
+        with _count_queries() as statements:
+            resp = client.get("/multisig/workflows", headers=auth_header(token))
+        assert resp.status_code == 200
+        return resp.json(), len(statements)
+
+    def test_query_count_constant_in_workflow_count(self, client, db_session, user1, user2):
+        (token1, u1), (token2, u2) = user1, user2
+        _seed_workflows(db_session, u1, u2, 1)
+        _seed_workflows(db_session, u1, u2, 1, status="completed")
+        _, owner_queries = self._list(client, token1)
+        _, signer_queries = self._list(client, token2)
+
+        _seed_workflows(db_session, u1, u2, 5)
+        _seed_workflows(db_session, u1, u2, 3, status="completed")
+        owned, owner_queries_after = self._list(client, token1)
+        signed, signer_queries_after = self._list(client, token2)
+        assert len(owned) == len(signed) == 10
+        assert (owner_queries_after, signer_queries_after) == (owner_queries, signer_queries)
+
+    def test_owner_keys_and_relationships_loaded(self, client, db_session, user1, user2):
+        (token1, u1), (token2, u2) = user1, user2
+        _seed_workflows(db_session, u1, u2, 2, status="completed")
+        owned, _ = self._list(client, token1)
+        assert [w["owner_encrypted_key"] for w in owned] == ["owner_key_0", "owner_key_1"]
+        assert owned[0]["secret"]["encrypted_key"] == "owner_key_0"
+        assert owned[0]["signers"][0]["user"]["address"] == u2["address"]
+        assert owned[0]["recipients"][0]["user"]["address"] == u2["address"]
+
+        # Signer and recipient, not owner: listed once, without the owner's key
+        received, _ = self._list(client, token2)
+        assert [w["owner_encrypted_key"] for w in received] == [None, None]
+
+    def test_recipient_sees_only_completed(self, client, db_session, user1, user2):
+        (_, u1), (token2, u2) = user1, user2
+        _seed_workflows(db_session, u1, u2, 1, status="completed")
+        id2 = user_id(db_session, u2["address"])
+        db_session.query(models.MultisigWorkflowSigner).delete()
+        wf = db_session.query(models.MultisigWorkflow).one()
+        pending = models.MultisigWorkflow(name="P", owner_id=wf.owner_id, secret_id=wf.secret_id, status="pending")
+        db_session.add(pending)
+        db_session.flush()
+        db_session.add(models.MultisigWorkflowRecipient(workflow_id=pending.id, user_id=id2))
+        db_session.commit()
+        received, _ = self._list(client, token2)
+        assert [w["id"] for w in received] == [wf.id]
+
+
 class TestGetWorkflow:
     def test_get_workflow_as_owner(self, client, user1, user2):
         token1, _ = user1
@@ -133,3 +262,73 @@ class TestSignWorkflow:
         }, headers=auth_header(token2))
         assert resp2.status_code == 200
         assert resp2.json()["status"] == "completed"
+
+
+def _seed_signed_workflow(db_session, owner, last_signer, other_signers, recipients=()):
+    """Workflow where `other_signers` extra signers have signed and `last_signer` has not (seeded directly)."""
+    owner_id, last_id = user_id(db_session, owner["address"]), user_id(db_session, last_signer["address"])
+    batch = db_session.query(models.MultisigWorkflow).count()
+    others = [models.User(address=f"bulk_signer_{batch}_{i}") for i in range(other_signers)]
+    db_session.add_all(others)
+    secret = models.Secret(owner_id=owner_id, name="S", encrypted_data="payload")
+    db_session.add(secret)
+    db_session.flush()
+    wf = models.MultisigWorkflow(name="Bulk", owner_id=owner_id, secret_id=secret.id,
+                                 required_signatures=other_signers + 1, signed_count=other_signers)
+    db_session.add(wf)
+    db_session.flush()
+    db_session.add_all([models.MultisigWorkflowSigner(workflow_id=wf.id, user_id=u.id, has_signed=True) for u in others])
+    db_session.add(models.MultisigWorkflowSigner(workflow_id=wf.id, user_id=last_id))
+    db_session.add_all([models.MultisigWorkflowRecipient(workflow_id=wf.id, user_id=user_id(db_session, r["address"]))
+                        for r in recipients])
+    db_session.commit()
+    return wf.id
+
+
+class TestSetBasedSigning:
+    def _sign(self, client, token, wf_id, **body):
+        with _count_queries() as statements:
+            resp = client.post(f"/multisig/workflow/{wf_id}/sign", json={"signature": "sig", **body},
+                               headers=auth_header(token))
+        assert resp.status_code == 200, resp.text
+        return resp.json(), len(statements)
+
+    def test_completion_query_count_independent_of_signers(self, client, db_session, user1, user2):
+        (_, u1), (token2, u2) = user1, user2
+        small = _seed_signed_workflow(db_session, u1, u2, 2)
+        large = _seed_signed_workflow(db_session, u1, u2, 300)
+        small_resp, small_queries = self._sign(client, token2, small)
+        large_resp, large_queries = self._sign(client, token2, large)
+        assert small_resp["status"] == large_resp["status"] == "completed"
+        assert len(large_resp["signers"]) == 301
+        assert large_queries == small_queries
+
+    def test_recipient_keys_released_in_bulk(self, client, db_session, user1, user2):
+        (token1, u1), (token2, u2) = user1, user2
+        wf_id = _seed_signed_workflow(db_session, u1, u2, 1, recipients=[u1, u2])
+        data, _ = self._sign(client, token2, wf_id, recipient_keys={
+            u1["address"].upper(): "key1", u2["address"]: "key2", "unknown_recipient": "ignored",
+        })
+        assert {r["user_address"]: r["encrypted_key"] for r in data["recipients"]} == {
+            u1["address"]: "key1", u2["address"]: "key2",
+        }
+
+    def test_completion_transition_happens_once(self, client, db_session, user1, user2):
+        (token1, u1), (token2, u2) = user1, user2
+        wf_id = _seed_signed_workflow(db_session, u1, u2, 0, recipients=[u2])
+        db_session.add(models.MultisigWorkflowSigner(workflow_id=wf_id, user_id=user_id(db_session, u1["address"])))
+        db_session.query(models.MultisigWorkflow).filter_by(id=wf_id).update({"required_signatures": 2})
+        db_session.commit()
+
+        events = []
+        record = lambda db, addr, **kw: events.append(kw["data"]["type"])
+        with patch("routers.multisig.notify_user_push", side_effect=record), \
+                patch("routers.multisig.notify_users_push", side_effect=record):
+            first, _ = self._sign(client, token1, wf_id)
+            second, _ = self._sign(client, token2, wf_id)
+            again = client.post(f"/multisig/workflow/{wf_id}/sign", json={"signature": "sig"}, headers=auth_header(token2))
+
+        assert (first["status"], second["status"], again.status_code) == ("pending", "completed", 400)
+        assert events == ["multisig_signed", "multisig_completed"]  # the owner's own signature isn't notified
+        db_session.expire_all()
+        assert db_session.get(models.MultisigWorkflow, wf_id).signed_count == 2
@@ -1,6 +1,7 @@
 import pytest
 from models import PushSubscription
 from utils.push import notify_user_push
+from conftest import user_id
 from unittest.mock import patch, MagicMock
 
 def test_push_subscription_registration(client, db_session, user1):
@@ -30,7 +31,7 @@ def test_notify_user_push_logic(db_session, user1):
     
     # Add a subscription
     sub = PushSubscription(
-        user_address=current_user["address"],
+        user_id=user_id(db_session, current_user["address"]),
         endpoint="https://fake.endpoint",
         p256dh="p256",
         auth="auth"
@@ -54,7 +55,7 @@ def test_push_cleanup_on_gone(db_session, user1):
     
     # Add a subscription
     sub = PushSubscription(
-        user_address=current_user["address"],
+        user_id=user_id(db_session, current_user["address"]),
         endpoint="https://gone.endpoint",
         p256dh="p256",
         auth="auth"
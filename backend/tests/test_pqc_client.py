@@ -0,0 +1,392 @@
+"""Tests for the shared PQC sidecar client (pqc_client.py)."""
+
+import asyncio
+import httpx
+
+import auth
+from conftest import _mock_pqc_handler, FAKE_SERVER_PUBLIC_KEY
+from pqc_client import PQCClient
+
+
+def _recording_client(seen):
+    def handler(request):
+        seen.append(request)
+        return _mock_pqc_handler(request)
+    return PQCClient("http://pqc.test", transport=httpx.MockTransport(handler))
+
+
+class TestPQCClient:
+    def test_sync_facade_reuses_pooled_client(self):
+        client = _recording_client([])
+        client.request("GET", "/server-public-key")
+        first = client.endpoints[0]._sync_client
+        client.request("POST", "/verify", json={})
+        assert client.endpoints[0]._sync_client is first
+
+    def test_sends_shared_secret_header(self, monkeypatch):
+        monkeypatch.setenv("PQC_SHARED_SECRET", "s3cret")
+        seen = []
+        client = _recording_client(seen)
+        client.request("POST", "/sign", json={"message": "m"})
+        assert seen[0].headers["x-api-key"] == "s3cret"
+
+    def test_async_client_reused_within_loop_and_closed_on_shutdown(self):
+        seen = []
+        client = _recording_client(seen)
+
+        async def run():
+            await client.startup()
+            pooled = client.endpoints[0]._async_client
+            res = await client.arequest("GET", "/server-public-key")
+            assert client.endpoints[0]._async_client is pooled
+            await client.shutdown()
+            return res
+
+        res = asyncio.run(run())
+        assert res.json()["publicKey"] == FAKE_SERVER_PUBLIC_KEY
+        endpoint = client.endpoints[0]
+        assert endpoint._async_client is None and endpoint._sync_client is None
+
+    def test_async_decode_uses_shared_client(self, client, user1):
+        token, _ = user1
+        auth.token_cache.clear()
+        payload = asyncio.run(auth.decode_access_token_async(token))
+        assert payload["sub"] == user1[1]["address"]
+
+
+class TestEndpointPool:
+    def _pool(self, handlers):
+        """Build a client over several fake instances; handlers maps host -> handler."""
+        def route(request):
+            return handlers[request.url.host](request)
+        urls = ",".join(f"http://{host}:3002" for host in handlers)
+        return PQCClient(urls, transport=httpx.MockTransport(route))
+
+    def test_parses_comma_separated_urls(self):
+        client = PQCClient("http://a:3002, http://b:3002")
+        assert [e.url for e in client.endpoints] == ["http://a:3002", "http://b:3002"]
+
+    def test_routes_to_least_outstanding_endpoint(self):
+        client = self._pool({"a": _mock_pqc_handler, "b": _mock_pqc_handler})
+        a, b = client.endpoints
+        a.in_flight = 3  # pretend "a" is busy
+        client.request("POST", "/sign", json={"message": "m"})
+        assert b.requests == 1 and a.requests == 0
+        assert b.in_flight == 0
+
+    def test_spreads_sequential_requests(self):
+        client = self._pool({"a": _mock_pqc_handler, "b": _mock_pqc_handler})
+        for _ in range(4):
+            client.request("POST", "/sign", json={"message": "m"})
+        assert [e.requests for e in client.endpoints] == [2, 2]
+
+    def test_failed_endpoint_is_ejected_and_request_retried(self):
+        def down(request):
+            raise httpx.ConnectError("refused", request=request)
+
+        client = self._pool({"a": down, "b": _mock_pqc_handler})
+        res = client.request("POST", "/sign", json={"message": "m"})
+        assert res.status_code == 200
+        a, b = client.endpoints
+        assert a.healthy is False and a.failures == 1
+        # Subsequent calls avoid the ejected instance
+        client.request("POST", "/sign", json={"message": "m"})
+        assert a.requests == 1 and b.requests == 2
+
+    def test_health_check_readmits_recovered_endpoint(self):
+        state = {"up": False}
+
+        def flaky(request):
+            if not state["up"]:
+                return httpx.Response(503, json={"error": "Service initializing"})
+            return _mock_pqc_handler(request)
+
+        client = self._pool({"a": flaky})
+        asyncio.run(client.check_health())
+        assert client.endpoints[0].healthy is False
+        state["up"] = True
+        asyncio.run(client.check_health())
+        assert client.endpoints[0].healthy is True
+
+
+class TestVerifyBatcher:
+    def _batch_client(self, seen, status=200):
+        import json
+
+        def handler(request):
+            seen.append(request.url.path)
+            if request.url.path == "/verify-batch" and status != 200:
+                return httpx.Response(status, json={"error": "Not Found"})
+            if request.url.path == "/verify-batch":
+                items = json.loads(request.content)["items"]
+                # Only signatures equal to "good" verify
+                return httpx.Response(200, json={"results": [i["signature"] == "good" for i in items]})
+            if request.url.path == "/verify":
+                return httpx.Response(200, json={"valid": json.loads(request.content)["signature"] == "good"})
+            return httpx.Response(404)
+        return PQCClient("http://pqc.test", transport=httpx.MockTransport(handler))
+
+    def test_concurrent_verifies_coalesce_into_one_batch(self):
+        from pqc_client import VerifyBatcher
+        seen = []
+        batcher = VerifyBatcher(self._batch_client(seen), max_size=64, max_wait_ms=5)
+
+        async def run():
+            sigs = ["good", "bad", "good", "bad", "good"]
+            return await asyncio.gather(*(batcher.verify("m", s, "pk") for s in sigs))
+
+        results = asyncio.run(run())
+        assert results == [True, False, True, False, True]
+        assert seen == ["/verify-batch"]
+        assert batcher.batches_sent == 1 and batcher.items_sent == 5
+
+    def test_flushes_when_batch_is_full(self):
+        from pqc_client import VerifyBatcher
+        seen = []
+        batcher = VerifyBatcher(self._batch_client(seen), max_size=2, max_wait_ms=1000)
+
+        async def run():
+            return await asyncio.gather(*(batcher.verify("m", "good", "pk") for _ in range(4)))
+
+        assert asyncio.run(run()) == [True] * 4
+        assert seen == ["/verify-batch", "/verify-batch"]
+
+    def test_falls_back_to_single_verify_on_old_sidecar(self):
+        from pqc_client import VerifyBatcher
+        seen = []
+        batcher = VerifyBatcher(self._batch_client(seen, status=404), max_size=64, max_wait_ms=1)
+
+        async def run():
+            return await asyncio.gather(batcher.verify("m", "good", "pk"), batcher.verify("m", "bad", "pk"))
+
+        assert asyncio.run(run()) == [True, False]
+        assert seen == ["/verify-batch", "/verify", "/verify"]
+
+
+class TestUnixSocketTransport:
+    def test_requests_reach_sidecar_over_uds(self, tmp_path):
+        import socketserver
+        import threading
+        from http.server import BaseHTTPRequestHandler
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = b'{"publicKey": "uds-key"}'
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+            def get_request(self):
+                request, _ = super().get_request()
+                return request, ("uds", 0)
+
+        sock = str(tmp_path / "pqc.sock")
+        server = UnixHTTPServer(sock, Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            client = PQCClient(f"unix://{sock}")
+            assert client.request("GET", "/server-public-key").json()["publicKey"] == "uds-key"
+
+            async def run():
+                res = await client.arequest("GET", "/server-public-key")
+                await client.shutdown()
+                return res
+
+            assert asyncio.run(run()).json()["publicKey"] == "uds-key"
+            assert client.stats()[0]["url"] == f"unix://{sock}"
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestCircuitBreaker:
+    def _down_client(self, calls):
+        def down(request):
+            calls.append(request.url.path)
+            raise httpx.ConnectError("refused", request=request)
+        return PQCClient("http://pqc.test", transport=httpx.MockTransport(down))
+
+    def test_opens_after_consecutive_failures_and_fails_fast(self):
+        import pytest
+        from pqc_client import PQCUnavailable
+        calls = []
+        client = self._down_client(calls)
+        client.breaker.failure_threshold = 3
+        for _ in range(3):
+            with pytest.raises(httpx.ConnectError):
+                client.request("POST", "/verify", json={})
+        assert client.breaker.state == "open"
+
+        with pytest.raises(PQCUnavailable):
+            client.request("POST", "/verify", json={})
+        assert len(calls) == 3
+        assert client.breaker.stats()["rejected"] == 1
+
+    def test_half_open_probe_closes_breaker(self):
+        state = {"up": False}
+
+        def flaky(request):
+            if not state["up"]:
+                raise httpx.ConnectError("refused", request=request)
+            return _mock_pqc_handler(request)
+
+        client = PQCClient("http://pqc.test", transport=httpx.MockTransport(flaky))
+        client.breaker.failure_threshold = 1
+        client.breaker.reset_seconds = 0
+        try:
+            client.request("POST", "/sign", json={"message": "m"})
+        except httpx.ConnectError:
+            pass
+        assert client.breaker.state == "open"
+        state["up"] = True
+        assert client.request("POST", "/sign", json={"message": "m"}).status_code == 200
+        assert client.breaker.state == "closed"
+
+    def test_cancelled_probe_releases_half_open_slot(self):
+        state = {"slow": True}
+
+        async def handler(request):
+            if state["slow"]:
+                await asyncio.sleep(1)
+            return _mock_pqc_handler(request)
+
+        client = PQCClient("http://pqc.test", transport=httpx.MockTransport(handler))
+        client.breaker.failure_threshold = 1
+        client.breaker.reset_seconds = 0
+        client.breaker.record_failure()
+        assert client.breaker.state == "open"
+
+        async def run():
+            # The half-open probe is cancelled before the sidecar answers
+            try:
+                await asyncio.wait_for(client.arequest("POST", "/sign", json={"message": "m"}), timeout=0.05)
+            except asyncio.TimeoutError:
+                pass
+            state["slow"] = False
+            return await client.arequest("POST", "/sign", json={"message": "m"})
+
+        assert asyncio.run(run()).status_code == 200
+        assert client.breaker.state == "closed"
+
+    def test_token_check_fails_fast_while_open(self, client, user1):
+        from pqc_client import pqc
+        token, _ = user1
+        calls = []
+        pqc.use_transport(httpx.MockTransport(lambda r: calls.append(r) or _mock_pqc_handler(r)))
+        for _ in range(pqc.breaker.failure_threshold):
+            pqc.breaker.record_failure()
+        assert pqc.breaker.state == "open"
+        auth.token_cache.clear()
+        assert asyncio.run(auth.decode_access_token_async(token)) is None
+        assert calls == []
+
+
+class TestLatencyHistograms:
+    def test_quantiles_and_cumulative_buckets(self):
+        from pqc_client import LatencyHistogram
+        histogram = LatencyHistogram()
+        for ms in [0.5] * 90 + [40] * 10:
+            histogram.observe(ms)
+        snap = histogram.snapshot()
+        assert snap["count"] == 100
+        assert snap["buckets"]["1"] == 90
+        assert snap["buckets"]["50"] == 100 and snap["buckets"]["+Inf"] == 100
+        assert snap["p50_ms"] <= 1
+        assert 25 < snap["p95_ms"] <= 50
+
+    def test_records_per_path(self):
+        client = _recording_client([])
+        client.request("POST", "/sign", json={"message": "m"})
+        client.request("POST", "/verify", json={})
+        client.request("POST", "/verify", json={})
+        stats = client.latency_stats()
+        assert stats["/sign"]["count"] == 1
+        assert stats["/verify"]["count"] == 2
+
+    def test_prometheus_export(self):
+        from pqc_client import pqc
+        from routers.metrics import prometheus_text
+        pqc.request("GET", "/server-public-key")
+        text = prometheus_text()
+        assert 'safelog_pqc_request_duration_ms_count{path="/server-public-key"}' in text
+        assert "safelog_pqc_breaker_open 0" in text
+
+
+class TestHedging:
+    def test_slow_instance_is_hedged(self, monkeypatch):
+        import config
+        import time
+        monkeypatch.setattr(config, "PQC_HEDGE_ENABLED", True)
+        monkeypatch.setattr(config, "PQC_HEDGE_DEFAULT_DELAY_MS", 10)
+
+        async def slow(request):
+            await asyncio.sleep(1)
+            return _mock_pqc_handler(request)
+
+        async def fast(request):
+            return _mock_pqc_handler(request)
+
+        def route(request):
+            return {"a": slow, "b": fast}[request.url.host](request)
+
+        client = PQCClient("http://a:3002,http://b:3002", transport=httpx.MockTransport(route))
+
+        async def run():
+            start = time.perf_counter()
+            res = await client.arequest("POST", "/verify", json={})
+            return res, time.perf_counter() - start
+
+        res, elapsed = asyncio.run(run())
+        assert res.status_code == 200
+        assert elapsed < 0.5
+        assert client.hedges_sent == 1 and client.hedges_won == 1
+        assert [e.in_flight for e in client.endpoints] == [0, 0]
+
+    def test_cancelled_caller_cancels_primary_before_hedging(self, monkeypatch):
+        import config
+        monkeypatch.setattr(config, "PQC_HEDGE_ENABLED", True)
+        monkeypatch.setattr(config, "PQC_HEDGE_DEFAULT_DELAY_MS", 500)
+        finished = []
+
+        async def slow(request):
+            await asyncio.sleep(0.2)
+            finished.append(request.url.host)
+            return _mock_pqc_handler(request)
+
+        client = PQCClient("http://a:3002,http://b:3002", transport=httpx.MockTransport(slow))
+
+        async def run():
+            try:
+                await asyncio.wait_for(client.arequest("POST", "/verify", json={}), timeout=0.05)
+            except asyncio.TimeoutError:
+                pass
+            await asyncio.sleep(0.3)
+
+        asyncio.run(run())
+        assert finished == []
+        assert [e.in_flight for e in client.endpoints] == [0, 0]
+
+    def test_fast_calls_are_not_hedged(self, monkeypatch):
+        import config
+        monkeypatch.setattr(config, "PQC_HEDGE_ENABLED", True)
+        monkeypatch.setattr(config, "PQC_HEDGE_DEFAULT_DELAY_MS", 500)
+        client = PQCClient("http://a:3002,http://b:3002", transport=httpx.MockTransport(_mock_pqc_handler))
+        asyncio.run(client.arequest("POST", "/verify", json={}))
+        assert client.hedges_sent == 0
+
+    def test_hedge_delay_tracks_p95(self, monkeypatch):
+        import config
+        monkeypatch.setattr(config, "PQC_HEDGE_MIN_SAMPLES", 10)
+        client = _recording_client([])
+        assert client.hedge_delay("/verify") == config.PQC_HEDGE_DEFAULT_DELAY_MS / 1000
+        for _ in range(20):
+            client.latency("/verify").observe(200)
+        assert 0.1 < client.hedge_delay("/verify") <= 0.25
@@ -0,0 +1,185 @@
+"""
+Query-plan regression test: drives the routers through their main flows,
+captures every SQL statement they run (sync and async engines), and checks
+SQLite's EXPLAIN QUERY PLAN for full table scans of application tables.
+
+A new query shape without a matching index fails here; add the index (model
+__table_args__ + Alembic migration) or, if the scan is intended, list the
+table in ALLOWED_SCANS with a reason.
+"""
+
+import re
+import pytest
+from sqlalchemy import event
+
+import models
+from conftest import do_login, auth_header, engine, async_engine, TestingSessionLocal, TEST_USER_ADDRESS, TEST_USER_ADDRESS_2
+from grant_expiry import GrantExpirySweeper
+from utils.pagination import encode_cursor
+
+# Tables whose full scans are intended: {table: reason}
+ALLOWED_SCANS = {
+}
+
+# Hot lookups and the index each must use: (statement regex, index name)
+EXPECTED_INDEXES = [
+    (r"FROM access_grants WHERE access_grants.secret_id = \? AND access_grants.grantee_id = \?",
+     "ix_access_grants_secret_id_grantee_id"),
+    (r"FROM secrets WHERE secrets.owner_id = \? AND secrets.id < \? ORDER BY secrets.id DESC",
+     "ix_secrets_owner_id"),
+    (r"FROM access_grants LEFT OUTER JOIN secrets ON secrets.id = access_grants.secret_id WHERE access_grants.expires_at <= \? ORDER BY access_grants.expires_at",
+     "ix_access_grants_expires_at"),
+    (r"FROM file_chunks WHERE file_chunks.secret_id = \? AND file_chunks.chunk_index = \?",
+     "ix_file_chunks_secret_id_chunk_index"),
+    (r"FROM messages WHERE messages.sender_id = \? AND messages.recipient_id = \? ORDER BY messages.id",
+     "ix_messages_sender_recipient_id"),
+    (r"FROM conversation_summaries WHERE conversation_summaries.user_id = \? ORDER BY conversation_summaries.last_activity",
+     "uq_conversation_summaries_user_id_partner_id"),
+    (r"UPDATE conversation_summaries SET unread_count=\? WHERE conversation_summaries.user_id = \? AND conversation_summaries.partner_id = \?",
+     "uq_conversation_summaries_user_id_partner_id"),
+    (r"FROM group_members WHERE group_members.channel_id = \? AND group_members.user_id = \?",
+     "uq_group_members_channel_id_user_id"),
+    (r"FROM multisig_workflow_signers WHERE multisig_workflow_signers.workflow_id = \? AND multisig_workflow_signers.user_id = \?",
+     "ix_multisig_workflow_signers_workflow_id_user_id"),
+    (r"FROM group_messages WHERE group_messages.channel_id = \? AND group_messages.id [<>] \? ORDER BY group_messages.id",
+     "ix_group_messages_channel_id_id"),
+    (r"FROM group_messages AS group_messages_1 WHERE group_messages_1.channel_id = group_members.channel_id AND group_messages_1.id >",
+     "ix_group_messages_channel_id_id"),
+    (r"FROM push_subscriptions WHERE push_subscriptions.endpoint = \?",
+     "uq_push_subscriptions_endpoint"),
+    (r"FROM users WHERE users.address_hash = \? AND users.address = \?",
+     "ix_users_address_hash"),
+]
+
+MESSENGER_KEY = "enc_pub_key_" + "d" * 600
+TEST_USER_ADDRESS_3 = "pqc_test_user_" + "f" * 100
+
+_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+@pytest.fixture()
+def captured():
+    """Every SELECT/UPDATE/DELETE the app runs while the fixture is active."""
+    if engine.dialect.name != "sqlite":
+        pytest.skip("EXPLAIN QUERY PLAN checks are SQLite-specific")
+    statements = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().split(" ", 1)[0].upper() in ("SELECT", "UPDATE", "DELETE"):
+            statements.setdefault(statement, parameters)
+
+    targets = (engine, async_engine.sync_engine)
+    for target in targets:
+        event.listen(target, "before_cursor_execute", record)
+    yield statements
+    for target in targets:
+        event.remove(target, "before_cursor_execute", record)
+
+
+def _plans(statements):
+    """{statement: [EXPLAIN QUERY PLAN detail lines]}"""
+    plans = {}
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for statement, parameters in statements.items():
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            plans[statement] = [row[-1] for row in cursor.fetchall()]
+        cursor.close()
+    finally:
+        raw.close()
+    return plans
+
+
+def _full_scans(plans):
+    tables = set(models.Base.metadata.tables)
+    offenders = []
+    for statement, details in plans.items():
+        for detail in details:
+            match = _SCAN.match(detail)
+            if match and match.group(1) in tables and match.group(1) not in ALLOWED_SCANS:
+                offenders.append(f"{detail}\n    in: {' '.join(statement.split())[:300]}")
+    return offenders
+
+
+def _exercise_routers(client):
+    (t1, u1), (t2, u2), (t3, u3) = [
+        do_login(client, addr, MESSENGER_KEY, name)
+        for addr, name in ((TEST_USER_ADDRESS, "A"), (TEST_USER_ADDRESS_2, "B"), (TEST_USER_ADDRESS_3, "C"))
+    ]
+    h1, h2 = auth_header(t1), auth_header(t2)
+
+    # Messenger
+    client.post("/messages", json={"recipient_address": u2["address"], "content": "hi"}, headers=h1)
+    client.post("/messages", json={"recipient_address": u1["address"], "content": "yo"}, headers=h2)
+    client.get("/messages/conversations", headers=h1)
+    client.post("/messages/history", json={"partner_address": u2["address"], "limit": 10, "offset": 0}, headers=h1)
+    client.post("/messages/history", json={"partner_address": u2["address"], "limit": 1, "before_id": 10**9}, headers=h1)
+    client.post("/messages/history", json={"partner_address": u2["address"], "limit": 1, "after_id": 0}, headers=h1)
+    client.post(f"/messages/mark-read/{u2['address']}", headers=h1)
+
+    # Secrets, grants and chunks
+    secret = client.post("/secrets", json={"name": "S", "encrypted_data": "x", "encrypted_key": "k"}, headers=h1).json()
+    client.get("/secrets", headers=h1)
+    client.post("/secrets/share", json={"secret_id": secret["id"], "grantee_address": u2["address"], "encrypted_key": "k2"}, headers=h1)
+    client.get("/secrets/shared-with-me", headers=h2)
+    client.get("/secrets/summary", params={"limit": 1, "cursor": encode_cursor("before", 10**9)}, headers=h1)
+    client.get("/secrets/shared-with-me/summary", params={"limit": 1}, headers=h2)
+    client.get(f"/secrets/{secret['id']}/payload", headers=h2)
+    client.get(f"/secrets/{secret['id']}/access", headers=h1)
+    client.post("/secrets/chunks", json={"secret_id": secret["id"], "chunk_index": 0, "iv": "aa", "encrypted_data": "ab" * 8}, headers=h1)
+    client.get(f"/secrets/{secret['id']}/chunks", headers=h2)
+    client.get(f"/secrets/{secret['id']}/chunks/0", headers=h2)
+    GrantExpirySweeper(TestingSessionLocal, interval=0, batch_size=100).sweep()
+
+    # Groups
+    cid = client.post("/groups", json={"name": "G", "member_addresses": [u2["address"]]}, headers=h1).json()["id"]
+    client.get("/groups", headers=h1)
+    client.get(f"/groups/{cid}", headers=h2)
+    client.post(f"/groups/{cid}/messages", json={"content": "hey"}, headers=h2)
+    client.post(f"/groups/{cid}/history", json={"limit": 10, "offset": 0}, headers=h1)
+    client.post(f"/groups/{cid}/history", json={"limit": 1, "before_id": 10**9}, headers=h1)
+    client.post(f"/groups/{cid}/history", json={"limit": 1, "since_id": 0}, headers=h1)
+    client.post(f"/groups/{cid}/members", json={"user_address": u3["address"]}, headers=h1)
+    client.put(f"/groups/{cid}/members/{u2['address']}/role", json={"role": "admin"}, headers=h1)
+    client.post(f"/groups/{cid}/mark-read", headers=h2)
+    client.delete(f"/groups/{cid}/members/{u3['address']}", headers=h1)
+
+    # Multisig
+    wf = client.post("/multisig/workflow", json={
+        "name": "W",
+        "secret_data": {"name": "MS", "type": "standard", "encrypted_data": "d", "encrypted_key": "k"},
+        "signers": [u2["address"]], "recipients": [u3["address"]],
+        "signer_keys": {u2["address"]: "k2"}, "recipient_keys": {},
+    }, headers=h1).json()
+    client.get("/multisig/workflows", headers=h2)
+    client.get(f"/multisig/workflow/{wf['id']}", headers=h2)
+    client.post(f"/multisig/workflow/{wf['id']}/sign", json={"signature": "sig", "recipient_keys": {u3["address"]: "k3"}}, headers=h2)
+
+    # Documents
+    client.post("/documents", json={"name": "D", "content_hash": "h", "signature": "s"}, headers=h1)
+    client.get("/documents", headers=h1)
+
+    # Push subscriptions
+    client.post("/notifications/subscribe", json={"endpoint": "https://push.example/1", "p256dh": "p", "auth": "a"}, headers=h1)
+    client.post("/notifications/unsubscribe", params={"endpoint": "https://push.example/1"}, headers=h1)
+
+
+@pytest.fixture()
+def plans(client, captured):
+    _exercise_routers(client)
+    assert len(captured) > 30  # sanity: the flows above actually ran
+    return _plans(captured)
+
+
+def test_router_queries_do_not_scan_tables(plans):
+    offenders = _full_scans(plans)
+    assert not offenders, "Full table scans:\n" + "\n".join(offenders)
+
+
+@pytest.mark.parametrize("pattern, index", EXPECTED_INDEXES)
+def test_hot_lookups_use_composite_indexes(plans, pattern, index):
+    matching = {stmt: details for stmt, details in plans.items() if re.search(pattern, " ".join(stmt.split()))}
+    assert matching, f"no captured statement matches {pattern}"
+    for stmt, details in matching.items():
+        assert any(index in d for d in details), f"{index} not used:\n" + "\n".join(details)
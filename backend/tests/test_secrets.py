@@ -1,6 +1,14 @@
 """Tests for /secrets and /documents endpoints — CRUD, sharing, access control."""
 
-from conftest import auth_header
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock
+
+import models
+from sqlalchemy import event
+
+from conftest import auth_header, engine, TestingSessionLocal
+from grant_expiry import GrantExpirySweeper
 
 
 def _create_secret(client, token, name="TestSecret", encrypted_data="enc_data_abc", encrypted_key="enc_key_123"):
@@ -205,6 +213,194 @@ class TestGetSecretAccess:
         assert resp.status_code == 403
 
 
+def _share_expired(client, db_session, token, grantee_address, expired_seconds_ago=60):
+    """Share a new secret with `grantee_address` and backdate the grant's expiry."""
+    secret_id = _create_secret(client, token).json()["id"]
+    grant_id = client.post("/secrets/share", json={
+        "secret_id": secret_id, "grantee_address": grantee_address,
+        "encrypted_key": "key", "expires_in": 3600,
+    }, headers=auth_header(token)).json()["id"]
+    db_session.query(models.AccessGrant).filter_by(id=grant_id).update(
+        {"expires_at": datetime.now(timezone.utc) - timedelta(seconds=expired_seconds_ago)}
+    )
+    db_session.commit()
+    return secret_id, grant_id
+
+
+class TestGrantExpiry:
+    def test_reads_hide_expired_grants_without_deleting(self, client, db_session, user1, user2):
+        token1, _ = user1
+        token2, u2 = user2
+        secret_id, grant_id = _share_expired(client, db_session, token1, u2["address"])
+
+        assert client.get("/secrets/shared-with-me", headers=auth_header(token2)).json() == []
+        access = client.get(f"/secrets/{secret_id}/access", headers=auth_header(token1)).json()
+        assert grant_id not in [g["id"] for g in access]
+        assert client.get(f"/secrets/{secret_id}/chunks", headers=auth_header(token2)).status_code == 403
+
+        # GETs are side-effect free: the row waits for the sweeper
+        db_session.expire_all()
+        assert db_session.get(models.AccessGrant, grant_id) is not None
+
+    def test_unexpired_timebomb_grant_is_visible(self, client, user1, user2):
+        token1, _ = user1
+        token2, u2 = user2
+        secret_id = _create_secret(client, token1).json()["id"]
+        client.post("/secrets/share", json={
+            "secret_id": secret_id, "grantee_address": u2["address"],
+            "encrypted_key": "key", "expires_in": 3600,
+        }, headers=auth_header(token1))
+        shared = client.get("/secrets/shared-with-me", headers=auth_header(token2)).json()
+        assert [g["secret_id"] for g in shared] == [secret_id]
+
+    def test_sweep_deletes_expired_grants_in_batches(self, client, db_session, user1, user2):
+        token1, _ = user1
+        token2, u2 = user2
+        expired = [_share_expired(client, db_session, token1, u2["address"])[1] for _ in range(5)]
+        live_secret = _create_secret(client, token1).json()["id"]
+        client.post("/secrets/share", json={
+            "secret_id": live_secret, "grantee_address": u2["address"], "encrypted_key": "key",
+        }, headers=auth_header(token1))
+
+        sweeper = GrantExpirySweeper(TestingSessionLocal, interval=0, batch_size=2)
+        deleted = sweeper.sweep()
+
+        assert sorted(row[0] for row in deleted) == sorted(expired)
+        assert sweeper.stats()["deleted"] == 5
+        db_session.expire_all()
+        assert db_session.query(models.AccessGrant).filter(models.AccessGrant.id.in_(expired)).count() == 0
+        shared = client.get("/secrets/shared-with-me", headers=auth_header(token2)).json()
+        assert [g["secret_id"] for g in shared] == [live_secret]
+        assert sweeper.sweep() == []
+
+    def test_concurrent_sweepers_report_each_grant_once(self, client, db_session, user1, user2, monkeypatch):
+        token1, _ = user1
+        _, u2 = user2
+        expired = sorted(_share_expired(client, db_session, token1, u2["address"])[1] for _ in range(3))
+        other = GrantExpirySweeper(TestingSessionLocal, interval=0, batch_size=100)
+        raced = []
+
+        def racing_session():
+            # The other worker's sweeper deletes the batch between this one's SELECT and DELETE
+            db = TestingSessionLocal()
+            execute = db.execute
+
+            def run(statement, *args, **kwargs):
+                if getattr(statement, "is_delete", False) and not raced:
+                    raced.extend(other.sweep())
+                return execute(statement, *args, **kwargs)
+            db.execute = run
+            return db
+
+        send = AsyncMock()
+        monkeypatch.setattr("grant_expiry.manager.send_personal_message", send)
+        sweeper = GrantExpirySweeper(racing_session, interval=0, batch_size=100)
+        assert asyncio.run(sweeper.run_once()) == 0
+        asyncio.run(other.notify(raced))
+
+        assert sweeper.stats()["deleted"] == 0 and other.stats()["deleted"] == 3
+        events_to_grantee = [call.args[0]["data"]["grant_id"] for call in send.await_args_list
+                             if call.args[1] == u2["address"]]
+        assert sorted(events_to_grantee) == expired
+
+    def test_grant_expired_event_goes_to_grantee_and_owner(self, client, db_session, user1, user2, monkeypatch):
+        token1, u1 = user1
+        _, u2 = user2
+        secret_id, grant_id = _share_expired(client, db_session, token1, u2["address"])
+        send = AsyncMock()
+        monkeypatch.setattr("grant_expiry.manager.send_personal_message", send)
+
+        sweeper = GrantExpirySweeper(TestingSessionLocal, interval=0, batch_size=100)
+        assert asyncio.run(sweeper.run_once()) == 1
+
+        recipients = sorted(call.args[1] for call in send.await_args_list)
+        assert recipients == sorted([u1["address"], u2["address"]])
+        event = send.await_args_list[0].args[0]
+        assert event == {"type": "GRANT_EXPIRED", "data": {
+            "grant_id": grant_id, "secret_id": secret_id, "grantee": u2["address"],
+        }}
+
+
+class TestSecretSummaries:
+    def test_summary_lists_metadata_without_payload(self, client, user1):
+        token, u1 = user1
+        _create_secret(client, token, "Small", encrypted_data="ab" * 10)
+        _create_secret(client, token, "Large", encrypted_data="cd" * 5000)
+
+        statements = []
+        record = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            resp = client.get("/secrets/summary", headers=auth_header(token))
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert resp.status_code == 200
+        assert [(s["name"], s["size"]) for s in resp.json()] == [("Large", 10000), ("Small", 20)]
+        assert all("encrypted_data" not in s and s["owner_address"] == u1["address"] for s in resp.json())
+        # Only the payload's length is read, never the payload itself
+        listing = [stmt for stmt in statements if "FROM secrets" in stmt]
+        assert listing and not any("secrets.encrypted_data AS" in stmt for stmt in listing)
+
+    def test_summary_cursor_pagination(self, client, user1):
+        token, _ = user1
+        for i in range(5):
+            _create_secret(client, token, f"S{i}")
+        names, cursor = [], None
+        for _ in range(3):
+            resp = client.get("/secrets/summary", params={"limit": 2, **({"cursor": cursor} if cursor else {})},
+                              headers=auth_header(token))
+            names += [s["name"] for s in resp.json()]
+            cursor = resp.headers.get("X-Next-Cursor")
+        assert names == ["S4", "S3", "S2", "S1", "S0"]
+        assert cursor is None
+
+    def test_invalid_cursor_rejected(self, client, user1):
+        token, _ = user1
+        resp = client.get("/secrets/summary", params={"cursor": "not-a-cursor"}, headers=auth_header(token))
+        assert resp.status_code == 400
+
+    def test_shared_summary_lists_live_grants(self, client, db_session, user1, user2):
+        token1, u1 = user1
+        token2, u2 = user2
+        _share_expired(client, db_session, token1, u2["address"])
+        live = _create_secret(client, token1, "Live", encrypted_data="ef" * 50).json()["id"]
+        client.post("/secrets/share", json={
+            "secret_id": live, "grantee_address": u2["address"], "encrypted_key": "key",
+        }, headers=auth_header(token1))
+
+        resp = client.get("/secrets/shared-with-me/summary", headers=auth_header(token2))
+        assert resp.status_code == 200
+        [grant] = resp.json()
+        assert grant["secret_id"] == live
+        assert grant["secret"] == {**grant["secret"], "name": "Live", "size": 100, "owner_address": u1["address"]}
+        assert "encrypted_data" not in grant["secret"]
+
+
+class TestSecretPayload:
+    def test_owner_and_grantee_get_payload_with_their_key(self, client, user1, user2):
+        token1, _ = user1
+        token2, u2 = user2
+        secret_id = _create_secret(client, token1, encrypted_data="payload", encrypted_key="owner_key").json()["id"]
+        client.post("/secrets/share", json={
+            "secret_id": secret_id, "grantee_address": u2["address"], "encrypted_key": "grantee_key",
+        }, headers=auth_header(token1))
+
+        owner = client.get(f"/secrets/{secret_id}/payload", headers=auth_header(token1)).json()
+        grantee = client.get(f"/secrets/{secret_id}/payload", headers=auth_header(token2)).json()
+        assert owner == {"id": secret_id, "encrypted_data": "payload", "encrypted_key": "owner_key"}
+        assert grantee == {"id": secret_id, "encrypted_data": "payload", "encrypted_key": "grantee_key"}
+
+    def test_payload_denied_without_live_grant(self, client, db_session, user1, user2):
+        token1, _ = user1
+        token2, u2 = user2
+        expired_secret, _ = _share_expired(client, db_session, token1, u2["address"])
+        unshared = _create_secret(client, token1).json()["id"]
+        assert client.get(f"/secrets/{expired_secret}/payload", headers=auth_header(token2)).status_code == 403
+        assert client.get(f"/secrets/{unshared}/payload", headers=auth_header(token2)).status_code == 403
+        assert client.get("/secrets/999999/payload", headers=auth_header(token2)).status_code == 404
+
+
 class TestDocuments:
     def test_create_document(self, client, user1):
         token, user = user1
@@ -0,0 +1,129 @@
+"""Tests for the server key ring (server_keys.py) and the JWT `kid` header."""
+
+import asyncio
+import hashlib
+import json
+import httpx
+import pytest
+
+import auth
+import config
+from pqc_client import pqc
+from server_keys import ServerKeyRing, key_ring, key_id
+from conftest import (
+    _mock_pqc_handler, FAKE_SERVER_PUBLIC_KEY, FAKE_SERVER_KEY_ID, FAKE_SIGNATURE_HEX,
+)
+
+ROTATED_PUBLIC_KEY = "11223344" * 100
+ROTATED_KEY_ID = key_id(ROTATED_PUBLIC_KEY)
+
+
+def _header(token):
+    return json.loads(auth.b64url_decode(token.split(".")[0]))
+
+
+def _install(handler):
+    calls = []
+
+    def recording(request):
+        calls.append(request.url.path)
+        return handler(request)
+
+    pqc.use_transport(httpx.MockTransport(recording))
+    return calls
+
+
+def _rotated_handler(request):
+    """Sidecar that has already switched to ROTATED_PUBLIC_KEY."""
+    if request.url.path == "/server-public-key":
+        return httpx.Response(200, json={"publicKey": ROTATED_PUBLIC_KEY, "keyId": ROTATED_KEY_ID})
+    if request.url.path == "/sign":
+        return httpx.Response(200, json={"signature": FAKE_SIGNATURE_HEX, "keyId": ROTATED_KEY_ID})
+    return _mock_pqc_handler(request)
+
+
+class TestKeyRing:
+    def test_key_id_is_sha256_prefix_of_raw_key(self):
+        expected = hashlib.sha256(bytes.fromhex(FAKE_SERVER_PUBLIC_KEY)).hexdigest()[:16]
+        assert FAKE_SERVER_KEY_ID == expected
+
+    def test_newest_key_is_current_and_old_keys_kept(self):
+        ring = ServerKeyRing(max_keys=2)
+        ring.add(FAKE_SERVER_PUBLIC_KEY)
+        ring.add(ROTATED_PUBLIC_KEY)
+        assert ring.current_kid == ROTATED_KEY_ID
+        assert ring.get() == ROTATED_PUBLIC_KEY
+        assert ring.get(FAKE_SERVER_KEY_ID) == FAKE_SERVER_PUBLIC_KEY
+
+    def test_ring_is_bounded(self):
+        ring = ServerKeyRing(max_keys=2)
+        third = "55667788" * 100
+        for key in (FAKE_SERVER_PUBLIC_KEY, ROTATED_PUBLIC_KEY, third):
+            ring.add(key)
+        assert ring.kids() == [ROTATED_KEY_ID, key_id(third)]
+        assert ring.get(FAKE_SERVER_KEY_ID) is None
+
+    def test_prefetch_retries_until_sidecar_is_up(self):
+        attempts = []
+
+        def flaky(request):
+            attempts.append(request.url.path)
+            if len(attempts) < 3:
+                raise httpx.ConnectError("sidecar starting")
+            return _mock_pqc_handler(request)
+
+        pqc.use_transport(httpx.MockTransport(flaky))
+        ring = ServerKeyRing(max_keys=2)
+        assert asyncio.run(ring.prefetch(retries=5, delay=0)) is True
+        assert len(attempts) == 3
+        assert ring.current_kid == FAKE_SERVER_KEY_ID
+
+    def test_prefetch_gives_up(self):
+        def down(request):
+            raise httpx.ConnectError("down")
+
+        pqc.use_transport(httpx.MockTransport(down))
+        ring = ServerKeyRing(max_keys=2)
+        assert asyncio.run(ring.prefetch(retries=2, delay=0)) is False
+        assert ring.current_kid is None
+
+
+class TestKidHeader:
+    def test_token_carries_current_kid(self):
+        token = auth.create_access_token({"sub": "alice"})
+        assert _header(token)["kid"] == FAKE_SERVER_KEY_ID
+
+    def test_decode_uses_prefetched_key_without_lookup(self):
+        token = auth.create_access_token({"sub": "alice"})
+        calls = _install(_mock_pqc_handler)
+        assert auth.decode_access_token(token)["sub"] == "alice"
+        assert "/server-public-key" not in calls
+
+    def test_cold_start_fetches_key(self):
+        token = auth.create_access_token({"sub": "alice"})
+        key_ring.clear()
+        calls = _install(_mock_pqc_handler)
+        assert auth.decode_access_token(token)["sub"] == "alice"
+        assert calls.count("/server-public-key") == 1
+
+    def test_signing_after_rotation_picks_up_new_key(self):
+        calls = _install(_rotated_handler)
+        token = auth.create_access_token({"sub": "alice"})
+        assert _header(token)["kid"] == ROTATED_KEY_ID
+        assert calls.count("/sign") == 2
+        # The previous key stays available for tokens issued before the rotation
+        assert key_ring.get(FAKE_SERVER_KEY_ID) == FAKE_SERVER_PUBLIC_KEY
+
+    def test_unknown_kid_refresh_is_rate_limited(self, monkeypatch):
+        monkeypatch.setattr(config, "SERVER_KEY_MIN_REFRESH_SECONDS", 60)
+        token = auth.create_access_token({"sub": "alice"})
+        header_b64, payload_b64, signature_b64 = token.split(".")
+        forged_header = auth.b64url_encode(json.dumps({"alg": "DILITHIUM2", "typ": "JWT", "kid": "0" * 16}).encode())
+        forged = f"{forged_header}.{payload_b64}.{signature_b64}"
+
+        calls = _install(_mock_pqc_handler)
+        for _ in range(3):
+            auth.token_cache.clear()
+            assert auth.decode_access_token(forged) is None
+        assert calls.count("/server-public-key") == 1
+        assert "/verify" not in calls
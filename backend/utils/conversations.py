@@ -0,0 +1,133 @@
+"""
+Maintenance of conversation_summaries, the materialized messenger inbox.
+
+Each direct message touches two rows, (sender, recipient) and (recipient,
+sender): both move to the newest message and the recipient's unread count
+goes up by one. mark-read resets the reader's count. Both happen in the same
+transaction as the message change, so /messages/conversations reads one row
+per conversation instead of aggregating the whole history.
+
+`expected_summaries()` derives the same rows from messages; it backs the
+consistency check and the rebuild. From backend/:
+
+    python -m utils.conversations            # report drift
+    python -m utils.conversations --repair   # rebuild the table from messages
+"""
+import sys
+
+from sqlalchemy import case, delete, func, insert, literal, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+import models
+
+_UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def summary_upsert(dialect_name: str, message: models.Message):
+    """
+    INSERT ... ON CONFLICT statement recording a new `message` (flushed, so it
+    has its id) in both participants' summaries.
+    """
+    s = models.ConversationSummary.__table__
+    if message.sender_id == message.recipient_id:
+        # Note to self: one conversation, and the message is unread on the receiving side
+        rows = [(message.sender_id, message.recipient_id, 1)]
+    else:
+        rows = [(message.sender_id, message.recipient_id, 0), (message.recipient_id, message.sender_id, 1)]
+    # Fixed row order, so concurrent sends in opposite directions lock the pair alike
+    values = [
+        {"user_id": user, "partner_id": partner, "last_message_id": message.id,
+         "last_activity": message.created_at, "unread_count": unread}
+        for user, partner, unread in sorted(rows)
+    ]
+    stmt = _UPSERT_INSERTS[dialect_name](s).values(values)
+    newer = stmt.excluded.last_message_id > s.c.last_message_id
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "partner_id"],
+        set_={
+            "last_message_id": case((newer, stmt.excluded.last_message_id), else_=s.c.last_message_id),
+            "last_activity": case((newer, stmt.excluded.last_activity), else_=s.c.last_activity),
+            "unread_count": s.c.unread_count + stmt.excluded.unread_count,
+        },
+    )
+
+
+def clear_unread(user_id: int, partner_id: int):
+    """UPDATE resetting `user_id`'s unread count for the conversation with `partner_id`."""
+    s = models.ConversationSummary
+    return update(s).where(s.user_id == user_id, s.partner_id == partner_id).values(unread_count=0)
+
+
+def expected_summaries():
+    """SELECT of the summary rows as derived from messages (user_id, partner_id, last_message_id, last_activity, unread_count)."""
+    m = models.Message
+    sent = select(
+        m.sender_id.label("user_id"), m.recipient_id.label("partner_id"), m.id.label("message_id"),
+        literal(0).label("unread"),
+    )
+    received = select(
+        m.recipient_id.label("user_id"), m.sender_id.label("partner_id"), m.id.label("message_id"),
+        case((m.is_read == False, 1), else_=0).label("unread"),
+    )
+    both = union_all(*(
+        q.where(m.sender_id.is_not(None), m.recipient_id.is_not(None)) for q in (sent, received)
+    )).subquery()
+    grouped = select(
+        both.c.user_id, both.c.partner_id,
+        func.max(both.c.message_id).label("last_message_id"),
+        func.sum(both.c.unread).label("unread_count"),
+    ).group_by(both.c.user_id, both.c.partner_id).subquery()
+    return select(
+        grouped.c.user_id, grouped.c.partner_id, grouped.c.last_message_id,
+        m.created_at.label("last_activity"), grouped.c.unread_count,
+    ).join(m, m.id == grouped.c.last_message_id)
+
+
+def check(db):
+    """
+    Differences between conversation_summaries and messages, as a list of
+    (problem, user_id, partner_id) with problem "missing", "stale" or "extra".
+    """
+    columns = ("last_message_id", "last_activity", "unread_count")
+    expected = {(r.user_id, r.partner_id): tuple(getattr(r, c) for c in columns)
+                for r in db.execute(expected_summaries())}
+    s = models.ConversationSummary
+    actual = {(r.user_id, r.partner_id): tuple(getattr(r, c) for c in columns)
+              for r in db.execute(select(s.user_id, s.partner_id, *(getattr(s, c) for c in columns)))}
+
+    problems = []
+    for key, row in expected.items():
+        if key not in actual:
+            problems.append(("missing", *key))
+        elif actual[key] != row:
+            problems.append(("stale", *key))
+    problems.extend(("extra", *key) for key in actual if key not in expected)
+    return sorted(problems)
+
+
+def rebuild(db):
+    """Replace every summary with the rows derived from messages (one transaction)."""
+    s = models.ConversationSummary.__table__
+    expected = expected_summaries().subquery()
+    db.execute(delete(s))
+    db.execute(insert(s).from_select(
+        ["user_id", "partner_id", "last_message_id", "last_activity", "unread_count"],
+        select(expected.c.user_id, expected.c.partner_id, expected.c.last_message_id,
+               expected.c.last_activity, expected.c.unread_count),
+    ))
+    db.commit()
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    repair = len(sys.argv) > 1 and sys.argv[1] == "--repair"
+    with SessionLocal() as db:
+        problems = check(db)
+        for problem, user, partner in problems:
+            print(f"{problem}: user {user}, partner {partner}")
+        print(f"{len(problems)} conversation summaries out of sync.")
+        if problems and repair:
+            rebuild(db)
+            print("Conversation summaries rebuilt from messages.")
+    sys.exit(1 if problems and not repair else 0)
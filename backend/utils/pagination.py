@@ -0,0 +1,56 @@
+"""
+Keyset (cursor) pagination for message histories and secret listings.
+
+A page is bounded by a row id ("older than" / "newer than") instead of an
+OFFSET, so any depth costs the same and rows arriving mid-scroll don't shift
+pages. Clients get the next page's cursor in the X-Next-Cursor header and pass
+it back unchanged as `cursor`.
+"""
+import base64
+import binascii
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(direction: str, message_id: int) -> str:
+    """Opaque cursor for the page 'before' or 'after' `message_id`."""
+    return base64.urlsafe_b64encode(f"{direction}:{message_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        direction, message_id = raw.split(":")
+        if direction in ("before", "after"):
+            return direction, int(message_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        pass
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page_bounds(before_id: Optional[int], after_id: Optional[int], cursor: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """(before_id, after_id) of a history request, from its explicit ids or its cursor."""
+    if cursor:
+        if before_id is not None or after_id is not None:
+            raise HTTPException(status_code=400, detail="Use either a cursor or explicit message ids")
+        direction, message_id = decode_cursor(cursor)
+        if direction == "before":
+            before_id = message_id
+        else:
+            after_id = message_id
+    if before_id is not None and after_id is not None:
+        raise HTTPException(status_code=400, detail="Page either before or after a message, not both")
+    return before_id, after_id
+
+
+def next_cursor(rows, limit: int, after_id: Optional[int]) -> Optional[str]:
+    """
+    Cursor continuing past `rows`, fetched with limit + 1 in page order (newest
+    first, or oldest first when paging forward with after_id); None on the last page.
+    """
+    if len(rows) <= limit:
+        return None
+    return encode_cursor("after" if after_id is not None else "before", rows[limit - 1].id)
@@ -1,5 +1,6 @@
 import os
 import json
+import asyncio
 from pywebpush import webpush, WebPushException
 import logging
 
@@ -50,8 +51,8 @@ def notify_user_push(db, user_address, title, body, data=None):
     import models
     
     target_addr = user_address.lower()
-    subs = db.query(models.PushSubscription).filter(
-        models.PushSubscription.user_address == target_addr
+    subs = db.query(models.PushSubscription).join(models.PushSubscription.user).filter(
+        models.User.has_address(target_addr)
     ).all()
     
     if not subs:
@@ -74,3 +75,70 @@ def notify_user_push(db, user_address, title, body, data=None):
             # Auto-cleanup stale subscriptions
             db.delete(sub)
             db.commit()
+
+def notify_users_push(db, user_addresses, title, body, data=None):
+    """
+    notify_user_push for many users at once: one query for all their subscriptions.
+    """
+    import models
+
+    targets = {addr.lower() for addr in user_addresses}
+    if not targets:
+        return
+    rows = db.query(models.PushSubscription, models.User.address).join(models.PushSubscription.user).filter(
+        models.User.has_any_address(targets)
+    ).all()
+
+    payload = {
+        "title": title,
+        "body": body,
+        "data": data or {}
+    }
+
+    for sub, address in rows:
+        if address not in targets:
+            continue # address_hash collision, not one of ours
+        res = send_push_notification({
+            "endpoint": sub.endpoint,
+            "p256dh": sub.p256dh,
+            "auth": sub.auth
+        }, payload)
+
+        if res == "GONE":
+            # Auto-cleanup stale subscriptions
+            db.delete(sub)
+            db.commit()
+
+async def notify_user_push_async(db, user_address, title, body, data=None):
+    """
+    notify_user_push for async routes: `db` is an AsyncSession and the blocking
+    webpush HTTP calls run in a worker thread.
+    """
+    import models
+    from sqlalchemy import select
+
+    target_addr = user_address.lower()
+    subs = (await db.scalars(select(models.PushSubscription).join(models.PushSubscription.user).where(
+        models.User.has_address(target_addr)
+    ))).all()
+
+    if not subs:
+        return
+
+    payload = {
+        "title": title,
+        "body": body,
+        "data": data or {}
+    }
+
+    for sub in subs:
+        res = await asyncio.to_thread(send_push_notification, {
+            "endpoint": sub.endpoint,
+            "p256dh": sub.p256dh,
+            "auth": sub.auth
+        }, payload)
+
+        if res == "GONE":
+            # Auto-cleanup stale subscriptions
+            await db.delete(sub)
+            await db.commit()